@@ -0,0 +1,263 @@
+"""
+Process-Pool Setup Analysis over Shared-Memory Candles
+======================================================
+
+analyze_setup/score_setup are pure-Python and CPU-bound, so a scan over a
+large universe runs on one core under the GIL. AnalysisPool spreads that
+work over a persistent process pool:
+
+- The candle windows of every pair to analyze are packed into one float64
+  array (pairs x window x [timestamp, open, high, low, close, volume]) that
+  lives in a multiprocessing.shared_memory segment. The segment is reused
+  between scans and only grows when a bigger batch arrives.
+- Tasks carry only (pair, row, length, last price) tuples; workers attach
+  the segment by name, rebuild candle dicts for their rows and return the
+  setup summary and scores. Candle lists are never pickled per task.
+- Batches smaller than min_pairs (or a pool with 0 workers) are analyzed
+  in-process, where pool overhead would outweigh the gain.
+- Workers are started with forkserver (spawn where it is missing), never
+  fork: the bot already runs threads (order, fetch and feed threads) and a
+  forked child could inherit a lock one of them holds, e.g. in logging or
+  urllib3, and deadlock.
+- One pool can serve several strategies (e.g. one per trading account):
+  analyze() takes per-batch parameter overrides that are applied to the
+  worker's strategy copy, so the pool need not be rebuilt when they differ.
+  Pooled batches are serialized, since they share the candle segment.
+"""
+
+import atexit
+import copy
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CANDLE_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+# Per-process worker state, set by _init_worker
+_WORKER_STRATEGY = None
+_WORKER_SEGMENT: Optional[shared_memory.SharedMemory] = None
+
+
+_candle_values = itemgetter(*CANDLE_FIELDS)
+
+
+def pack_candles(candle_lists: Sequence[list], out: np.ndarray) -> List[int]:
+    """Copy candle dict lists into out[row, :len, field]; returns the lengths"""
+    lengths = []
+    for row, candles in enumerate(candle_lists):
+        n = len(candles)
+        try:
+            out[row, :n] = list(map(_candle_values, candles))
+        except (KeyError, TypeError):
+            # Candles missing a field (e.g. no volume) take the slow path
+            out[row, :n] = [[c.get(f) or 0.0 for f in CANDLE_FIELDS] for c in candles]
+        lengths.append(n)
+    return lengths
+
+
+def unpack_candles(block: np.ndarray, row: int, length: int) -> List[dict]:
+    """Candle dicts for one row of a packed block"""
+    rows = block[row, :length].tolist()
+    return [{'timestamp': int(r[0]), 'open': r[1], 'high': r[2], 'low': r[3], 'close': r[4], 'volume': r[5]}
+            for r in rows]
+
+
+def analyze_candles(strategy, candles: list, last_price: float) -> tuple:
+    """(setup, bullish_score, bearish_score) for one candle window"""
+    setup = strategy.analyze_setup(candles, {'Ticker': {'LastPrice': last_price}})
+    return setup, strategy.score_setup(setup['bullish_setup']), strategy.score_setup(setup['bearish_setup'])
+
+
+def _init_worker(strategy):
+    global _WORKER_STRATEGY
+    _WORKER_STRATEGY = strategy
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    global _WORKER_SEGMENT
+    if _WORKER_SEGMENT is None or _WORKER_SEGMENT.name != name:
+        if _WORKER_SEGMENT is not None:
+            _WORKER_SEGMENT.close()
+        # track=False keeps the worker's resource tracker from unlinking a
+        # segment the parent owns (Python 3.13+); older versions ignore it
+        try:
+            _WORKER_SEGMENT = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            _WORKER_SEGMENT = shared_memory.SharedMemory(name=name)
+    return _WORKER_SEGMENT
+
+
+def _with_overrides(strategy, overrides: Optional[Dict]):
+    """strategy itself, or a shallow copy with the override attributes set"""
+    if not overrides:
+        return strategy
+    strategy = copy.copy(strategy)
+    for name, value in overrides.items():
+        setattr(strategy, name, value)
+    return strategy
+
+
+def _analyze_chunk(segment_name: str, shape: tuple, tasks: List[tuple],
+                   overrides: Optional[Dict] = None) -> List[tuple]:
+    """Worker entry point: tasks are (pair, row, length, last_price)"""
+    strategy = _with_overrides(_WORKER_STRATEGY, overrides)
+    segment = _attach(segment_name)
+    block = np.ndarray(shape, dtype=np.float64, buffer=segment.buf)
+    results = []
+    for pair, row, length, last_price in tasks:
+        try:
+            results.append((pair, analyze_candles(strategy, unpack_candles(block, row, length), last_price)))
+        except Exception as e:
+            results.append((pair, e))
+    return results
+
+
+class AnalysisPool:
+    """Persistent process pool for setup analysis with a shared candle segment"""
+
+    def __init__(self, strategy, workers: int = 0, min_pairs: int = 32, chunks_per_worker: int = 4):
+        """
+        Args:
+            strategy: Object with analyze_setup/score_setup; a copy is sent to each worker once
+            workers: Pool size; 0 analyzes everything in-process
+            min_pairs: Batches smaller than this are analyzed in-process
+            chunks_per_worker: Tasks per worker per batch (load balancing vs. dispatch overhead)
+        """
+        self.strategy = strategy
+        self.workers = workers
+        self.min_pairs = min_pairs
+        self.chunks_per_worker = chunks_per_worker
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._segment: Optional[shared_memory.SharedMemory] = None
+        self._batch_lock = threading.Lock()  # pooled batches share the segment
+        self.stats = {'batches': 0, 'pooled_batches': 0, 'pooled_pairs': 0,
+                      'inline_pairs': 0, 'segment_bytes': 0, 'errors': 0}
+        self._atexit_registered = False
+
+    def _register_atexit(self):
+        # Once per live pool; shutdown() unregisters, so rebuilt pools do not pile up handlers
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Not fork: this process has threads whose locks a forked child could inherit held
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(method),
+                                                 initializer=_init_worker, initargs=(self.strategy,))
+            self._register_atexit()
+            logger.info(f"Started analysis pool with {self.workers} workers ({method})")
+        return self._executor
+
+    def _ensure_segment(self, shape: tuple) -> shared_memory.SharedMemory:
+        needed = int(np.prod(shape)) * 8
+        if self._segment is None or self._segment.size < needed:
+            self._release_segment()
+            # Leave headroom so a slightly bigger universe does not reallocate
+            self._segment = shared_memory.SharedMemory(create=True, size=int(needed * 1.5))
+            self.stats['segment_bytes'] = self._segment.size
+            self._register_atexit()
+        return self._segment
+
+    def _release_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            try:
+                self._segment.unlink()
+            except FileNotFoundError:
+                pass
+            self._segment = None
+
+    def analyze(self, items: Sequence[Tuple[str, list, float]], overrides: Optional[Dict] = None) -> dict:
+        """Analyze (pair, candles, last_price) items
+
+        Args:
+            items: (pair, candles, last_price) tuples
+            overrides: Strategy attributes (e.g. min_rr_ratio) to use for this batch
+
+        Returns:
+            dict: pair -> (setup, bullish_score, bearish_score); pairs whose
+            analysis raised are logged and left out
+        """
+        self.stats['batches'] += 1
+        if not items:
+            return {}
+        if self.workers <= 0 or len(items) < self.min_pairs:
+            self.stats['inline_pairs'] += len(items)
+            return self._analyze_inline(items, overrides)
+
+        try:
+            with self._batch_lock:
+                return self._analyze_pooled(items, overrides)
+        except Exception as e:
+            # A broken pool must not stop the scan; rebuild it next batch
+            logger.error(f"Analysis pool failed, analyzing in-process: {e}")
+            self.stats['errors'] += 1
+            with self._batch_lock:
+                self._shutdown_executor()
+            self.stats['inline_pairs'] += len(items)
+            return self._analyze_inline(items, overrides)
+
+    def _analyze_inline(self, items, overrides: Optional[Dict] = None) -> dict:
+        strategy = _with_overrides(self.strategy, overrides)
+        results = {}
+        for pair, candles, last_price in items:
+            try:
+                results[pair] = analyze_candles(strategy, candles, last_price)
+            except Exception as e:
+                logger.error(f"Error analyzing {pair}: {e}")
+        return results
+
+    def _analyze_pooled(self, items, overrides: Optional[Dict] = None) -> dict:
+        window = max(len(candles) for _, candles, _ in items)
+        shape = (len(items), window, len(CANDLE_FIELDS))
+        segment = self._ensure_segment(shape)
+        block = np.ndarray(shape, dtype=np.float64, buffer=segment.buf)
+        lengths = pack_candles([candles for _, candles, _ in items], block)
+
+        tasks = [(pair, row, lengths[row], last_price) for row, (pair, _, last_price) in enumerate(items)]
+        n_chunks = min(len(tasks), self.workers * self.chunks_per_worker)
+        chunks = [tasks[i::n_chunks] for i in range(n_chunks)]
+
+        executor = self._ensure_executor()
+        futures = [executor.submit(_analyze_chunk, segment.name, shape, chunk, overrides) for chunk in chunks]
+        results = {}
+        for future in futures:
+            for pair, outcome in future.result():
+                if isinstance(outcome, Exception):
+                    logger.error(f"Error analyzing {pair}: {outcome}")
+                else:
+                    results[pair] = outcome
+        self.stats['pooled_batches'] += 1
+        self.stats['pooled_pairs'] += len(items)
+        return results
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def shutdown(self):
+        """Stop the workers and free the shared segment"""
+        self._shutdown_executor()
+        self._release_segment()
+        if self._atexit_registered:
+            atexit.unregister(self.shutdown)
+            self._atexit_registered = False
+
+
+def default_workers() -> int:
+    """One worker per spare core"""
+    return max(0, (os.cpu_count() or 1) - 1)
@@ -0,0 +1,126 @@
+"""
+Asyncio Runtime for MultiAssetTradingBot
+========================================
+
+Alternative to TradingBot.run: scanning, position/risk monitoring, order
+reconciliation and metrics reporting run as independent asyncio tasks with
+their own cadences, so a slow scan no longer delays stop-loss checks and a
+slow order call no longer delays the next scan.
+
+All bot methods do blocking HTTP, so every unit of work runs in a thread
+pool executor. The bot methods take bot.state_lock themselves, only around
+reads and writes of position state, so no task holds it across a balance,
+ticker or order call and a slow order never blocks the risk check.
+Shutdown (SIGINT/SIGTERM or stop()) cancels all tasks and waits for
+in-flight work before the executor is closed.
+"""
+
+import asyncio
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBotRuntime:
+    """Runs an already-initialized MultiAssetTradingBot as concurrent tasks"""
+
+    def __init__(self, bot, risk_interval: float = 60, reconcile_interval: float = 30,
+                 metrics_interval: float = 300, memory_interval: float = 0, max_workers: int = 4):
+        self.bot = bot
+        self.risk_interval = risk_interval
+        self.reconcile_interval = reconcile_interval
+        self.metrics_interval = metrics_interval
+        self.memory_interval = memory_interval  # 0 = no memory report task
+        self.max_workers = max_workers
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self.task_stats = {}
+
+    async def _call(self, fn: Callable, *args):
+        """Run a blocking callable in the executor"""
+        return await self._loop.run_in_executor(self._executor, partial(fn, *args))
+
+    async def _periodic(self, name: str, work: Callable, next_delay: Callable[[], float]):
+        """Run work, then wait next_delay() seconds (or until shutdown), forever"""
+        stats = self.task_stats.setdefault(name, {'runs': 0, 'errors': 0, 'last_duration': 0.0})
+        while not self._stop_event.is_set():
+            started = time.time()
+            try:
+                await self._call(work)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats['errors'] += 1
+                logger.error(f"Error in {name} task: {e}", exc_info=True)
+            stats['runs'] += 1
+            stats['last_duration'] = time.time() - started
+
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=max(0.0, next_delay()))
+            except asyncio.TimeoutError:
+                pass
+
+    def _scan(self):
+        self.bot._run_scan_cycle(time.time())
+
+    def _risk(self):
+        self.bot._manage_open_positions(reconcile=False)
+
+    def _next_scan_delay(self) -> float:
+        return max(1.0, self.bot._seconds_until_next_scan())
+
+    def stop(self):
+        """Request a clean shutdown (safe to call from any thread)"""
+        if self._loop and self._stop_event:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def run(self):
+        """Start all tasks and block until stop() or a termination signal"""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bot-io')
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        self.bot.running = True
+        tasks = [
+            asyncio.ensure_future(self._periodic('scan', self._scan, self._next_scan_delay)),
+            asyncio.ensure_future(self._periodic('risk', self._risk, lambda: self.risk_interval)),
+            asyncio.ensure_future(self._periodic('reconcile', self.bot._reconcile_orders,
+                                                 lambda: self.reconcile_interval)),
+            asyncio.ensure_future(self._periodic('metrics', self.bot._update_portfolio_metrics,
+                                                 lambda: self.metrics_interval)),
+        ]
+        if self.memory_interval:
+            tasks.append(asyncio.ensure_future(self._periodic('memory', self.bot.check_memory,
+                                                              lambda: self.memory_interval)))
+        logger.info(f"Async runtime started: risk every {self.risk_interval}s, reconcile every "
+                    f"{self.reconcile_interval}s, metrics every {self.metrics_interval}s")
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            logger.info("Shutting down async runtime...")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Wait for executor work already in flight (e.g. an order call)
+            self._executor.shutdown(wait=True)
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    self._loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            self.bot.running = False
+            logger.info(f"Async runtime stopped: {self.task_stats}")
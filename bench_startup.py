@@ -0,0 +1,145 @@
+"""
+Startup Benchmark
+=================
+
+Measures `import bot_template` in fresh interpreters and checks that the
+import stays free of side effects, so a new eager import or module-level
+initialization fails here instead of quietly slowing down scanner workers,
+spawned pool workers and CLI tools:
+
+- import time: median in-process import time over several fresh
+  interpreters, compared against --budget-ms
+- side effects: importing from a directory that holds a .env must not
+  change os.environ or create bot.log
+- heavy modules: requests, NumPy, urllib3 and dotenv must not be loaded by
+  the import (they are loaded where they are first used)
+
+    python bench_startup.py
+    python bench_startup.py --runs 11 --budget-ms 40 --importtime
+
+Exits with status 1 if any check fails.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ('requests', 'numpy', 'urllib3', 'dotenv')
+
+PROBE = """
+import json, os, sys, time
+env_before = dict(os.environ)
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': seconds,
+    'heavy_modules': sorted(m for m in {heavy!r} if m in sys.modules),
+    'env_changed': sorted(k for k in set(os.environ) | set(env_before) if os.environ.get(k) != env_before.get(k)),
+    'log_file': os.path.exists('bot.log'),
+}}))
+"""
+
+
+def _run(code: str, cwd: str, extra_args=()) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    return subprocess.run([sys.executable, *extra_args, '-c', code], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=120)
+
+
+def probe_import(module: str, cwd: str) -> dict:
+    """One fresh-interpreter import of module; returns the probe report plus wall time"""
+    started = time.perf_counter()
+    result = _run(PROBE.format(module=module, heavy=HEAVY_MODULES), cwd)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['wall_seconds'] = wall
+    return report
+
+
+def interpreter_baseline(cwd: str, runs: int) -> float:
+    """Median wall time of an interpreter that imports nothing"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        _run('pass', cwd)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def top_imports(module: str, cwd: str, limit: int = 10) -> list:
+    """Slowest imports (cumulative microseconds) from -X importtime"""
+    result = _run(f'import {module}', cwd, ('-X', 'importtime'))
+    rows = []
+    # Lines look like "import time: <self us> | <cumulative us> | <indented name>"
+    # and children are printed before their parent, so the rows of module are
+    # the ones between the previous top-level import and module itself
+    for line in result.stderr.splitlines():
+        parts = line.replace('import time:', '').split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        rows.append((int(parts[1]), name))
+        if name == ' ' + module:
+            break
+        if not name.startswith('  '):
+            rows = []
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time budget and side-effect check')
+    parser.add_argument('--module', default='bot_template')
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', '50')))
+    parser.add_argument('--importtime', action='store_true', help='Also list the slowest imports')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='web3bot-startup-')
+    with open(os.path.join(workdir, '.env'), 'w') as f:
+        f.write('BENCH_STARTUP_SENTINEL=1\n')
+
+    probe_import(args.module, workdir)  # warm-up: refreshes stale bytecode caches
+    reports = [probe_import(args.module, workdir) for _ in range(args.runs)]
+    import_ms = statistics.median(r['seconds'] for r in reports) * 1000
+    wall_ms = statistics.median(r['wall_seconds'] for r in reports) * 1000
+    baseline_ms = interpreter_baseline(workdir, args.runs) * 1000
+    last = reports[-1]
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.1f}ms, budget {args.budget_ms:.0f}ms")
+    if last['heavy_modules']:
+        failures.append(f"import loaded {', '.join(last['heavy_modules'])}")
+    if last['env_changed']:
+        failures.append(f"import changed os.environ: {', '.join(last['env_changed'])}")
+    if last['log_file']:
+        failures.append("import created bot.log")
+
+    print(f"import {args.module}: {import_ms:.1f}ms median over {args.runs} runs "
+          f"(budget {args.budget_ms:.0f}ms)")
+    print(f"process start to import done: {wall_ms:.0f}ms, bare interpreter {baseline_ms:.0f}ms")
+    if args.importtime:
+        print("slowest imports (cumulative):")
+        for cumulative_us, name in top_imports(args.module, workdir):
+            print(f"  {cumulative_us / 1000:7.1f}ms  {name.strip()}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
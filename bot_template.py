@@ -10,25 +10,41 @@ Requirements:
 - requests library: pip install requests
 """
 
-import requests
 import hmac
 import hashlib
+import json
 import time
 import logging
+import threading
 from typing import Optional, Dict, Any, cast
 
-# New imports for multi-asset support, utilities and environment loading
-import numpy as np
+# New imports for multi-asset support and utilities. requests, NumPy and the
+# NumPy-backed components are imported where they are first used, so that
+# importing this module (tools, backtests, pool workers) stays cheap
 from datetime import datetime
-from collections import deque
+from collections import deque, OrderedDict
+from contextlib import nullcontext
 from enum import Enum
 import os
-from dotenv import load_dotenv
-from urllib3.util import Retry
-from requests.adapters import HTTPAdapter
 
-# Load environment variables from .env
-load_dotenv()
+from scan_scheduler import ScanScheduler, setup_heat, timeframe_seconds
+from exchange_rules import ExchangeInfoCache
+from position_store import PositionStore
+from circuit_breaker import CircuitBreaker
+from coingecko_adapter import CoinGeckoAdapter
+from state_checkpoint import CheckpointStore
+from market_snapshot import MarketSnapshot, build_snapshot
+from memory_accounting import MemoryAccountant, MB
+from request_planner import RequestPlanner
+from single_flight import SingleFlight, coalesced
+from order_execution import OrderExecutionEngine
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+
+# Load environment variables from .env when run as the service; importers
+# get the process environment untouched (load .env yourself before importing)
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # ============================================================================
 # Configuration
@@ -40,15 +56,55 @@ BASE_URL = "https://mock-api.roostoo.com"
 API_KEY = "your-api-key-here"
 SECRET_KEY = "your-secret-key-here"
 
+# Trading rules from /v3/exchange_info, refreshed in the background
+EXCHANGE_INFO_REFRESH_INTERVAL = 3600
+
 # Trading configuration
 TRADING_PAIR = "BTC/USD"  # Change to your preferred pair
 CHECK_INTERVAL = 60  # seconds between strategy checks
 
+# 'classic' runs the single-threaded run_iteration loop; 'async' runs scanning,
+# risk checks, order reconciliation and metrics as independent asyncio tasks
+RUNTIME_MODE = os.getenv('RUNTIME_MODE', 'classic')
+ORDER_RECONCILE_INTERVAL = 30
+
+# Orders go out concurrently over a pooled Roostoo session; entry LIMIT orders
+# resting longer than ORDER_LIMIT_TTL are cancelled and, by ORDER_STALE_POLICY,
+# dropped ('cancel'), re-placed at the current touch ('replace', at most
+# ORDER_MAX_REPLACES times before converting) or converted to MARKET ('market')
+ORDER_MAX_CONCURRENCY = int(os.getenv('ORDER_MAX_CONCURRENCY', '4'))
+ORDER_LIMIT_TTL = int(os.getenv('ORDER_LIMIT_TTL', '900'))  # seconds, 0 = orders never expire
+ORDER_STALE_POLICY = os.getenv('ORDER_STALE_POLICY', 'replace')
+ORDER_MAX_REPLACES = int(os.getenv('ORDER_MAX_REPLACES', '2'))
+
+# Push market data: with MARKET_FEED_URL set, an SSE feed (see market_stream.py)
+# updates candles and prices, and analysis and stop checks run on each update.
+# While the feed is down or silent for MARKET_FEED_STALE_SECONDS the bot polls REST
+MARKET_FEED_URL = os.getenv('MARKET_FEED_URL', '')
+MARKET_FEED_STALE_SECONDS = float(os.getenv('MARKET_FEED_STALE_SECONDS', '15'))
+MARKET_FEED_ANALYSIS_INTERVAL = 1.0  # seconds between analysis passes over updated pairs
+
+# 'standalone' scans in-process; 'leader' owns positions/orders and collects
+# opportunities from scanner workers; 'worker' only scans its shard
+DEPLOY_ROLE = os.getenv('DEPLOY_ROLE', 'standalone')
+SCAN_CLUSTER_ADDRESS = os.getenv('SCAN_CLUSTER_ADDRESS', '/tmp/web3bot-scan.sock')
+SCAN_LOCAL_WORKERS = int(os.getenv('SCAN_LOCAL_WORKERS', '0'))  # workers the leader spawns itself
+METRICS_REPORT_INTERVAL = 300
+
+# Size report of long-lived structures with leak warnings (0 disables);
+# MEMORY_TRACEMALLOC adds the top growing allocation sites to each report
+MEMORY_REPORT_INTERVAL = int(os.getenv('MEMORY_REPORT_INTERVAL', '900'))
+MEMORY_TRACEMALLOC = os.getenv('MEMORY_TRACEMALLOC', 'false').lower() == 'true'
+MEMORY_RSS_BUDGET_MB = int(os.getenv('MEMORY_RSS_BUDGET_MB', '1024'))
+MEMORY_BUDGETS_MB = {'ohlc_history': 128, 'portfolio_value_history': 16, 'trades_history': 16,
+                     'returns_history': 16, 'analysis_cache': 64, 'positions': 8, 'trade_analytics': 16}
+
 # ============================================================================
 # MULTI-ASSET PORTFOLIO CONFIGURATION
 # ============================================================================
 AVAILABLE_PAIRS = []
-PORTFOLIO_COINS = {}
+# pair -> Position, indexed by status; records exist only for traded pairs
+PORTFOLIO_COINS = PositionStore(default_status='closed')  # TradeStatus.CLOSED
 
 CANDLE_HISTORY_SIZE = 100
 OHLC_HISTORY = {}
@@ -60,13 +116,59 @@ ALTERNATIVE_TIMEFRAMES = ['5m', '4h', '1d']
 SCAN_INTERVAL = 300
 POSITION_CHECK_INTERVAL = 60
 
+# 'candle_close' scans right after each PRIMARY_TIMEFRAME close, hottest pairs
+# first; 'interval' keeps the fixed SCAN_INTERVAL full-universe rescan
+SCAN_SCHEDULE_MODE = os.getenv('SCAN_SCHEDULE_MODE', 'candle_close')
+SCAN_CLOSE_DELAY = 5.0  # seconds after a close before the candle is requested
+SCAN_MAX_PAIRS_PER_ROUND = int(os.getenv('SCAN_MAX_PAIRS_PER_ROUND', '0'))  # 0 = no limit
+SCAN_MAX_BACKOFF_CANDLES = 8
+
+# Wall-clock budget of one scan_all_pairs call; pairs not fetched in time are
+# deferred to the front of the next scan (0 = no deadline)
+SCAN_DEADLINE_SECONDS = float(os.getenv('SCAN_DEADLINE_SECONDS', '240'))
+SCAN_ANALYSIS_RESERVE = 0.1  # share of the budget kept back for analysis and ranking
+
+# Bounded memo of analyze_setup/score_setup results keyed by candle fingerprint
+ANALYSIS_CACHE_SIZE = 512
+
+# Process pool for cache-missed setup analysis (0 workers = in-process only)
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '-1'))  # -1 = one per spare core
+ANALYSIS_POOL_MIN_PAIRS = int(os.getenv('ANALYSIS_POOL_MIN_PAIRS', '32'))  # smaller batches stay in-process
+
+# Universe pre-filter applied to one bulk ticker snapshot before any candle fetch
+PREFILTER_ENABLED = os.getenv('PREFILTER_ENABLED', 'true').lower() == 'true'
+PREFILTER_MAX_SPREAD_PCT = float(os.getenv('PREFILTER_MAX_SPREAD_PCT', '0.5'))
+PREFILTER_MIN_QUOTE_VOLUME = float(os.getenv('PREFILTER_MIN_QUOTE_VOLUME', '100000'))
+PREFILTER_MIN_ABS_CHANGE_PCT = float(os.getenv('PREFILTER_MIN_ABS_CHANGE_PCT', '0.3'))
+
 GLOBAL_PORTFOLIO_RISK = 0.02
 MAX_OPEN_POSITIONS = 1
 MAX_PORTFOLIO_DRAWDOWN = 0.15
 MIN_RR_RATIO = 2.0
 MIN_SETUP_CONFIDENCE = 80
 
+# Rolling return correlation used to keep concurrent positions diversified
+CORRELATION_WINDOW = 96  # PRIMARY_TIMEFRAME candles (1 day of 15m)
+MAX_PAIR_CORRELATION = float(os.getenv('MAX_PAIR_CORRELATION', '0.7'))
+
+# Block-bootstrap confidence intervals reported alongside the point metrics
+BOOTSTRAP_PATHS = int(os.getenv('BOOTSTRAP_PATHS', '2000'))
+BOOTSTRAP_CONFIDENCE = 0.95
+# Trailing returns resampled (0 = all); portfolio_value_history is never trimmed,
+# so this bounds the cost (~0.2s at 1440) however long the bot has run
+BOOTSTRAP_WINDOW = int(os.getenv('BOOTSTRAP_WINDOW', '1440'))
+
+# JSON weights for LinearFeatureModel; when set, main() runs ModelScoredStrategy
+FEATURE_MODEL_FILE = os.getenv('FEATURE_MODEL_FILE', '')
+
+# JSON list of sub-accounts ({name, api_key, secret_key, initial_capital, model_file});
+# when set, main() runs every account on one shared market-data snapshot per cycle
+ACCOUNTS_FILE = os.getenv('ACCOUNTS_FILE', '')
+
 TRADE_LOG_FILE = 'trades.json'
+# Positions, portfolio history and scheduler state, restored on restart
+CHECKPOINT_FILE = os.getenv('CHECKPOINT_FILE', 'bot_state.json')
+CHECKPOINT_INTERVAL = 60
 PORTFOLIO_LOG_FILE = 'portfolio_metrics.json'
 
 HORUS_API_KEY = os.getenv('HORUS_API_KEY')
@@ -74,6 +176,8 @@ HORUS_BASE_URL = "https://api.horusdata.xyz/v1"
 DATA_SOURCE_PRIMARY = 'HORUS'
 DATA_SOURCE_FALLBACK = 'COINGECKO'
 
+COINGECKO_RATE_LIMIT_PER_MINUTE = int(os.getenv('COINGECKO_RATE_LIMIT_PER_MINUTE', '10'))
+
 HORUS_REQUEST_TIMEOUT = 15
 HORUS_RETRY_LIMIT = 3
 HORUS_CACHE_DURATION = 60
@@ -82,33 +186,115 @@ HORUS_CACHE_DURATION = 60
 HORUS_RATE_LIMIT_PER_MINUTE = int(os.getenv('HORUS_RATE_LIMIT_PER_MINUTE', '60'))
 HORUS_MIN_REQUEST_INTERVAL = 60.0 / max(1, HORUS_RATE_LIMIT_PER_MINUTE)
 HORUS_LAST_REQUEST_TS = 0.0
+HORUS_FETCHED_AT = {}  # (timeframe, pair) -> when OHLC_HISTORY was last filled from Horus
+HORUS_BACKOFF_UNTIL = 0.0  # set from Retry-After on a 429; waited out by the next request
+_HORUS_THROTTLE_LOCK = threading.Lock()  # guards the two timestamps above
+
+# Per-source circuit breakers for market data
+BREAKER_FAILURE_RATE = 0.5        # open when >= 50% of the last calls failed
+BREAKER_SLOW_CALL_SECONDS = 5.0   # calls slower than this count as slow
+BREAKER_SLOW_CALL_RATE = 0.8      # open when >= 80% of the last calls were slow
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_OPEN_SECONDS = 120
+
+# Hedged fetches: start the fallback once the primary exceeds its recent latency percentile
+HEDGED_FETCH_ENABLED = os.getenv('HEDGED_FETCH_ENABLED', 'false').lower() == 'true'
+HEDGE_LATENCY_PERCENTILE = 0.95
+HEDGE_DEFAULT_DELAY = 3.0  # seconds, used until latency samples exist
+
+# Request planning: HORUS_RATE_LIMIT_PER_MINUTE is the ceiling; the planner
+# runs below it, backs off on 429s and sizes scans to the remaining budget
+REQUEST_RATE_SAFETY = float(os.getenv('REQUEST_RATE_SAFETY', '0.9'))  # start at this share of the limit
+REQUEST_PLAN_RESERVE = 0.15  # share of the window's capacity kept for requests outside the scan
+
+# requests Session with retries for Horus, built by get_horus_session() on first use
+HORUS_SESSION = None
+_HORUS_SESSION_LOCK = threading.Lock()
+
+# Keep-alive session for signed Roostoo calls, built by get_roostoo_session() on first use
+ROOSTOO_SESSION = None
+_ROOSTOO_SESSION_LOCK = threading.Lock()
+
+LOG_FILE = 'bot.log'
 
-# Configure a requests Session with retries for Horus
-HORUS_SESSION = requests.Session()
-retry_strategy = Retry(
-    total=HORUS_RETRY_LIMIT,
-    backoff_factor=1,
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["HEAD", "GET", "OPTIONS", "POST"]
-)
-adapter = HTTPAdapter(max_retries=retry_strategy)
-HORUS_SESSION.mount("https://", adapter)
-HORUS_SESSION.mount("http://", adapter)
-# We'll keep per-request headers rather than a global Authorization here because
-# HORUS_API_KEY may be None in dry-run/testing. Individual functions will set headers.
-
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def setup_logging(log_file: Optional[str] = LOG_FILE):
+    """Log to stderr and log_file; called by main() (a no-op once logging is configured)"""
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
+
+
+def get_horus_session():
+    """Shared Horus session with retries on 5xx
+
+    429 is deliberately not retried here, nor is Retry-After slept on:
+    urllib3 would wait inside session.get(), past any scan deadline and
+    unseen by the request planner. The callers' 429 branch holds requests
+    via _horus_backoff() instead.
+    """
+    global HORUS_SESSION
+    if HORUS_SESSION is None:
+        with _HORUS_SESSION_LOCK:
+            if HORUS_SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util import Retry
+
+                class CountedRetry(Retry):
+                    """Retry that counts each re-sent request against the Horus budget"""
+
+                    def increment(self, *args, **kwargs):
+                        retry = super().increment(*args, **kwargs)  # raises once retries are exhausted
+                        REQUEST_PLANNER.record('horus')
+                        return retry
+
+                retry_strategy = CountedRetry(
+                    total=HORUS_RETRY_LIMIT,
+                    backoff_factor=1,
+                    status_forcelist=[500, 502, 503, 504],
+                    # urllib3 retries any 413/429/503 carrying Retry-After unless told not to
+                    respect_retry_after_header=False,
+                    allowed_methods=["HEAD", "GET", "OPTIONS", "POST"]
+                )
+                adapter = HTTPAdapter(max_retries=retry_strategy)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # We'll keep per-request headers rather than a global Authorization here because
+                # HORUS_API_KEY may be None in dry-run/testing. Individual functions will set headers.
+                HORUS_SESSION = session
+    return HORUS_SESSION
+
+
+def get_roostoo_session():
+    """Shared Roostoo session for signed calls, pooled for ORDER_MAX_CONCURRENCY orders in flight
+
+    No automatic retries: a retried place_order could fill twice.
+    """
+    global ROOSTOO_SESSION
+    if ROOSTOO_SESSION is None:
+        with _ROOSTOO_SESSION_LOCK:
+            if ROOSTOO_SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                adapter = HTTPAdapter(pool_maxsize=max(10, ORDER_MAX_CONCURRENCY), max_retries=0)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                ROOSTOO_SESSION = session
+    return ROOSTOO_SESSION
+
+
 # ============================================================================
 # API Helper Functions
 # ============================================================================
@@ -118,12 +304,13 @@ def _get_timestamp() -> int:
     return int(time.time() * 1000)
 
 
-def _get_signed_headers(payload: Dict[str, Any]) -> tuple:
+def _get_signed_headers(payload: Dict[str, Any], credentials: Optional[tuple] = None) -> tuple:
     """
     Generate signed headers for RCL_TopLevelCheck endpoints
     
     Args:
         payload: dict of parameters
+        credentials: (api_key, secret_key) of a sub-account; defaults to API_KEY/SECRET_KEY
         
     Returns:
         tuple: (headers dict, final_payload dict, total_params_string)
@@ -136,15 +323,16 @@ def _get_signed_headers(payload: Dict[str, Any]) -> tuple:
     total_params_string = '&'.join([f"{k}={v}" for k, v in sorted_params])
     
     # Generate HMAC SHA256 signature
+    api_key, secret_key = credentials or (API_KEY, SECRET_KEY)
     signature = hmac.new(
-        SECRET_KEY.encode('utf-8'),
+        secret_key.encode('utf-8'),
         total_params_string.encode('utf-8'),
         hashlib.sha256
     ).hexdigest()
     
     # Create headers
     headers = {
-        'RST-API-KEY': API_KEY,
+        'RST-API-KEY': api_key,
         'MSG-SIGNATURE': signature
     }
     
@@ -153,6 +341,7 @@ def _get_signed_headers(payload: Dict[str, Any]) -> tuple:
 
 def get_server_time() -> Optional[Dict]:
     """Get server time (Auth: RCL_TSCheck)"""
+    import requests
     url = f"{BASE_URL}/v3/server_time"
     try:
         response = requests.get(url, timeout=10)
@@ -163,8 +352,33 @@ def get_server_time() -> Optional[Dict]:
         return None
 
 
+def get_exchange_info() -> Optional[Dict]:
+    """Get exchange information and per-pair trading rules (Auth: RCL_TSCheck)"""
+    import requests
+    url = f"{BASE_URL}/v3/exchange_info"
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        logger.error(f"Error getting exchange info: {e}")
+        return None
+
+
+# Concurrent identical market-data calls (scan, risk and confirmation checks
+# asking for the same pair at once) share one request and its result
+MARKET_DATA_FLIGHTS = {name: SingleFlight(name) for name in ('ticker', 'horus', 'coingecko')}
+
+# Sliding-window request spend per market-data source, and the scan plans sized from it
+REQUEST_PLANNER = RequestPlanner(safety=REQUEST_RATE_SAFETY, reserve=REQUEST_PLAN_RESERVE)
+REQUEST_PLANNER.register('horus', HORUS_RATE_LIMIT_PER_MINUTE)
+REQUEST_PLANNER.register('coingecko', COINGECKO_RATE_LIMIT_PER_MINUTE)
+
+
+@coalesced(MARKET_DATA_FLIGHTS['ticker'])
 def get_ticker(pair: str) -> Optional[Dict]:
     """Get market ticker (Auth: RCL_TSCheck)"""
+    import requests
     url = f"{BASE_URL}/v3/ticker"
     params = {
         'pair': pair,
@@ -179,19 +393,111 @@ def get_ticker(pair: str) -> Optional[Dict]:
         return None
 
 
+def normalize_ticker(t: dict) -> dict:
+    """One ticker in documented units: prices, Volume24h in coin units, Change24h in percent
+
+    Also accepts the exchange's alternate field names (MaxBid/MinAsk,
+    CoinTradeValue, and Change as a fraction rather than a percent).
+    """
+    if 'Change24h' in t:
+        change = float(t.get('Change24h') or 0)
+    else:
+        change = float(t.get('Change') or 0) * 100
+    return {
+        'LastPrice': float(t.get('LastPrice', 0) or 0),
+        'BidPrice': float(t.get('BidPrice', t.get('MaxBid', 0)) or 0),
+        'AskPrice': float(t.get('AskPrice', t.get('MinAsk', 0)) or 0),
+        'Volume24h': float(t.get('Volume24h', t.get('CoinTradeValue', 0)) or 0),
+        'Change24h': change,
+    }
+
+
+def get_all_tickers() -> Optional[Dict[str, Dict]]:
+    """Get one ticker snapshot for every pair (Auth: RCL_TSCheck)
+
+    Calls /v3/ticker without a pair and normalizes the response into
+    {pair: {'LastPrice', 'BidPrice', 'AskPrice', 'Volume24h', 'Change24h'}}.
+    Returns None (the pre-filter then fails open) when the response is not
+    a per-pair mapping or list of tickers.
+    """
+    import requests
+    url = f"{BASE_URL}/v3/ticker"
+    params = {'timestamp': _get_timestamp()}
+    try:
+        response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        logger.error(f"Error getting ticker snapshot: {e}")
+        return None
+
+    if not data or not data.get('Success', True):
+        logger.error(f"Ticker snapshot error: {data.get('ErrMsg') if data else 'No response'}")
+        return None
+
+    raw = data.get('Data', data.get('Ticker', {}))
+    if isinstance(raw, list):
+        raw = {t.get('Pair'): t for t in raw if isinstance(t, dict) and t.get('Pair')}
+    # A single-pair ticker (a dict of scalars) or anything else is not a snapshot
+    if not isinstance(raw, dict) or not raw or not all(isinstance(t, dict) for t in raw.values()):
+        logger.warning("Ticker snapshot has an unexpected shape, skipping the pre-filter")
+        return None
+
+    try:
+        return {pair: normalize_ticker(t) for pair, t in raw.items()}
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Ticker snapshot has malformed values ({e}), skipping the pre-filter")
+        return None
+
+
+# What the market-data call running on this thread did over HTTP, read by
+# _call_with_breaker(): round_trip is None until a request is sent
+_FETCH_CALL = threading.local()
+
+
+def _timed_get(get, url: str, **kwargs):
+    """get(url, **kwargs), adding its round trip (not throttle waits) to this thread's _FETCH_CALL"""
+    started = time.time()
+    try:
+        return get(url, **kwargs)
+    finally:
+        _FETCH_CALL.round_trip = (getattr(_FETCH_CALL, 'round_trip', None) or 0.0) + time.time() - started
+
+
 # Throttle helper for Horus to avoid hitting rate limits
 def _horus_throttle():
+    """Space Horus requests by the planner's effective rate and count the one about to be sent"""
     global HORUS_LAST_REQUEST_TS
-    now = time.time()
-    elapsed = now - HORUS_LAST_REQUEST_TS
-    if elapsed < HORUS_MIN_REQUEST_INTERVAL:
-        to_sleep = HORUS_MIN_REQUEST_INTERVAL - elapsed
+    interval = max(HORUS_MIN_REQUEST_INTERVAL, REQUEST_PLANNER.interval('horus'))
+    # Reserve the next send slot under the lock, then sleep without it, so
+    # concurrent callers queue up one interval apart
+    with _HORUS_THROTTLE_LOCK:
+        now = time.time()
+        ready_at = max(HORUS_LAST_REQUEST_TS + interval, HORUS_BACKOFF_UNTIL, now)
+        HORUS_LAST_REQUEST_TS = ready_at
+    if now < ready_at:
+        to_sleep = ready_at - now
         logger.debug(f"Throttling Horus requests: sleeping {to_sleep:.2f}s")
         time.sleep(to_sleep)
-    HORUS_LAST_REQUEST_TS = time.time()
+    REQUEST_PLANNER.record('horus')
+
+
+def _horus_backoff(retry_after: Optional[str]) -> float:
+    """Hold further Horus requests for Retry-After seconds (instead of sleeping inline)"""
+    global HORUS_BACKOFF_UNTIL
+    try:
+        wait = float(retry_after) if retry_after else HORUS_MIN_REQUEST_INTERVAL
+    except Exception:
+        wait = HORUS_MIN_REQUEST_INTERVAL
+    with _HORUS_THROTTLE_LOCK:
+        HORUS_BACKOFF_UNTIL = max(HORUS_BACKOFF_UNTIL, time.time() + wait)
+    REQUEST_PLANNER.rate_limited('horus')
+    _FETCH_CALL.rate_limited = True
+    return wait
 
 
 # Replace get_ohlc_from_horus to use HORUS_SESSION and handle 429 Retry-After
+@coalesced(MARKET_DATA_FLIGHTS['horus'])
 def get_ohlc_from_horus(pair: str, timeframe: str = '15m', limit: int = 50) -> Optional[list]:
     """Fetch historical OHLC candlestick data from Horus API
 
@@ -204,6 +510,7 @@ def get_ohlc_from_horus(pair: str, timeframe: str = '15m', limit: int = 50) -> O
         list: OHLC candles with timestamp, open, high, low, close, volume
         Returns None if API call fails
     """
+    import requests
     horus_pair = pair.replace('/', '-')
     url = f"{HORUS_BASE_URL}/ohlc"
 
@@ -222,16 +529,12 @@ def get_ohlc_from_horus(pair: str, timeframe: str = '15m', limit: int = 50) -> O
         logger.debug(f"Fetching OHLC from Horus: {pair} {timeframe}")
         # Throttle to respect rate limits
         _horus_throttle()
-        response = HORUS_SESSION.get(url, headers=headers, params=params, timeout=HORUS_REQUEST_TIMEOUT)
+        response = _timed_get(get_horus_session().get, url, headers=headers, params=params,
+                              timeout=HORUS_REQUEST_TIMEOUT)
         # If Horus returns 429 (Too Many Requests), respect Retry-After header
         if response.status_code == 429:
-            retry_after = response.headers.get('Retry-After')
-            try:
-                wait = float(retry_after) if retry_after else HORUS_MIN_REQUEST_INTERVAL
-            except Exception:
-                wait = HORUS_MIN_REQUEST_INTERVAL
-            logger.warning(f"Horus rate limited for {pair} - sleeping {wait}s")
-            time.sleep(wait)
+            wait = _horus_backoff(response.headers.get('Retry-After'))
+            logger.warning(f"Horus rate limited for {pair} - holding requests for {wait}s")
             return None
 
         response.raise_for_status()
@@ -263,6 +566,7 @@ def get_ohlc_from_horus(pair: str, timeframe: str = '15m', limit: int = 50) -> O
             if timeframe not in OHLC_HISTORY:
                 OHLC_HISTORY[timeframe] = {}
             OHLC_HISTORY[timeframe][pair] = deque(candles, maxlen=CANDLE_HISTORY_SIZE)
+            HORUS_FETCHED_AT[(timeframe, pair)] = time.time()
             return candles
         else:
             error_msg = data.get('error', data.get('message', 'Unknown error'))
@@ -292,15 +596,10 @@ def get_horus_available_pairs() -> Optional[list]:
     try:
         # throttle
         _horus_throttle()
-        response = HORUS_SESSION.get(url, headers=headers, timeout=HORUS_REQUEST_TIMEOUT)
+        response = get_horus_session().get(url, headers=headers, timeout=HORUS_REQUEST_TIMEOUT)
         if response.status_code == 429:
-            retry_after = response.headers.get('Retry-After')
-            try:
-                wait = float(retry_after) if retry_after else HORUS_MIN_REQUEST_INTERVAL
-            except Exception:
-                wait = HORUS_MIN_REQUEST_INTERVAL
-            logger.warning(f"Horus rate limited when fetching pairs - sleeping {wait}s")
-            time.sleep(wait)
+            wait = _horus_backoff(response.headers.get('Retry-After'))
+            logger.warning(f"Horus rate limited when fetching pairs - holding requests for {wait}s")
             return None
 
         response.raise_for_status()
@@ -322,57 +621,181 @@ def get_horus_available_pairs() -> Optional[list]:
 # Fallbacks and Aggregators
 # ---------------------------------------------------------------------------
 
-def get_ohlc_from_coingecko(pair: str, limit: int) -> Optional[list]:
-    """Fallback: Fetch from CoinGecko if Horus unavailable"""
-    try:
-        url = "https://api.coingecko.com/api/v3/coins/{coin_id}/ohlc"
-        coin_symbol = pair.split('/')[0]
-        coin_map = {
-            'BTC': 'bitcoin', 'ETH': 'ethereum', 'XRP': 'ripple',
-            'ADA': 'cardano', 'SOL': 'solana', 'DOGE': 'dogecoin',
-            'LTC': 'litecoin', 'BCH': 'bitcoin-cash', 'LINK': 'chainlink',
-            'BNB': 'binancecoin', 'MATIC': 'matic-network', 'ATOM': 'cosmos'
-        }
+def _coingecko_get(url: str, **kwargs):
+    """requests.get for the CoinGecko adapter, counted by REQUEST_PLANNER"""
+    import requests
+    REQUEST_PLANNER.record('coingecko')
+    response = _timed_get(requests.get, url, **kwargs)
+    if response.status_code == 429:
+        REQUEST_PLANNER.rate_limited('coingecko')
+        _FETCH_CALL.rate_limited = True
+    return response
 
-        coin_id = coin_map.get(coin_symbol, coin_symbol.lower())
-        response = requests.get(
-            url.format(coin_id=coin_id),
-            params={'vs_currency': 'usd', 'days': 7},
-            timeout=10
-        )
-        response.raise_for_status()
 
-        ohlc_array = response.json()
-        candles = []
-        # CoinGecko returns [timestamp, open, high, low, close]
-        for item in ohlc_array[-limit:]:
-            if len(item) >= 5:
-                timestamp, o, h, l, c = item
-                candles.append({
-                    'timestamp': int(timestamp / 1000),
-                    'open': float(o), 'high': float(h), 'low': float(l), 'close': float(c), 'volume': 0
-                })
-        return candles if candles else None
+COINGECKO = CoinGeckoAdapter(rate_limit_per_minute=COINGECKO_RATE_LIMIT_PER_MINUTE, http_get=_coingecko_get)
+
+
+@coalesced(MARKET_DATA_FLIGHTS['coingecko'])
+def get_ohlc_from_coingecko(pair: str, limit: int, timeframe: str = PRIMARY_TIMEFRAME) -> Optional[list]:
+    """Fallback: Fetch from CoinGecko if Horus unavailable
+
+    Resolves the coin through a cached symbol index, shares one cached
+    download per coin between callers and resamples it to timeframe.
+    """
+    try:
+        return COINGECKO.get_ohlc(pair, timeframe, limit)
     except Exception as e:
         logger.warning(f"CoinGecko fallback failed: {e}")
         return None
 
 
+def _on_breaker_event(event: dict):
+    log = logger.warning if event['to'] == 'open' else logger.info
+    log(f"Circuit breaker {event['source']}: {event['from']} -> {event['to']} ({event['reason']})")
+
+
+def _build_breaker(source: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(
+        source, failure_rate_threshold=BREAKER_FAILURE_RATE, slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate_threshold=BREAKER_SLOW_CALL_RATE, window_size=BREAKER_WINDOW,
+        min_calls=BREAKER_MIN_CALLS, open_duration=BREAKER_OPEN_SECONDS)
+    breaker.add_listener(_on_breaker_event)
+    return breaker
+
+
+MARKET_DATA_BREAKERS = {source: _build_breaker(source) for source in (DATA_SOURCE_PRIMARY, DATA_SOURCE_FALLBACK)}
+
+_HEDGE_EXECUTOR = None
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _HEDGE_EXECUTOR
+    if _HEDGE_EXECUTOR is None:
+        _HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='hedge')
+    return _HEDGE_EXECUTOR
+
+
+# Deadline-bounded scans fetch here so a stuck request can be abandoned;
+# spare workers let the next scan start while a straggler finishes
+_SCAN_FETCH_EXECUTOR = None
+
+
+def _get_scan_fetch_executor() -> ThreadPoolExecutor:
+    global _SCAN_FETCH_EXECUTOR
+    if _SCAN_FETCH_EXECUTOR is None:
+        _SCAN_FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='scan-fetch')
+    return _SCAN_FETCH_EXECUTOR
+
+
+def _call_with_breaker(source: str, fetch, *args) -> Optional[list]:
+    """Call a market-data fetcher and record its outcome on the source's breaker
+
+    The latency recorded is the HTTP round trip only: throttle and backoff
+    waits are our own pacing, not the source being slow. A rate-limited
+    call, or one that sent no request (it shared another caller's), is not
+    recorded at all.
+    """
+    breaker = MARKET_DATA_BREAKERS[source]
+    _FETCH_CALL.round_trip = None
+    _FETCH_CALL.rate_limited = False
+    try:
+        result = fetch(*args)
+    except Exception as e:
+        logger.error(f"Error fetching from {source}: {e}")
+        result = None
+    if _FETCH_CALL.rate_limited or _FETCH_CALL.round_trip is None:
+        breaker.ignore()
+    else:
+        breaker.record(result is not None, _FETCH_CALL.round_trip)
+    return result
+
+
+def _fetch_horus(pair: str, timeframe: str, limit: int) -> Optional[list]:
+    candles = _call_with_breaker(DATA_SOURCE_PRIMARY, get_ohlc_from_horus, pair, timeframe, limit)
+    return candles if candles and len(candles) >= 30 else None
+
+
+def _fetch_coingecko(pair: str, timeframe: str, limit: int) -> Optional[list]:
+    return _call_with_breaker(DATA_SOURCE_FALLBACK, get_ohlc_from_coingecko, pair, limit, timeframe) or None
+
+
+def _hedged_ohlc(pair: str, timeframe: str, limit: int) -> Optional[list]:
+    """Start Horus; if it is slower than its usual latency percentile, race CoinGecko against it"""
+    primary_breaker = MARKET_DATA_BREAKERS[DATA_SOURCE_PRIMARY]
+    delay = primary_breaker.latency_percentile(HEDGE_LATENCY_PERCENTILE) or HEDGE_DEFAULT_DELAY
+    executor = _get_hedge_executor()
+
+    primary = executor.submit(_fetch_horus, pair, timeframe, limit)
+    try:
+        candles = primary.result(timeout=delay)
+        if candles:
+            return candles
+        futures = []
+    except FuturesTimeoutError:
+        logger.info(f"Horus slower than p{HEDGE_LATENCY_PERCENTILE * 100:.0f} ({delay:.1f}s) for {pair}, hedging")
+        futures = [primary]
+
+    if MARKET_DATA_BREAKERS[DATA_SOURCE_FALLBACK].allow_request():
+        futures.append(executor.submit(_fetch_coingecko, pair, timeframe, limit))
+
+    for future in as_completed(futures):
+        candles = future.result()
+        if candles:
+            return candles
+    return None
+
+
+def cached_ohlc(pair: str, timeframe: str, limit: int = 50) -> Optional[list]:
+    """Horus candles fetched less than HORUS_CACHE_DURATION ago with no candle close since, or None"""
+    fetched_at = HORUS_FETCHED_AT.get((timeframe, pair))
+    if fetched_at is None:
+        return None
+    now = time.time()
+    period = timeframe_seconds(timeframe)
+    if now - fetched_at > HORUS_CACHE_DURATION or now // period != fetched_at // period:
+        return None
+    candles = OHLC_HISTORY.get(timeframe, {}).get(pair)
+    if not candles or len(candles) < limit:
+        return None
+    return list(candles)[-limit:]
+
+
 def get_historical_ohlc(pair: str, timeframe: str = '15m', limit: int = 50) -> Optional[list]:
-    """Fetch historical OHLC data - PRIMARY: Horus, FALLBACK: CoinGecko"""
-    logger.debug(f"Attempting to fetch {pair} from Horus...")
-    candles_horus = get_ohlc_from_horus(pair, timeframe, limit)
+    """Fetch historical OHLC data - PRIMARY: Horus, FALLBACK: CoinGecko
 
-    if candles_horus and len(candles_horus) >= 30:
-        logger.info(f"Successfully fetched {pair} candles from Horus")
-        return candles_horus
+    Candles Horus returned within HORUS_CACHE_DURATION (and the same candle
+    period) are served without a request. Sources whose circuit breaker is
+    open are skipped without a request. With HEDGED_FETCH_ENABLED the fallback
+    is started as soon as Horus exceeds its recent latency percentile instead
+    of after a full timeout.
+    """
+    candles = cached_ohlc(pair, timeframe, limit)
+    if candles:
+        return candles
+
+    if MARKET_DATA_BREAKERS[DATA_SOURCE_PRIMARY].allow_request():
+        logger.debug(f"Attempting to fetch {pair} from Horus...")
+        if HEDGED_FETCH_ENABLED:
+            candles = _hedged_ohlc(pair, timeframe, limit)
+            if candles:
+                logger.info(f"Successfully fetched {pair} candles (hedged)")
+                return candles
+            logger.error(f"Could not fetch candles for {pair} from any source")
+            return None
 
-    logger.warning(f"Horus unavailable for {pair}, trying CoinGecko fallback...")
-    candles_cg = get_ohlc_from_coingecko(pair, limit)
+        candles_horus = _fetch_horus(pair, timeframe, limit)
+        if candles_horus:
+            logger.info(f"Successfully fetched {pair} candles from Horus")
+            return candles_horus
+        logger.warning(f"Horus unavailable for {pair}, trying CoinGecko fallback...")
+    else:
+        logger.debug(f"Horus circuit open, using CoinGecko fallback for {pair}")
 
-    if candles_cg:
-        logger.info(f"Successfully fetched {pair} candles from CoinGecko (fallback)")
-        return candles_cg
+    if MARKET_DATA_BREAKERS[DATA_SOURCE_FALLBACK].allow_request():
+        candles_cg = _fetch_coingecko(pair, timeframe, limit)
+        if candles_cg:
+            logger.info(f"Successfully fetched {pair} candles from CoinGecko (fallback)")
+            return candles_cg
 
     logger.error(f"Could not fetch candles for {pair} from any source")
     return None
@@ -397,16 +820,20 @@ def get_available_pairs() -> list:
     return AVAILABLE_PAIRS
 
 
-def get_balance() -> Optional[Dict]:
+# Shared trading-rules cache used to pre-validate every order in place_order
+EXCHANGE_INFO = ExchangeInfoCache(get_exchange_info, refresh_interval=EXCHANGE_INFO_REFRESH_INTERVAL)
+
+
+def get_balance(credentials: Optional[tuple] = None) -> Optional[Dict]:
     """Get account balance (Auth: RCL_TopLevelCheck)"""
     url = f"{BASE_URL}/v3/balance"
     
     payload = {}
-    headers, final_payload, total_params_string = _get_signed_headers(payload)
+    headers, final_payload, total_params_string = _get_signed_headers(payload, credentials)
     headers['Content-Type'] = 'application/x-www-form-urlencoded'
     
     try:
-        response = requests.post(url, headers=headers, data=total_params_string, timeout=10)
+        response = get_roostoo_session().post(url, headers=headers, data=total_params_string, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -419,41 +846,56 @@ def place_order(
     side: str,
     order_type: str,
     quantity: str,
-    price: Optional[str] = None
+    price: Optional[str] = None,
+    reference_price: Optional[float] = None,
+    credentials: Optional[tuple] = None
 ) -> Optional[Dict]:
     """
     Place a new order (Auth: RCL_TopLevelCheck)
     
+    Quantity and price are rounded to the pair's exchange_info precision and
+    checked against its minimum order value before signing. Orders that would
+    be rejected return {'Success': False, 'ErrMsg': ...} without a request.
+    
     Args:
         pair: Trading pair (e.g., "BTC/USD")
         side: "BUY" or "SELL"
         order_type: "MARKET" or "LIMIT"
         quantity: Amount to trade (string)
         price: Required if order_type="LIMIT"
+        reference_price: Last price, used to check MARKET order value
+        credentials: (api_key, secret_key) of a sub-account
     """
     url = f"{BASE_URL}/v3/place_order"
     
-    payload = {
-        'pair': pair,
-        'side': side.upper(),
-        'type': order_type.upper(),
-        'quantity': str(quantity)
-    }
-    
     # Validate LIMIT order has price
     if order_type.upper() == "LIMIT":
         if price is None:
             logger.error("LIMIT order requires price parameter")
             return None
-        payload['price'] = str(price)
     elif price is not None:
         logger.warning("price parameter ignored for MARKET order")
+        price = None
+    
+    ok, quantity_str, price_str, reason = EXCHANGE_INFO.prepare_order(pair, order_type, quantity, price, reference_price)
+    if not ok:
+        logger.warning(f"Order rejected locally for {pair}: {reason} (quantity={quantity}, price={price})")
+        return {'Success': False, 'ErrMsg': f"pre-validation failed: {reason}"}
     
-    headers, final_payload, total_params_string = _get_signed_headers(payload)
+    payload = {
+        'pair': pair,
+        'side': side.upper(),
+        'type': order_type.upper(),
+        'quantity': quantity_str
+    }
+    if price_str is not None:
+        payload['price'] = price_str
+    
+    headers, final_payload, total_params_string = _get_signed_headers(payload, credentials)
     headers['Content-Type'] = 'application/x-www-form-urlencoded'
     
     try:
-        response = requests.post(url, headers=headers, data=total_params_string, timeout=10)
+        response = get_roostoo_session().post(url, headers=headers, data=total_params_string, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -466,7 +908,8 @@ def place_order(
 def query_order(
     order_id: Optional[str] = None,
     pair: Optional[str] = None,
-    pending_only: Optional[bool] = None
+    pending_only: Optional[bool] = None,
+    credentials: Optional[tuple] = None
 ) -> Optional[Dict]:
     """Query orders (Auth: RCL_TopLevelCheck)"""
     url = f"{BASE_URL}/v3/query_order"
@@ -474,16 +917,17 @@ def query_order(
     payload = {}
     if order_id:
         payload['order_id'] = str(order_id)
-    elif pair:
-        payload['pair'] = pair
+    else:
+        if pair:
+            payload['pair'] = pair
         if pending_only is not None:
             payload['pending_only'] = 'TRUE' if pending_only else 'FALSE'
     
-    headers, final_payload, total_params_string = _get_signed_headers(payload)
+    headers, final_payload, total_params_string = _get_signed_headers(payload, credentials)
     headers['Content-Type'] = 'application/x-www-form-urlencoded'
     
     try:
-        response = requests.post(url, headers=headers, data=total_params_string, timeout=10)
+        response = get_roostoo_session().post(url, headers=headers, data=total_params_string, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -491,7 +935,8 @@ def query_order(
         return None
 
 
-def cancel_order(order_id: Optional[str] = None, pair: Optional[str] = None) -> Optional[Dict]:
+def cancel_order(order_id: Optional[str] = None, pair: Optional[str] = None,
+                 credentials: Optional[tuple] = None) -> Optional[Dict]:
     """Cancel orders (Auth: RCL_TopLevelCheck)"""
     url = f"{BASE_URL}/v3/cancel_order"
     
@@ -501,11 +946,11 @@ def cancel_order(order_id: Optional[str] = None, pair: Optional[str] = None) ->
     elif pair:
         payload['pair'] = pair
     
-    headers, final_payload, total_params_string = _get_signed_headers(payload)
+    headers, final_payload, total_params_string = _get_signed_headers(payload, credentials)
     headers['Content-Type'] = 'application/x-www-form-urlencoded'
     
     try:
-        response = requests.post(url, headers=headers, data=total_params_string, timeout=10)
+        response = get_roostoo_session().post(url, headers=headers, data=total_params_string, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -513,6 +958,241 @@ def cancel_order(order_id: Optional[str] = None, pair: Optional[str] = None) ->
         return None
 
 
+# Every order goes through one engine: batches are submitted in parallel and
+# resting entry LIMITs are expired by ORDER_STALE_POLICY
+ORDER_EXECUTION = OrderExecutionEngine(place_order, query_order, cancel_order, max_workers=ORDER_MAX_CONCURRENCY,
+                                       limit_ttl=ORDER_LIMIT_TTL, stale_policy=ORDER_STALE_POLICY,
+                                       max_replaces=ORDER_MAX_REPLACES)
+
+
+def reconcile_entry(pair: str, position, credentials: Optional[tuple] = None, lock=None) -> Optional[str]:
+    """Move a PENDING_BUY position to OPEN (filled) or CLOSED (cancelled); returns the new status or None
+
+    lock, if given, is held while the position is read and written but not
+    during the order query.
+    """
+    lock = lock or nullcontext()
+    with lock:
+        order_id = position.order_id
+    if not order_id:
+        # Without an order id there is no telling a fill from an order still resting
+        return None
+
+    result = query_order(order_id=order_id, credentials=credentials)
+    matched = (result or {}).get('OrderMatched') or []
+    if not result or not result.get('Success') or not matched:
+        return None
+    with lock:
+        if position.status != TradeStatus.PENDING_BUY.value or str(position.order_id) != str(order_id):
+            return None  # expired, replaced or reconciled elsewhere while the query was out
+        return _apply_entry_status(position, order_id, matched[0])
+
+
+def _apply_entry_status(position, order_id, matched: dict) -> Optional[str]:
+    """Apply one query_order() match to a PENDING_BUY position; the new status, or None if still resting"""
+    status = matched.get('Status')
+    if status == 'FILLED':
+        position.entry_price = float(matched.get('FilledAverPrice') or position.entry_price or 0)
+        position.status = TradeStatus.OPEN.value
+        ORDER_EXECUTION.order_filled(order_id)
+    elif status == 'CANCELED' and float(matched.get('FilledQuantity') or 0) > 0:
+        # Partially filled before the cancel: the position is what did fill
+        position.position_size = float(matched['FilledQuantity'])
+        position.entry_price = float(matched.get('FilledAverPrice') or position.entry_price or 0)
+        position.status = TradeStatus.OPEN.value
+        ORDER_EXECUTION.forget(order_id)
+    elif status == 'CANCELED':
+        position.status = TradeStatus.CLOSED.value
+        ORDER_EXECUTION.forget(order_id)
+    else:
+        return None
+    return position.status
+
+
+def reprice_stale_entry(order, positions: Optional[PositionStore]) -> Optional[float]:
+    """Touch price to re-place a stale entry at, or None once the setup no longer pays MIN_RR_RATIO"""
+    position = positions.get(order.pair) if positions is not None else None
+    if position is None or str(position.order_id) != order.order_id:
+        return None
+    ticker = get_ticker(order.pair)
+    if not ticker or not ticker.get('Success'):
+        return None
+    data = normalize_ticker(ticker.get('Ticker', {}))
+    bullish = order.side == 'BUY'
+    price = (data['BidPrice'] if bullish else data['AskPrice']) or data['LastPrice']
+    stop, target = position.stop_loss, position.target
+    if price <= 0 or not stop or not target:
+        return None
+    if (price <= stop or price >= target) if bullish else (price >= stop or price <= target):
+        return None
+    if abs(target - price) / abs(price - stop) < MIN_RR_RATIO:
+        return None
+    return price
+
+
+def apply_order_events(events: list, positions: PositionStore) -> bool:
+    """Reflect ORDER_EXECUTION.expire_stale() events on the positions they belong to; True if any did"""
+    changed = False
+    for event in events:
+        position = positions.get(event['pair'])
+        if position is None or str(position.order_id) != str(event['order_id']):
+            continue
+        action = event['action']
+        filled = event.get('filled_quantity') or 0
+        if action == 'replaced':
+            position.order_id = event['new_order_id']
+            position.entry_price = event['price']
+        elif action == 'converted':
+            detail = event['response'].get('OrderDetail', {})
+            position.order_id = event['new_order_id']
+            market_price = float(detail.get('FilledAverPrice') or event['price'])
+            rest = float(event['quantity'])
+            # Partial LIMIT fills and the MARKET rest blend into one entry price
+            position.entry_price = ((filled * event['filled_price'] + rest * market_price) / (filled + rest)
+                                    if filled else market_price)
+            position.status = TradeStatus.OPEN.value
+        elif action == 'filled':
+            if filled:
+                position.entry_price = event['filled_price']
+            position.status = TradeStatus.OPEN.value
+        elif filled:
+            # Cancelled after a partial fill: the position is what did fill
+            position.position_size = filled
+            position.entry_price = event['filled_price']
+            position.status = TradeStatus.OPEN.value
+        else:
+            position.status = TradeStatus.CLOSED.value
+        logger.info(f"Stale entry {event['order_id']} for {event['pair']}: {action}")
+        changed = True
+    return changed
+
+
+def exit_trigger(position, price: float) -> Optional[str]:
+    """'STOP_LOSS' or 'TAKE_PROFIT' once price has crossed the position's stop or target"""
+    bullish = position.direction != 'bearish'
+    if position.stop_loss and (price <= position.stop_loss if bullish else price >= position.stop_loss):
+        return 'STOP_LOSS'
+    if position.target and (price >= position.target if bullish else price <= position.target):
+        return 'TAKE_PROFIT'
+    return None
+
+
+def exit_order(pair: str, position, exit_price: float, credentials: Optional[tuple] = None) -> dict:
+    """ORDER_EXECUTION.submit() arguments for the MARKET order that closes position"""
+    side = 'SELL' if position.direction != 'bearish' else 'BUY'
+    return {'pair': pair, 'side': side, 'order_type': 'MARKET', 'quantity': str(position.position_size or 0),
+            'reference_price': exit_price, 'credentials': credentials}
+
+
+# Position handling shared by MultiAssetTradingBot (PORTFOLIO_COINS) and each
+# TradingAccount (its own store and credentials). lock, where taken, guards
+# the store and is held only around reads and writes, never across an order
+# call; TradingAccount serializes its steps and passes none. label prefixes
+# log lines with the account name.
+
+def reconcile_pending_entries(positions: PositionStore, credentials: Optional[tuple] = None,
+                              label: str = '', lock=None) -> bool:
+    """reconcile_entry() every PENDING_BUY position; True if any changed status"""
+    prefix = f"[{label}] " if label else ''
+    changed = False
+    with lock or nullcontext():
+        pending = list(positions.with_status(TradeStatus.PENDING_BUY.value).items())
+    for pair, position in pending:
+        status = reconcile_entry(pair, position, credentials, lock)
+        if status == TradeStatus.OPEN.value:
+            logger.info(f"{prefix}✓ {pair} filled at {position.entry_price or 0:.2f}")
+        elif status == TradeStatus.CLOSED.value:
+            logger.info(f"{prefix}{pair} entry order was cancelled")
+        changed = changed or status is not None
+    return changed
+
+
+def position_exits(positions: PositionStore, prices: dict, label: str = '') -> list:
+    """(pair, reason, price) for every OPEN position whose stop or target the price has crossed"""
+    prefix = f"[{label}] " if label else ''
+    exits = []
+    for pair, position in positions.with_status(TradeStatus.OPEN.value).items():
+        price = prices.get(pair) or 0
+        reason = exit_trigger(position, price) if price > 0 else None
+        if reason == 'STOP_LOSS':
+            logger.warning(f"{prefix}⚠ {pair} HIT STOP-LOSS")
+        elif reason:
+            logger.info(f"{prefix}✓ {pair} HIT TAKE-PROFIT")
+        if reason:
+            exits.append((pair, reason, price))
+    return exits
+
+
+def close_positions(positions: PositionStore, exits: list, portfolio_manager: 'PortfolioManager',
+                    credentials: Optional[tuple] = None, label: str = '', lock=None) -> int:
+    """Close (pair, reason, exit_price) positions with MARKET orders submitted in parallel
+
+    Positions still OPEN with a size are claimed (moved to PENDING_SELL)
+    under lock, so two callers (e.g. the feed exit worker and the REST risk
+    check) cannot both submit an exit for one. The orders go out without
+    the lock; a failed exit puts its position back to OPEN. Returns the
+    number closed.
+    """
+    prefix = f"[{label}] " if label else ''
+    lock = lock or nullcontext()
+    with lock:
+        exits = [(pair, reason, price) for pair, reason, price in exits
+                 if positions.get(pair, {}).get('status') == TradeStatus.OPEN.value
+                 and positions.get(pair, {}).get('position_size', 0) != 0]
+        requests = [exit_order(pair, positions[pair], price, credentials) for pair, reason, price in exits]
+        for pair, _, _ in exits:
+            positions[pair].status = TradeStatus.PENDING_SELL.value
+    if not exits:
+        return 0
+
+    orders = ORDER_EXECUTION.submit_many(requests)
+    closed = 0
+    with lock:
+        for (pair, reason, exit_price), order in zip(exits, orders):
+            position = positions[pair]
+            if order and order.get('Success'):
+                sign = 1 if position.direction != 'bearish' else -1
+                position.pnl = (exit_price - (position.entry_price or 0)) * position.position_size * sign
+                position.status = TradeStatus.CLOSED.value
+                portfolio_manager.record_close(pair, position, reason, exit_price, position.pnl)
+                logger.info(f"{prefix}✓ {pair} closed ({reason}): PnL=${position.pnl:,.2f}")
+                closed += 1
+            else:
+                position.status = TradeStatus.OPEN.value
+                error = order.get('ErrMsg', 'Unknown error') if order else 'No response'
+                logger.error(f"{prefix}Failed to close {pair}: {error}")
+    return closed
+
+
+def select_trades(strategy: 'MultiAssetPercocolStrategy', portfolio_manager: 'PortfolioManager',
+                  positions: PositionStore, opportunities: dict, entering=()) -> list:
+    """(pair, opportunity) to enter: the best diversified ones that fit the free slots
+
+    entering are pairs whose entry orders another caller is placing right
+    now; they take a slot and are not selected again.
+    """
+    # Resting entries take a slot too: they become positions when they fill
+    held = positions.pairs_with_status(TradeStatus.OPEN.value, TradeStatus.PENDING_BUY.value)
+    held = list(held) + [pair for pair in entering if pair not in held]
+    if not portfolio_manager.can_open_new_position(len(held)):
+        return []
+    candidates = {pair: opp for pair, opp in opportunities.items() if pair not in held}
+    return strategy.select_opportunities(candidates, MAX_OPEN_POSITIONS - len(held), held)
+
+
+def open_selected_trades(strategy: 'MultiAssetPercocolStrategy', portfolio_manager: 'PortfolioManager',
+                         positions: PositionStore, opportunities: dict, credentials: Optional[tuple] = None,
+                         account: Optional[str] = None) -> int:
+    """Open the best diversified opportunities that fit the free slots; returns the number of orders placed"""
+    placed = 0
+    for pair, opportunity in select_trades(strategy, portfolio_manager, positions, opportunities):
+        balance = get_balance(credentials)
+        if balance and balance.get('Success') and strategy.execute_selected_trade(
+                pair, opportunity, balance, positions=positions, credentials=credentials, account=account):
+            placed += 1
+    return placed
+
+
 # ============================================================================
 # Trading Strategy (CUSTOMIZE THIS SECTION)
 # ============================================================================
@@ -682,6 +1362,8 @@ class PortfolioManager:
         self.portfolio_value_history = [initial_capital]
         self.trades_history = []
         self.returns_history = []
+        from trade_analytics import TradeAnalytics
+        self.trade_analytics = TradeAnalytics()
 
     def get_portfolio_metrics(self) -> dict:
         """Calculate Sharpe, Sortino, Calmar ratios and portfolio performance"""
@@ -698,6 +1380,8 @@ class PortfolioManager:
                    self.portfolio_value_history[i-1])
             returns.append(ret)
 
+        import numpy as np
+
         returns_array = np.array(returns)
         mean_return = np.mean(returns_array)
         std_return = np.std(returns_array)
@@ -736,6 +1420,16 @@ class PortfolioManager:
             'risk_adjusted_score': risk_adjusted_score
         }
 
+    def get_metric_confidence_intervals(self, n_paths: int = BOOTSTRAP_PATHS,
+                                        confidence: float = BOOTSTRAP_CONFIDENCE,
+                                        seed: Optional[int] = None, window: int = BOOTSTRAP_WINDOW) -> dict:
+        """Block-bootstrap confidence intervals for Sharpe, Sortino, Calmar and drawdown over the last window returns"""
+        from metrics_bootstrap import bootstrap_portfolio_metrics, returns_from_values
+
+        values = self.portfolio_value_history[-(window + 1):] if window > 0 else self.portfolio_value_history
+        returns = returns_from_values(values)
+        return bootstrap_portfolio_metrics(returns, n_paths=n_paths, confidence=confidence, seed=seed)
+
     def get_current_drawdown(self, current_value: float) -> float:
         """Calculate current drawdown"""
         peak = max(self.portfolio_value_history) if self.portfolio_value_history else current_value
@@ -769,6 +1463,29 @@ class PortfolioManager:
         self.trades_history.append(trade)
         logger.info(f"Trade logged: {side} {quantity:.4f} {pair} @ {price:.2f}")
 
+    def record_close(self, pair: str, position, reason: str, exit_price: float, pnl: float):
+        """Add a closed position to trade_analytics (trades_history only holds entries)"""
+        self.trade_analytics.record(pair, position.get('direction') or 'bullish', reason,
+                                    position.get('entry_time'), time.time(), position.get('entry_price') or 0.0,
+                                    exit_price, position.get('position_size', 0), pnl,
+                                    stop_loss=position.get('stop_loss'))
+
+    def trade_report(self, day_seconds: float = 86400) -> Optional[str]:
+        """One-line closed-trade summary with the last day's PnL and best/worst pairs"""
+        analytics = self.trade_analytics
+        if not len(analytics):
+            return None
+        total = analytics.summary()
+        today = analytics.summary(start=time.time() - day_seconds)
+        by_pair = list(analytics.by_pair().items())
+        avg_r = f"{total['avg_r']:+.2f}R" if total['avg_r'] is not None else "n/a"
+        text = (f"Trades: {total['trades']} closed | hit rate {total['hit_rate']:.0%} | avg {avg_r} | "
+                f"PnL ${total['pnl']:,.2f} (24h ${today['pnl']:,.2f} over {today['trades']})")
+        if len(by_pair) > 1:
+            text += (f" | best {by_pair[0][0]} ${by_pair[0][1]['pnl']:,.2f}, "
+                     f"worst {by_pair[-1][0]} ${by_pair[-1][1]['pnl']:,.2f}")
+        return text
+
     def update_portfolio_value(self, current_prices: dict, open_positions: dict):
         """Update portfolio value"""
         total_value = self.current_capital
@@ -782,6 +1499,23 @@ class PortfolioManager:
         self.portfolio_value_history.append(total_value)
         self.current_capital = total_value
 
+    def export_state(self) -> dict:
+        """Capital and history (for checkpoints)"""
+        return {
+            'initial_capital': self.initial_capital, 'current_capital': self.current_capital,
+            'portfolio_value_history': self.portfolio_value_history,
+            'trades_history': self.trades_history, 'returns_history': self.returns_history,
+            'trade_analytics': self.trade_analytics.export_state()
+        }
+
+    def restore_state(self, state: dict):
+        self.initial_capital = state.get('initial_capital', self.initial_capital)
+        self.current_capital = state.get('current_capital', self.current_capital)
+        self.portfolio_value_history = state.get('portfolio_value_history') or [self.current_capital]
+        self.trades_history = state.get('trades_history', [])
+        self.returns_history = state.get('returns_history', [])
+        self.trade_analytics.restore_state(state.get('trade_analytics'))
+
 
 class TradingStrategy:
     """Base trading strategy class - customize with your logic"""
@@ -1000,7 +1734,17 @@ class PercocolStrategy(TradingStrategy):
                 bearish_setup['confidence'] = confidence
                 bearish_setup['reason'] = [f'FVG {entry:.2f}', 'Bearish CHOCH', f'Trend: {trend_data["trend"]}', f'R:R {rr:.2f}:1']
 
-        return {'bullish_setup': bullish_setup, 'bearish_setup': bearish_setup, 'current_price': current_price, 'trend': trend_data['trend']}
+        atr = self.ta.calculate_atr(candles)
+        last_close = candles[-1]['close'] if candles else 0
+        signals = {
+            'bullish_fvg': bool(fvg_data['bullish_fvgs']), 'bearish_fvg': bool(fvg_data['bearish_fvgs']),
+            'bullish_choch': choch_data['bullish_choch'] is not None,
+            'bearish_choch': choch_data['bearish_choch'] is not None,
+            'atr_pct': atr / last_close if last_close else 0.0
+        }
+
+        return {'bullish_setup': bullish_setup, 'bearish_setup': bearish_setup, 'current_price': current_price,
+                'trend': trend_data['trend'], 'signals': signals}
 
     def score_setup(self, setup: dict) -> float:
         """Score setup quality 0-100"""
@@ -1024,59 +1768,342 @@ class PercocolStrategy(TradingStrategy):
         return min(position_size, max_size)
 
 
+class AnalysisCache:
+    """Bounded LRU memo of setup analysis, one entry per (pair, timeframe)
+
+    An entry is reused only while the candle fingerprint (length, last
+    timestamp, last close, window hash) and the strategy parameters match;
+    new candles or changed parameters replace it.
+    """
+
+    def __init__(self, maxsize: int = ANALYSIS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def fingerprint(candles: list) -> tuple:
+        """Cheap identity of a candle window"""
+        if not candles:
+            return (0, None, None, 0)
+        last = candles[-1]
+        window_hash = hash(tuple((c.get('timestamp'), c['open'], c['high'], c['low'], c['close']) for c in candles))
+        return (len(candles), last.get('timestamp'), last['close'], window_hash)
+
+    def get(self, pair: str, timeframe: str, fingerprint: tuple, params: tuple):
+        entry = self._entries.get((pair, timeframe))
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry['fingerprint'] != fingerprint or entry['params'] != params:
+            del self._entries[(pair, timeframe)]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end((pair, timeframe))
+        self.hits += 1
+        return entry['value']
+
+    def put(self, pair: str, timeframe: str, fingerprint: tuple, params: tuple, value):
+        self._entries[(pair, timeframe)] = {'fingerprint': fingerprint, 'params': params, 'value': value}
+        self._entries.move_to_end((pair, timeframe))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+# One analysis pool for the process, shared by every strategy (and account);
+# built by shared_analysis_pool() on first use
+ANALYSIS_POOL = None
+_ANALYSIS_POOL_LOCK = threading.Lock()
+
+
+def shared_analysis_pool() -> 'AnalysisPool':
+    """Process-wide analysis pool; strategies pass their own params per batch"""
+    global ANALYSIS_POOL
+    if ANALYSIS_POOL is None:
+        with _ANALYSIS_POOL_LOCK:
+            if ANALYSIS_POOL is None:
+                from analysis_pool import AnalysisPool, default_workers
+                workers = default_workers() if ANALYSIS_WORKERS < 0 else ANALYSIS_WORKERS
+                ANALYSIS_POOL = AnalysisPool(PercocolStrategy(), workers=workers, min_pairs=ANALYSIS_POOL_MIN_PAIRS)
+    return ANALYSIS_POOL
+
+
+def shutdown_analysis_pool():
+    global ANALYSIS_POOL
+    with _ANALYSIS_POOL_LOCK:
+        if ANALYSIS_POOL is not None:
+            ANALYSIS_POOL.shutdown()
+            ANALYSIS_POOL = None
+
+
 class MultiAssetPercocolStrategy(PercocolStrategy):
     """Scans all coins and selects the best opportunity"""
 
     def __init__(self, portfolio_manager: PortfolioManager):
         super().__init__()
         self.portfolio_manager = portfolio_manager
-        self.pair_analysis_cache = {}
+        self.pair_analysis_cache = AnalysisCache()
+        self.last_prefilter_report = {}
+        self.last_scan_heat = {}
+        self.last_scan_report = {}
+        self.deferred_pairs = []  # not fetched before the last scan's deadline; scanned first next time
+        from correlation_engine import CorrelationEngine
+        self.correlation_engine = CorrelationEngine(window=CORRELATION_WINDOW)
 
-    def scan_all_pairs(self) -> dict:
-        """Scan all available pairs"""
-        opportunities = {}
-        logger.info(f"Starting scan of {len(AVAILABLE_PAIRS)} trading pairs...")
-        scan_start_time = time.time()
-        scanned_count = 0
-        skipped_count = 0
+    def analysis_params(self) -> tuple:
+        """Strategy parameters that affect analyze_setup/score_setup output"""
+        return (self.min_rr_ratio,)
 
-        for pair in AVAILABLE_PAIRS:
-            try:
-                if PORTFOLIO_COINS.get(pair, {}).get('status') == TradeStatus.OPEN.value:
-                    skipped_count += 1
-                    continue
+    def get_analysis_pool(self) -> 'AnalysisPool':
+        """The process-wide pool; this strategy's params travel with each batch"""
+        return shared_analysis_pool()
 
-                candles = get_historical_ohlc(pair, PRIMARY_TIMEFRAME, limit=50)
-                if not candles or len(candles) < 30:
-                    skipped_count += 1
-                    continue
+    def analyze_pairs(self, timeframe: str, items: list) -> dict:
+        """analyze_setup + score_setup for many (pair, candles, ticker) items, memoized on the candle fingerprint
 
-                ticker = get_ticker(pair)
-                if not ticker or not ticker.get('Success'):
-                    skipped_count += 1
-                    continue
-
-                scanned_count += 1
-                setup = self.analyze_setup(candles, ticker)
-                bullish_score = self.score_setup(setup['bullish_setup'])
-                bearish_score = self.score_setup(setup['bearish_setup'])
-                best_score = max(bullish_score, bearish_score)
-
-                if best_score > MIN_SETUP_CONFIDENCE:
-                    opportunities[pair] = {
-                        'bullish_score': bullish_score, 'bearish_score': bearish_score,
-                        'best_score': best_score, 'setup': setup,
-                        'direction': 'bullish' if bullish_score > bearish_score else 'bearish'
-                    }
-            except Exception as e:
-                logger.error(f"Error scanning {pair}: {e}")
-                skipped_count += 1
+        Cache hits are served in-process; misses go to the analysis pool
+        in one batch and are cached on return.
+
+        Returns:
+            dict: pair -> (setup, bullish_score, bearish_score)
+        """
+        params = self.analysis_params()
+        results = {}
+        misses = []
+        for pair, candles, ticker in items:
+            fingerprint = AnalysisCache.fingerprint(candles)
+            cached = self.pair_analysis_cache.get(pair, timeframe, fingerprint, params)
+            current_price = ticker.get('Ticker', {}).get('LastPrice', 0)
+            if cached is None:
+                misses.append((pair, candles, current_price, fingerprint))
                 continue
+            setup, bullish_score, bearish_score = cached
+            if setup['current_price'] != current_price:
+                setup = dict(setup, current_price=current_price)
+            results[pair] = (setup, bullish_score, bearish_score)
+
+        if misses:
+            analyzed = self.get_analysis_pool().analyze([(pair, candles, price) for pair, candles, price, _ in misses],
+                                                        overrides={'min_rr_ratio': self.min_rr_ratio})
+            for pair, _, _, fingerprint in misses:
+                if pair in analyzed:
+                    self.pair_analysis_cache.put(pair, timeframe, fingerprint, params, analyzed[pair])
+                    results[pair] = analyzed[pair]
+        return results
+
+    def shutdown(self):
+        shutdown_analysis_pool()
+
+    def prefilter_pairs(self, pairs: list, snapshot: Optional[Dict[str, Dict]]) -> list:
+        """Drop pairs that cannot produce a tradeable setup
+
+        Uses one bulk ticker snapshot, so rejected pairs cost no Horus requests.
+        Fails open (keeps every pair) when no snapshot is available.
+        """
+        report = {'total': len(pairs), 'kept': len(pairs), 'rejected': 0, 'reasons': {}}
+        self.last_prefilter_report = report
+        if not PREFILTER_ENABLED or not snapshot:
+            return list(pairs)
+
+        kept = []
+        reasons = report['reasons']
+        for pair in pairs:
+            t = snapshot.get(pair)
+            reason = None
+            if not t or t['LastPrice'] <= 0:
+                reason = 'no_ticker'
+            else:
+                bid, ask, last = t['BidPrice'], t['AskPrice'], t['LastPrice']
+                if bid > 0 and ask > 0 and (ask - bid) / ((ask + bid) / 2) * 100 > PREFILTER_MAX_SPREAD_PCT:
+                    reason = 'wide_spread'
+                elif t['Volume24h'] * last < PREFILTER_MIN_QUOTE_VOLUME:
+                    reason = 'low_volume'
+                elif abs(t['Change24h']) < PREFILTER_MIN_ABS_CHANGE_PCT:
+                    reason = 'tiny_range'
+
+            if reason:
+                reasons[reason] = reasons.get(reason, 0) + 1
+            else:
+                kept.append(pair)
 
-        ranked_opportunities = sorted(opportunities.items(), key=lambda x: x[1]['best_score'], reverse=True)
-        scan_duration = time.time() - scan_start_time
+        report['kept'] = len(kept)
+        report['rejected'] = len(pairs) - len(kept)
+        if report['rejected']:
+            detail = ', '.join(f"{k}={v}" for k, v in sorted(reasons.items()))
+            logger.info(f"Pre-filter: kept {len(kept)}/{len(pairs)} pairs, rejected {report['rejected']} ({detail})")
+        return kept
+
+    def _rank_opportunities(self, analyzed: dict) -> dict:
+        """Opportunities above MIN_SETUP_CONFIDENCE, best first; records scan heat"""
+        opportunities = {}
+        for pair, (setup, bullish_score, bearish_score) in analyzed.items():
+            best_score = max(bullish_score, bearish_score)
+            self.last_scan_heat[pair] = setup_heat(setup['signals'], best_score > MIN_SETUP_CONFIDENCE)
+
+            if best_score > MIN_SETUP_CONFIDENCE:
+                opportunities[pair] = {
+                    'bullish_score': bullish_score, 'bearish_score': bearish_score,
+                    'best_score': best_score, 'setup': setup,
+                    'direction': 'bullish' if bullish_score > bearish_score else 'bearish'
+                }
+        return dict(sorted(opportunities.items(), key=lambda x: x[1]['best_score'], reverse=True))
+
+    def scan_snapshot(self, snapshot: MarketSnapshot, skip_pairs=()) -> dict:
+        """scan_all_pairs over a shared snapshot: no requests, same ranking"""
+        self.last_scan_heat = {}
+        skip = set(skip_pairs)
+        candidates = set(self.prefilter_pairs(list(snapshot.candles), snapshot.tickers))
+        items = [(pair, candles, {'Success': True, 'Ticker': dict(snapshot.tickers[pair], Pair=pair)})
+                 for pair, candles in snapshot.candles.items()
+                 if pair in candidates and pair not in skip and pair in snapshot.tickers and len(candles) >= 30]
+        opportunities = self._rank_opportunities(self.analyze_pairs(snapshot.timeframe, items))
+        self.correlation_engine.set_pairs(snapshot.pairs)
+        self.correlation_engine.update(snapshot.candles)
+        return opportunities
+
+    def _fetch_scan_pair(self, pair: str, snapshot: Optional[Dict[str, Dict]]) -> Optional[tuple]:
+        """(pair, candles, ticker) for one scan candidate, or None if it cannot be analyzed"""
+        try:
+            if PORTFOLIO_COINS.get(pair, {}).get('status') == TradeStatus.OPEN.value:
+                return None
+
+            candles = get_historical_ohlc(pair, PRIMARY_TIMEFRAME, limit=50)
+            if not candles or len(candles) < 30:
+                return None
 
-        logger.info(f"Scan complete: {scanned_count} scanned, {skipped_count} skipped, {len(ranked_opportunities)} found ({scan_duration:.1f}s)")
+            if snapshot and pair in snapshot:
+                ticker = {'Success': True, 'Ticker': dict(snapshot[pair], Pair=pair)}
+            else:
+                ticker = get_ticker(pair)
+            if not ticker or not ticker.get('Success'):
+                return None
+
+            return pair, candles, ticker
+        except Exception as e:
+            logger.error(f"Error scanning {pair}: {e}")
+            return None
+
+    def _plan_fetches(self, candidates: list, seconds: float) -> tuple:
+        """(pairs the Horus request budget affords, over-budget rest), both in candidate order"""
+        # Held pairs are not scanned, but their candles are refreshed after the
+        # scan for the correlation engine: that cost comes out of the budget first
+        open_pairs = sorted(PORTFOLIO_COINS.pairs_with_status(TradeStatus.OPEN.value))
+        held = set(open_pairs)
+        plan = REQUEST_PLANNER.plan('horus', open_pairs + [p for p in candidates if p not in held], seconds,
+                                    cost_per_pair=1, free=lambda p: cached_ohlc(p, PRIMARY_TIMEFRAME) is not None,
+                                    required=lambda p: p in held)
+        if plan['deferred']:
+            logger.warning(f"Request plan: {len(candidates)} pairs would cost {plan['predicted']} Horus requests, "
+                           f"budget {plan['budget']} - scanning {len(plan['pairs']) - len(open_pairs)}, "
+                           f"deferring {len(plan['deferred'])} to the next scan")
+        return [p for p in plan['pairs'] if p not in held], plan['deferred']
+
+    def scan_all_pairs(self, pairs: Optional[list] = None, budget: Optional[float] = None,
+                       universe: Optional[list] = None) -> dict:
+        """Scan all available pairs (or only the given subset)
+
+        universe is every pair this caller scans (default AVAILABLE_PAIRS; a
+        sharded worker passes its shard): pairs deferred by the last scan are
+        kept only while they are still in it.
+
+        With a budget (default SCAN_DEADLINE_SECONDS) fetching stops at the
+        deadline: the pair in flight is abandoned as timed out, the rest are
+        deferred to the front of the next scan, and only completed pairs are
+        ranked. Pairs beyond the request planner's Horus budget are deferred
+        the same way before any request is made. last_scan_report lists
+        completed, deferred, timed-out and over-budget pairs.
+        """
+        budget = SCAN_DEADLINE_SECONDS if budget is None else budget
+        scan_start_time = time.time()
+        fetch_seconds = budget * (1 - SCAN_ANALYSIS_RESERVE) if budget > 0 else None
+        fetch_deadline = scan_start_time + fetch_seconds if fetch_seconds else None
+        previous_heat = self.last_scan_heat
+        self.last_scan_heat = {}
+
+        requested = AVAILABLE_PAIRS if pairs is None else pairs
+        universe = set(AVAILABLE_PAIRS if universe is None else universe)
+        deferred = [p for p in self.deferred_pairs if p in universe]
+        deferred_set = set(deferred)
+        if pairs is None:
+            # A full scan the budget cannot cover gives the hottest pairs priority
+            requested = sorted(requested, key=lambda p: previous_heat.get(p, 0.5), reverse=True)
+        requested = deferred + [p for p in requested if p not in deferred_set]
+        # self.deferred_pairs is replaced once the fetch loop is done, so a scan
+        # that raises before then leaves them deferred for the next one
+
+        snapshot = get_all_tickers() if PREFILTER_ENABLED else None
+        candidates = self.prefilter_pairs(requested, snapshot)
+        candidates, over_budget = self._plan_fetches(candidates, fetch_seconds or SCAN_INTERVAL)
+        logger.info(f"Starting scan of {len(candidates)} trading pairs"
+                    + (f" ({len(deferred)} deferred from last scan)" if deferred else "") + "...")
+        report = {'pairs': requested, 'completed': [], 'deferred': [], 'timed_out': [],
+                  'over_budget': over_budget, 'budget': budget, 'duration': 0.0}
+        self.last_scan_report = report
+
+        # Fetch first, then analyze every fetched window in one batch
+        fetched = []
+        for i, pair in enumerate(candidates):
+            if fetch_deadline is None:
+                item = self._fetch_scan_pair(pair, snapshot)
+            else:
+                remaining = fetch_deadline - time.time()
+                if remaining <= 0:
+                    report['deferred'] = candidates[i:]
+                    break
+                future = _get_scan_fetch_executor().submit(self._fetch_scan_pair, pair, snapshot)
+                try:
+                    item = future.result(timeout=remaining)
+                except FuturesTimeoutError:
+                    report['timed_out'] = [pair]
+                    report['deferred'] = candidates[i + 1:]
+                    break
+            report['completed'].append(pair)
+            if item:
+                fetched.append(item)
+
+        # Untouched pairs go first next time; the one that stalled goes after them
+        self.deferred_pairs = report['deferred'] + over_budget + report['timed_out']
+
+        analyzed = self.analyze_pairs(PRIMARY_TIMEFRAME, fetched)
+        scanned_count = len(analyzed)
+        skipped_count = len(report['completed']) - scanned_count
+        ranked_opportunities = list(self._rank_opportunities(analyzed).items())
+        # The scan skips held pairs, but the diversification filter needs their
+        # returns most; refresh their candles (cached within the period)
+        for pair in PORTFOLIO_COINS.pairs_with_status(TradeStatus.OPEN.value):
+            get_historical_ohlc(pair, PRIMARY_TIMEFRAME, limit=50)
+        self.correlation_engine.set_pairs(AVAILABLE_PAIRS)
+        self.correlation_engine.update(OHLC_HISTORY.get(PRIMARY_TIMEFRAME, {}))
+        scan_duration = time.time() - scan_start_time
+        report['duration'] = scan_duration
+
+        prefiltered_count = self.last_prefilter_report.get('rejected', 0)
+        logger.info(f"Scan complete: {scanned_count} scanned, {skipped_count} skipped, {prefiltered_count} pre-filtered, "
+                    f"{len(ranked_opportunities)} found ({scan_duration:.1f}s)")
+        if report['deferred'] or report['timed_out']:
+            logger.warning(f"Scan deadline ({budget:.0f}s) reached: {len(report['completed'])} completed, "
+                           f"{len(report['deferred'])} deferred, {len(report['timed_out'])} timed out"
+                           + (f" ({', '.join(report['timed_out'])})" if report['timed_out'] else ""))
+        cache_stats = self.pair_analysis_cache.stats()
+        logger.info(f"Analysis cache: {cache_stats['hit_rate']:.0%} hit rate "
+                    f"({cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['size']} entries)")
         for i, (pair, opp) in enumerate(ranked_opportunities[:5]):
             logger.info(f"  #{i+1} {pair}: {opp['best_score']:.0f}% ({opp['direction']})")
 
@@ -1093,42 +2120,133 @@ class MultiAssetPercocolStrategy(PercocolStrategy):
         logger.info(f"Selected: {best_pair} (score: {best_opportunity['best_score']:.0f}%)")
         return best_pair, best_opportunity
 
-    def execute_selected_trade(self, pair: str, opportunity: dict, balance: dict):
-        """Execute selected trade"""
+    def select_opportunities(self, opportunities: dict, slots: int, held: list) -> list:
+        """Select up to slots opportunities, skipping pairs too correlated with held or chosen ones"""
+        if not opportunities or slots <= 0:
+            logger.info("No opportunities found")
+            return []
+
+        candidates = [(pair, opp['best_score']) for pair, opp in opportunities.items()]
+        chosen = self.correlation_engine.select_diversified(candidates, slots, held=held,
+                                                            max_correlation=MAX_PAIR_CORRELATION)
+        if len(chosen) < min(slots, len(candidates)):
+            logger.info(f"Correlation filter kept {len(chosen)} of {len(candidates)} opportunities "
+                        f"(max |corr| {MAX_PAIR_CORRELATION:.2f})")
+        for pair in chosen:
+            logger.info(f"Selected: {pair} (score: {opportunities[pair]['best_score']:.0f}%)")
+        return [(pair, opportunities[pair]) for pair in chosen]
+
+    def execute_selected_trade(self, pair: str, opportunity: dict, balance: dict,
+                               positions: Optional[PositionStore] = None, credentials: Optional[tuple] = None,
+                               lock=None, account: Optional[str] = None) -> bool:
+        """Execute selected trade (into PORTFOLIO_COINS unless a sub-account's store is given); True if placed
+
+        lock, if given, is held while the position is written, not while the order is placed.
+        account names the sub-account so ORDER_EXECUTION routes the order's TTL events to its store.
+        """
+        positions = PORTFOLIO_COINS if positions is None else positions
         direction = opportunity['direction']
         setup_data = opportunity['setup'][direction + '_setup']
 
         if not setup_data['valid']:
             logger.warning(f"Setup invalid for {pair}")
-            return
+            return False
 
         available_usd = balance.get('Balance', {}).get('USD', {}).get('Available', 0)
         position_size = self.calculate_position_size(setup_data['entry_price'], setup_data['stop_loss'], available_usd)
 
         if position_size < 0.001:
             logger.warning(f"Position size too small: {position_size}")
-            return
+            return False
 
         side = 'BUY' if direction == 'bullish' else 'SELL'
 
-        order = place_order(pair, side, "LIMIT", str(position_size), str(setup_data['entry_price']))
+        # Tracked by ORDER_EXECUTION: cancelled/replaced by policy if it rests past ORDER_LIMIT_TTL
+        order = ORDER_EXECUTION.submit(pair, side, "LIMIT", str(position_size), str(setup_data['entry_price']),
+                                       credentials=credentials, account=account)
 
         if order and order.get('Success'):
             order_id = order.get('OrderDetail', {}).get('OrderID')
-            PORTFOLIO_COINS.setdefault(pair, {})
-            PORTFOLIO_COINS[pair]['position_size'] = position_size
-            PORTFOLIO_COINS[pair]['entry_price'] = setup_data['entry_price']
-            PORTFOLIO_COINS[pair]['stop_loss'] = setup_data['stop_loss']
-            PORTFOLIO_COINS[pair]['target'] = setup_data['target']
-            PORTFOLIO_COINS[pair]['status'] = TradeStatus.PENDING_BUY.value
-            PORTFOLIO_COINS[pair]['entry_time'] = time.time()
-            PORTFOLIO_COINS[pair]['direction'] = direction
+            position_size = float(order.get('OrderDetail', {}).get('Quantity', position_size) or position_size)
+            with lock or nullcontext():
+                position = positions.ensure(pair)
+                position.position_size = position_size
+                position.entry_price = setup_data['entry_price']
+                position.stop_loss = setup_data['stop_loss']
+                position.target = setup_data['target']
+                position.status = TradeStatus.PENDING_BUY.value
+                position.entry_time = time.time()
+                position.direction = direction
+                position.order_id = order_id
+                position.pnl = 0
 
             self.portfolio_manager.log_trade(pair, side, position_size, setup_data['entry_price'], order_id, setup_data['stop_loss'], setup_data['target'])
             logger.info(f"Order placed: {order_id}")
-        else:
-            error = order.get('ErrMsg', 'Unknown error') if order else 'No response'
-            logger.error(f"Failed to execute: {error}")
+            return True
+        error = order.get('ErrMsg', 'Unknown error') if order else 'No response'
+        logger.error(f"Failed to execute: {error}")
+        return False
+
+
+class ModelScoredStrategy(MultiAssetPercocolStrategy):
+    """Scores the whole scanned universe with one model call on the feature matrix
+
+    The model's signed score picks the direction and its magnitude (capped at
+    100) is the confidence; entries are at the last price with ATR-based
+    stops and targets at min_rr_ratio.
+    """
+
+    def __init__(self, portfolio_manager: PortfolioManager, model):
+        super().__init__(portfolio_manager)
+        self.name = "Feature-Model Strategy"
+        self.model = model
+        from feature_matrix import FeatureBuilder
+        self.feature_builder = FeatureBuilder()
+        self.stop_atr_multiple = 1.5
+
+    @classmethod
+    def from_model_file(cls, portfolio_manager: PortfolioManager, path: str) -> 'ModelScoredStrategy':
+        """Strategy scored by the LinearFeatureModel weights in path"""
+        from feature_matrix import LinearFeatureModel
+        return cls(portfolio_manager, LinearFeatureModel.from_file(path))
+
+    def analyze_pairs(self, timeframe: str, items: list) -> dict:
+        candles_by_pair = {pair: candles for pair, candles, _ in items}
+        tickers = {pair: ticker for pair, _, ticker in items}
+        matrix = self.feature_builder.build(candles_by_pair, OHLC_HISTORY.get(CONFIRMATION_TIMEFRAME, {}),
+                                            pairs=list(candles_by_pair))
+        scores = self.model.predict(matrix)
+        results = {}
+        for pair, score in zip(matrix.pairs, scores.tolist()):
+            features = matrix.row(pair)
+            price = tickers[pair].get('Ticker', {}).get('LastPrice', 0) or candles_by_pair[pair][-1]['close']
+            results[pair] = self._model_setup(score, features, price)
+        return results
+
+    def _model_setup(self, score: float, features: dict, price: float) -> tuple:
+        """(setup, bullish_score, bearish_score) in the shape analyze_setup returns"""
+        confidence = min(abs(score), 100.0)
+        risk = features['atr_pct'] * price * self.stop_atr_multiple
+        direction = 'bullish' if score > 0 else 'bearish'
+        sign = 1 if score > 0 else -1
+        empty = {'valid': False, 'entry_price': None, 'stop_loss': None, 'target': None, 'rr_ratio': 0, 'confidence': 0, 'reason': []}
+        chosen = dict(empty)
+        if risk > 0 and confidence > 0:
+            chosen = {'valid': True, 'entry_price': price, 'stop_loss': price - sign * risk,
+                      'target': price + sign * risk * self.min_rr_ratio, 'rr_ratio': self.min_rr_ratio,
+                      'confidence': confidence, 'reason': [f'Model score {score:+.1f}']}
+        setup = {
+            'bullish_setup': chosen if direction == 'bullish' else dict(empty),
+            'bearish_setup': chosen if direction == 'bearish' else dict(empty),
+            'current_price': price,
+            'trend': 'uptrend' if features['ema_spread'] > 0 else 'downtrend',
+            'signals': {'bullish_fvg': bool(features['fvg_bull']), 'bearish_fvg': bool(features['fvg_bear']),
+                        'bullish_choch': bool(features['choch_bull']), 'bearish_choch': bool(features['choch_bear']),
+                        'atr_pct': features['atr_pct']}
+        }
+        bullish_score = confidence if chosen['valid'] and direction == 'bullish' else 0
+        bearish_score = confidence if chosen['valid'] and direction == 'bearish' else 0
+        return setup, bullish_score, bearish_score
 
 
 # ============================================================================
@@ -1244,6 +2362,10 @@ class TradingBot:
         except Exception as e:
             logger.error(f"Error in trading iteration: {e}", exc_info=True)
     
+    def _get_sleep_interval(self) -> float:
+        """Seconds to sleep between iterations"""
+        return CHECK_INTERVAL
+
     def run(self):
         """Main bot loop"""
         if not self.initialize():
@@ -1267,7 +2389,7 @@ class TradingBot:
                               f"({success_rate:.1f}%)")
                 
                 # Sleep before next iteration
-                time.sleep(CHECK_INTERVAL)
+                time.sleep(self._get_sleep_interval())
                 
         except KeyboardInterrupt:
             logger.info("Bot stopped by user")
@@ -1293,6 +2415,33 @@ class MultiAssetTradingBot(TradingBot):
         self.last_scan_time = 0
         self.position_check_interval = POSITION_CHECK_INTERVAL
         self.last_position_check = 0
+        self.state_lock = threading.RLock()  # held around position reads/writes, never across an HTTP call
+        self._entering = set()  # pairs whose entry orders are being placed (under state_lock)
+        self.scan_lock = threading.Lock()  # the strategy's caches are not shared between concurrent scans
+        self.scan_leader = None
+        self.checkpoint = CheckpointStore(CHECKPOINT_FILE, interval=CHECKPOINT_INTERVAL)
+        self.memory = MemoryAccountant(rss_budget=MEMORY_RSS_BUDGET_MB * MB)
+        self.last_memory_check = time.time()
+        self.last_metrics_report = 0
+        self._register_memory_structures()
+        if MEMORY_TRACEMALLOC:
+            self.memory.tracemalloc_diff()  # start tracing and take the baseline
+        self.scheduler = None
+        if SCAN_SCHEDULE_MODE == 'candle_close':
+            self.scheduler = ScanScheduler(PRIMARY_TIMEFRAME, close_delay=SCAN_CLOSE_DELAY,
+                                           max_backoff=SCAN_MAX_BACKOFF_CANDLES)
+        # Push feed state (MARKET_FEED_URL); see _start_market_feed()
+        self.feed = None
+        self.candle_store = None
+        self.feed_streaming = False
+        self._feed_lock = threading.Lock()
+        self._feed_dirty = set()
+        self._feed_exits = {}  # pair -> (reason, price) waiting for the exit worker
+        self._feed_exiting = set()  # pairs whose exit order is in flight
+        self._feed_analysis_wakeup = threading.Event()
+        self._feed_exit_wakeup = threading.Event()
+        self._feed_threads = []
+        self._feed_running = False
 
     def initialize(self) -> bool:
         logger.info("="*60)
@@ -1312,118 +2461,751 @@ class MultiAssetTradingBot(TradingBot):
         AVAILABLE_PAIRS = pairs
         logger.info(f"Loaded {len(AVAILABLE_PAIRS)} available pairs")
 
+        EXCHANGE_INFO.start()
         initialize_portfolio_tracking()
+        saved = self.checkpoint.load()
+        if DEPLOY_ROLE == 'leader':
+            if self.scan_leader is None:
+                from sharded_scan import ScanLeader
+                try:
+                    self.scan_leader = ScanLeader(AVAILABLE_PAIRS, address=SCAN_CLUSTER_ADDRESS,
+                                                  max_opportunity_age=self.scan_interval * 2)
+                except ValueError as e:
+                    logger.error(str(e))
+                    return False
+                self.scan_leader.start()
+                if SCAN_LOCAL_WORKERS:
+                    self.scan_leader.spawn_local_workers(SCAN_LOCAL_WORKERS)
+            else:
+                self.scan_leader.set_pairs(AVAILABLE_PAIRS)
+        elif self.scheduler:
+            self.scheduler.set_pairs(AVAILABLE_PAIRS)
+            self.scheduler.prime()
+        if saved:
+            self.restore_state(saved)
+            self.reconcile_with_exchange()
+            self.save_checkpoint(force=True)
+        if MARKET_FEED_URL and self.feed is None:
+            self._start_market_feed()
         return True
 
-    def run_iteration(self):
-        current_time = time.time()
+    # ------------------------------------------------------------------
+    # Push market data
+    # ------------------------------------------------------------------
+
+    def _start_market_feed(self):
+        """Connect the push feed and start its exit and analysis workers"""
+        from market_stream import MarketStream, CandleStore
+
+        self.candle_store = CandleStore(OHLC_HISTORY, CANDLE_HISTORY_SIZE)
+        self.feed = MarketStream(MARKET_FEED_URL, self._on_feed_update, self._on_feed_resync,
+                                 stale_after=MARKET_FEED_STALE_SECONDS)
+        self.memory.register('feed_tickers', lambda: self.feed.tickers, MEMORY_BUDGETS_MB.get('feed_tickers', 0) * MB)
+        self._feed_running = True
+        self._feed_threads = [threading.Thread(target=self._feed_exit_loop, name='feed-exits', daemon=True),
+                              threading.Thread(target=self._feed_analysis_loop, name='feed-analysis', daemon=True)]
+        for thread in self._feed_threads:
+            thread.start()
+        self.feed.start()
+        logger.info(f"Market feed enabled: {MARKET_FEED_URL} (REST polling while it is down)")
+
+    def _stop_market_feed(self):
+        if self.feed is None:
+            return
+        self._feed_running = False
+        self.feed.stop()
+        self._feed_analysis_wakeup.set()
+        self._feed_exit_wakeup.set()
+        for thread in self._feed_threads:
+            thread.join(timeout=10)
+        self._feed_threads = []
+
+    def streaming(self) -> bool:
+        """True while the push feed is healthy; REST scans and price polls are skipped meanwhile"""
+        healthy = self.feed is not None and self.feed.healthy()
+        if self.feed is not None and healthy != self.feed_streaming:
+            self.feed_streaming = healthy
+            if healthy:
+                logger.info("Market feed healthy: streaming candles and prices")
+            else:
+                logger.warning("Market feed unavailable: falling back to REST polling")
+        return healthy
+
+    def _on_feed_update(self, update: dict):
+        """Feed reader thread: queue exits for crossed stops/targets and mark updated pairs for analysis"""
+        pair = update['pair']
+        if update['type'] == 'ticker':
+            position = PORTFOLIO_COINS.get(pair)
+            if position is None or position.status != TradeStatus.OPEN.value:
+                return
+            reason = exit_trigger(position, update['LastPrice'])
+            if reason:
+                with self._feed_lock:
+                    if pair in self._feed_exits or pair in self._feed_exiting:
+                        return
+                    self._feed_exits[pair] = (reason, update['LastPrice'])
+                logger.warning(f"⚠ {pair} HIT {reason.replace('_', '-')} at {update['LastPrice']:.6g} (feed)")
+                self._feed_exit_wakeup.set()
+        elif update['type'] == 'candle' and update['timeframe'] == PRIMARY_TIMEFRAME:
+            # Unseeded series are marked too: the analysis worker seeds them from REST
+            if self.candle_store.apply(update) or not self.candle_store.length(PRIMARY_TIMEFRAME, pair):
+                with self._feed_lock:
+                    self._feed_dirty.add(pair)
+                self._feed_analysis_wakeup.set()
+        elif update['type'] == 'candle':
+            self.candle_store.apply(update)
+
+    def _on_feed_resync(self, reason: str):
+        """The feed could not replay a gap: drop streamed series so they are re-seeded from REST"""
+        if reason == 'reset':
+            self.candle_store.clear(PRIMARY_TIMEFRAME)
+
+    def _feed_exit_loop(self):
+        """Close every position whose stop/target the feed crossed, together"""
+        while self._feed_running:
+            self._feed_exit_wakeup.wait(timeout=1.0)
+            self._feed_exit_wakeup.clear()
+            with self._feed_lock:
+                exits, self._feed_exits = self._feed_exits, {}
+                self._feed_exiting.update(exits)
+            if not exits:
+                continue
+            try:
+                # _close_positions skips positions the REST risk check already closed
+                self._close_positions([(pair, reason, price) for pair, (reason, price) in exits.items()])
+            except Exception as e:
+                logger.error(f"Feed exit failed: {e}", exc_info=True)
+            finally:
+                with self._feed_lock:
+                    self._feed_exiting.difference_update(exits)
+
+    def _feed_analysis_loop(self):
+        """Analyze pairs with new candles, at most once per MARKET_FEED_ANALYSIS_INTERVAL"""
+        while self._feed_running:
+            self._feed_analysis_wakeup.wait(timeout=1.0)
+            self._feed_analysis_wakeup.clear()
+            with self._feed_lock:
+                pairs, self._feed_dirty = self._feed_dirty, set()
+            # While the feed is unhealthy the REST scan covers every pair
+            if pairs and self.streaming():
+                try:
+                    self._analyze_feed_pairs(pairs)
+                except Exception as e:
+                    logger.error(f"Feed analysis failed: {e}", exc_info=True)
+            time.sleep(MARKET_FEED_ANALYSIS_INTERVAL)
+
+    def _analyze_feed_pairs(self, pairs: set):
+        """Analyze updated pairs from the streamed store and trade, then seed short series from REST"""
+        tradable = set(AVAILABLE_PAIRS)
+        unseeded = {pair for pair in pairs if self.candle_store.length(PRIMARY_TIMEFRAME, pair) < 30}
+        pairs = {pair for pair in pairs if pair in tradable and pair not in unseeded}
 
-        try:
-            if current_time - self.last_scan_time > self.scan_interval:
-                # cast strategy to concrete type for static analysis
-                strategy_var = cast(MultiAssetPercocolStrategy, self.strategy)
+        if pairs:
+            # Every series goes into the snapshot so the correlation universe stays
+            # stable; only the updated pairs are analyzed (the rest are skipped)
+            candles = self.candle_store.windows(PRIMARY_TIMEFRAME)
+            tickers = {pair: self.feed.tickers[pair] for pair in candles if pair in self.feed.tickers}
+            skip = set(PORTFOLIO_COINS.pairs_with_status(TradeStatus.OPEN.value, TradeStatus.PENDING_BUY.value))
+            skip.update(pair for pair in candles if pair not in pairs)
+            snapshot = MarketSnapshot(time.time(), PRIMARY_TIMEFRAME, tickers, candles)
+            strategy_var = cast(MultiAssetPercocolStrategy, self.strategy)
+            with self.scan_lock:
+                opportunities = strategy_var.scan_snapshot(snapshot, skip)
+            if opportunities:
+                self._trade_opportunities(opportunities)
+            self.last_scan_time = time.time()
+
+        # Seeded series are analyzed on their next update
+        for pair in unseeded & tradable:
+            if not self._feed_running:
+                break
+            candles = get_historical_ohlc(pair, PRIMARY_TIMEFRAME, limit=50)
+            if candles:
+                self.candle_store.seed(PRIMARY_TIMEFRAME, pair, candles)
+
+    # ------------------------------------------------------------------
+    # Checkpointing and crash recovery
+    # ------------------------------------------------------------------
+
+    def snapshot_state(self) -> dict:
+        """Everything needed to resume after a restart"""
+        with self.state_lock:
+            return {
+                'positions': PORTFOLIO_COINS.export(),
+                'portfolio': self.portfolio_manager.export_state(),
+                'scheduler': self.scheduler.export_state() if self.scheduler else {},
+                'last_scan_time': self.last_scan_time,
+                'stats': self.stats
+            }
 
-                opportunities = strategy_var.scan_all_pairs()
-                open_positions_count = sum(1 for d in PORTFOLIO_COINS.values() if d.get('status') == TradeStatus.OPEN.value)
+    def save_checkpoint(self, force: bool = False):
+        self.checkpoint.maybe_save(self.snapshot_state, force=force)
+
+    def restore_state(self, state: dict):
+        """Load a snapshot from snapshot_state() in one step"""
+        with self.state_lock:
+            PORTFOLIO_COINS.load(state.get('positions', {}))
+            self.portfolio_manager.restore_state(state.get('portfolio', {}))
+            if self.scheduler and state.get('scheduler'):
+                self.scheduler.restore_state(state['scheduler'])
+            self.last_scan_time = state.get('last_scan_time', 0)
+            self.stats.update(state.get('stats', {}))
+        active = PORTFOLIO_COINS.count(TradeStatus.OPEN.value, TradeStatus.PENDING_BUY.value)
+        logger.info(f"Restored {len(PORTFOLIO_COINS)} position records ({active} active), "
+                    f"portfolio value ${self.portfolio_manager.current_capital:,.2f}")
+
+    def reconcile_with_exchange(self):
+        """Check restored positions against one balance call and one pending-order query
+
+        - Pending entries whose order is no longer pending are queried by
+          order id: OPEN if it filled, CLOSED if it was cancelled. Long entries
+          the query cannot settle are OPEN if the coin is held (available or
+          locked in an order), otherwise CLOSED. Entries still pending get
+          their LIMIT time-to-live back.
+        - Long positions whose coin is no longer held were closed while the
+          bot was down and are marked CLOSED.
+        - Pending orders the bot does not track are only reported.
+        """
+        balance = get_balance()
+        pending = query_order(pending_only=True)
+        if not balance or not balance.get('Success') or not pending:
+            logger.warning("Startup reconciliation skipped: exchange state unavailable, keeping checkpoint state")
+            return
 
-                if self.portfolio_manager.can_open_new_position(open_positions_count):
-                    pair, opportunity = strategy_var.select_best_opportunity(opportunities)
-                    if pair and opportunity:
-                        balance = get_balance()
-                        if balance and balance.get('Success'):
-                            strategy_var.execute_selected_trade(pair, opportunity, balance)
+        wallet = balance.get('Balance', {})
+        pending_ids = {str(o.get('OrderID')) for o in pending.get('OrderMatched', []) or []}
+
+        def held(pair: str) -> float:
+            coin = wallet.get(pair.split('/')[0], {})
+            return coin.get('Available', 0) + coin.get('Locked', 0)
+
+        unsettled = []
+        with self.state_lock:
+            tracked_ids = set()
+            for pair, position in PORTFOLIO_COINS.with_status(TradeStatus.PENDING_BUY.value).items():
+                tracked_ids.add(str(position.order_id))
+                if str(position.order_id) in pending_ids:
+                    # Still resting: its TTL keeps counting from the original entry time
+                    ORDER_EXECUTION.track(position.order_id, pair, 'BUY' if position.direction == 'bullish' else 'SELL',
+                                          position.position_size, position.entry_price,
+                                          submitted_at=position.entry_time)
+                else:
+                    unsettled.append((pair, position))
+
+        # The order itself says whether it filled or was cancelled; one query
+        # per entry, so they go out without state_lock (reconcile_entry takes
+        # it only to read and apply)
+        statuses = {pair: reconcile_entry(pair, position, lock=self.state_lock) for pair, position in unsettled}
+
+        with self.state_lock:
+            for pair, position in unsettled:
+                status = statuses[pair]
+                if status is None:
+                    if position.status != TradeStatus.PENDING_BUY.value:
+                        continue  # settled elsewhere while the queries were out
+                    if position.direction == 'bullish':
+                        # Order unknown: a long entry that filled left the coin in the wallet
+                        position.status = TradeStatus.OPEN.value if held(pair) > 0 else TradeStatus.CLOSED.value
+                        status = position.status
+                if status == TradeStatus.OPEN.value:
+                    logger.info(f"Recovery: {pair} entry filled while offline, now OPEN")
+                elif status == TradeStatus.CLOSED.value:
+                    logger.info(f"Recovery: {pair} entry order gone unfilled, now CLOSED")
+                else:
+                    # A short entry's fill lowers the balance, which cannot be told from the wallet alone
+                    logger.warning(f"Recovery: {pair} entry order state unknown, kept pending for the next check")
+
+            for pair, position in PORTFOLIO_COINS.with_status(TradeStatus.PENDING_SELL.value).items():
+                # Stopped while its exit was in flight: treat as open, the wallet check below settles it
+                position.status = TradeStatus.OPEN.value
+                logger.warning(f"Recovery: {pair} exit order outcome unknown, back to OPEN")
+
+            for pair, position in PORTFOLIO_COINS.with_status(TradeStatus.OPEN.value).items():
+                tracked_ids.add(str(position.order_id))
+                if position.direction == 'bullish' and held(pair) < position.position_size * 0.01:
+                    position.status = TradeStatus.CLOSED.value
+                    logger.warning(f"Recovery: {pair} no longer held on the exchange, marked CLOSED")
+
+        untracked = pending_ids - tracked_ids
+        if untracked:
+            logger.warning(f"Recovery: {len(untracked)} pending exchange orders are not tracked: {sorted(untracked)}")
+
+    # ------------------------------------------------------------------
+    # Memory accounting
+    # ------------------------------------------------------------------
+
+    def _register_memory_structures(self):
+        """Register the structures that grow for the life of the process"""
+        pm = self.portfolio_manager
+        strategy = cast(MultiAssetPercocolStrategy, self.strategy)
+        # Getters, not objects: restore_state() replaces the history lists
+        structures = {
+            'ohlc_history': lambda: OHLC_HISTORY,
+            'portfolio_value_history': lambda: pm.portfolio_value_history,
+            'trades_history': lambda: pm.trades_history,
+            'trade_analytics': lambda: pm.trade_analytics,
+            'returns_history': lambda: pm.returns_history,
+            'analysis_cache': lambda: strategy.pair_analysis_cache,
+            'positions': lambda: PORTFOLIO_COINS,
+        }
+        if isinstance(strategy, ModelScoredStrategy):
+            structures['feature_rows'] = lambda: strategy.feature_builder._rows
+        # These gain an entry per check or per trade by design; only their budget says they are too big
+        append_only = {'portfolio_value_history', 'trades_history', 'trade_analytics', 'returns_history'}
+        for name, getter in structures.items():
+            self.memory.register(name, getter, MEMORY_BUDGETS_MB.get(name, 0) * MB, append_only=name in append_only)
+
+    def check_memory(self):
+        """Log structure sizes and leak warnings (plus allocation growth with MEMORY_TRACEMALLOC)"""
+        self.memory.check()
+        if MEMORY_TRACEMALLOC:
+            self.memory.tracemalloc_diff()
+
+    def shutdown(self):
+        """Release background resources (scanner workers, refresh threads)"""
+        self._stop_market_feed()
+        self.save_checkpoint(force=True)
+        ORDER_EXECUTION.shutdown()
+        EXCHANGE_INFO.stop()
+        cast(MultiAssetPercocolStrategy, self.strategy).shutdown()
+        if self.scan_leader:
+            self.scan_leader.stop()
 
-                self.last_scan_time = current_time
+    def run_iteration(self):
+        current_time = time.time()
+
+        try:
+            self._run_scan_cycle(current_time)
 
             if current_time - self.last_position_check > self.position_check_interval:
                 self._manage_open_positions()
-                self._update_portfolio_metrics()
                 self.last_position_check = current_time
 
+            if current_time - self.last_metrics_report > METRICS_REPORT_INTERVAL:
+                self._update_portfolio_metrics()
+                self.last_metrics_report = current_time
+
+            if MEMORY_REPORT_INTERVAL and current_time - self.last_memory_check > MEMORY_REPORT_INTERVAL:
+                self.check_memory()
+                self.last_memory_check = current_time
+
         except Exception as e:
             logger.error(f"Error in run_iteration: {e}", exc_info=True)
 
-    def _manage_open_positions(self):
-        current_prices = {}
-        for pair, coin_data in PORTFOLIO_COINS.items():
-            if coin_data.get('status') in [TradeStatus.OPEN.value, TradeStatus.PENDING_BUY.value]:
-                ticker = get_ticker(pair)
-                if ticker and ticker.get('Success'):
-                    current_prices[pair] = ticker.get('Ticker', {}).get('LastPrice', 0)
+    def _run_scan_cycle(self, current_time: float) -> bool:
+        """Scan due pairs and trade the best opportunity; returns True if a scan ran"""
+        if self.scan_leader:
+            if not self.scan_leader.has_updates():
+                return False
+            self._trade_opportunities(self.scan_leader.collect_opportunities())
+            self.last_scan_time = current_time
+            return True
 
-        for pair, coin_data in PORTFOLIO_COINS.items():
-            status = coin_data.get('status')
-            if status not in [TradeStatus.OPEN.value, TradeStatus.PENDING_BUY.value] or pair not in current_prices:
-                continue
+        if self.streaming():
+            return False
 
-            current_price = current_prices[pair]
+        # cast strategy to concrete type for static analysis
+        strategy_var = cast(MultiAssetPercocolStrategy, self.strategy)
 
-            if status == TradeStatus.PENDING_BUY.value:
-                pending = query_order(pair=pair, pending_only=True)
-                if pending and pending.get('Success') and len(pending.get('OrderMatched', [])) > 0:
-                    coin_data['status'] = TradeStatus.OPEN.value
-                    logger.info(f"✓ {pair} filled at {current_price:.2f}")
+        scan_pairs = None
+        scan_due = current_time - self.last_scan_time > self.scan_interval
+        if self.scheduler:
+            # Pairs deferred by the last scan's deadline are overdue already
+            scan_pairs = self.scheduler.due_pairs(current_time, SCAN_MAX_PAIRS_PER_ROUND or None)
+            scan_due = bool(scan_pairs or strategy_var.deferred_pairs)
 
-            stop_loss = coin_data.get('stop_loss')
-            direction = coin_data.get('direction', 'bullish')
+        if not scan_due:
+            return False
 
-            if stop_loss and ((direction == 'bullish' and current_price <= stop_loss) or (direction == 'bearish' and current_price >= stop_loss)):
-                logger.warning(f"⚠ {pair} HIT STOP-LOSS")
-                self._close_position(pair, "STOP_LOSS", current_price)
-                continue
+        try:
+            with self.scan_lock:
+                opportunities = strategy_var.scan_all_pairs(scan_pairs)
+        except Exception:
+            # Popped from the schedule (or taken off the deferred list) but never
+            # recorded: without this they would never be due again
+            if self.scheduler:
+                self.scheduler.requeue(set(scan_pairs) | set(strategy_var.last_scan_report.get('pairs', ())))
+            raise
+        if self.scheduler:
+            # Deferred and timed-out pairs stay unscheduled until a scan completes them
+            unfinished = set(strategy_var.deferred_pairs)
+            for pair in strategy_var.last_scan_report['pairs']:
+                if pair not in unfinished:
+                    self.scheduler.record(pair, strategy_var.last_scan_heat.get(pair, 0.0))
+            stats = self.scheduler.stats()
+            logger.info(f"Scheduler: {stats['hot']} hot, {stats['warm']} warm, {stats['cold']} cold pairs")
+
+        self._trade_opportunities(opportunities)
+        self.last_scan_time = current_time
+        return True
 
-            target = coin_data.get('target')
-            if target and ((direction == 'bullish' and current_price >= target) or (direction == 'bearish' and current_price <= target)):
-                logger.info(f"✓ {pair} HIT TAKE-PROFIT")
-                self._close_position(pair, "TAKE_PROFIT", current_price)
+    def _trade_opportunities(self, opportunities: dict):
+        """Open positions in the best diversified opportunities that fit the free slots
 
-        self.portfolio_manager.update_portfolio_value(current_prices, PORTFOLIO_COINS)
+        Selection runs under state_lock; balances are read and orders placed
+        without it. Pairs being entered are reserved in _entering, so a
+        concurrent caller (the feed analysis worker) counts their slots and
+        does not pick them again.
+        """
+        strategy_var = cast(MultiAssetPercocolStrategy, self.strategy)
+        with self.state_lock:
+            selected = select_trades(strategy_var, self.portfolio_manager, PORTFOLIO_COINS, opportunities,
+                                     self._entering)
+            self._entering.update(pair for pair, _ in selected)
+        placed = 0
+        try:
+            for pair, opportunity in selected:
+                balance = get_balance()
+                if balance and balance.get('Success') and strategy_var.execute_selected_trade(
+                        pair, opportunity, balance, lock=self.state_lock):
+                    placed += 1
+        finally:
+            with self.state_lock:
+                self._entering.difference_update(pair for pair, _ in selected)
+        if placed:
+            self.save_checkpoint(force=True)
+
+    def _seconds_until_next_scan(self) -> float:
+        """Seconds until the scheduler (or the fixed scan interval) wants the next scan"""
+        now = time.time()
+        if self.scheduler:
+            next_due = self.scheduler.next_due_time()
+            return self.scan_interval if next_due is None else max(0.0, next_due - now)
+        return max(0.0, self.last_scan_time + self.scan_interval - now)
+
+    def _get_sleep_interval(self) -> float:
+        """Wake up for the next scheduled scan if it comes before the next position check"""
+        sleep_for = min(CHECK_INTERVAL, self.position_check_interval)
+        if self.scheduler:
+            sleep_for = min(sleep_for, max(1.0, self._seconds_until_next_scan()))
+        return sleep_for
+
+    def _manage_open_positions(self, reconcile: bool = True):
+        """Enforce stops/targets; reconcile=False leaves pending fills to _reconcile_orders"""
+        if reconcile:
+            self._reconcile_orders()
+        with self.state_lock:
+            active = PORTFOLIO_COINS.pairs_with_status(TradeStatus.OPEN.value)
+        current_prices = {}
+        streaming = self.streaming()
+        for pair in active:
+            price = self.feed.price(pair) if streaming else None
+            if price:
+                current_prices[pair] = price
+                continue
+            ticker = get_ticker(pair)
+            if ticker and ticker.get('Success'):
+                current_prices[pair] = ticker.get('Ticker', {}).get('LastPrice', 0)
+
+        with self.state_lock:
+            exits = position_exits(PORTFOLIO_COINS, current_prices)
+        # Stops that trigger together exit together
+        self._close_positions(exits)
+
+        with self.state_lock:
+            self.portfolio_manager.update_portfolio_value(current_prices,
+                                                          PORTFOLIO_COINS.with_status(TradeStatus.OPEN.value))
+        self.save_checkpoint()
+
+    def _reconcile_orders(self):
+        """Expire stale entry orders, then mark filled ones as open (cancelled ones as closed)"""
+        self._expire_stale_orders()
+        if reconcile_pending_entries(PORTFOLIO_COINS, lock=self.state_lock):
+            self.save_checkpoint(force=True)
+
+    def _expire_stale_orders(self):
+        """Apply ORDER_STALE_POLICY to entry orders resting longer than ORDER_LIMIT_TTL"""
+        events = ORDER_EXECUTION.expire_stale(lambda order: reprice_stale_entry(order, PORTFOLIO_COINS))
+        with self.state_lock:
+            changed = apply_order_events(events, PORTFOLIO_COINS)
+        if changed:
+            self.save_checkpoint(force=True)
 
     def _close_position(self, pair: str, reason: str, exit_price: float):
-        coin_data = PORTFOLIO_COINS.get(pair, {})
-        position_size = coin_data.get('position_size', 0)
-        direction = coin_data.get('direction', 'bullish')
+        self._close_positions([(pair, reason, exit_price)])
 
-        if position_size == 0:
-            return
-
-        side = 'SELL' if direction == 'bullish' else 'BUY'
-        order = place_order(pair, side, "MARKET", str(position_size), None)
+    def _close_positions(self, exits: list):
+        """Close (pair, reason, exit_price) positions with MARKET orders submitted in parallel
 
-        if order and order.get('Success'):
-            pnl = (exit_price - coin_data.get('entry_price', 0)) * position_size * (1 if direction == 'bullish' else -1)
-            coin_data['status'] = TradeStatus.CLOSED.value
-            coin_data['pnl'] = pnl
-            logger.info(f"✓ {pair} closed: PnL=${pnl:,.2f}")
+        close_positions() claims each position under state_lock before its
+        exit goes out, so the feed exit worker and the REST risk check cannot
+        both submit an exit for the same position.
+        """
+        if close_positions(PORTFOLIO_COINS, exits, self.portfolio_manager, lock=self.state_lock):
+            self.save_checkpoint(force=True)
 
     def _update_portfolio_metrics(self):
         metrics = self.portfolio_manager.get_portfolio_metrics()
         logger.info("\n" + "="*60 + "\nMETRICS\n" + "="*60)
         logger.info(f"Value: ${metrics['current_value']:,.2f} | Return: {metrics['total_return']:+.2%}")
         logger.info(f"Sharpe: {metrics['sharpe_ratio']:.2f} | Sortino: {metrics['sortino_ratio']:.2f} | Calmar: {metrics['calmar_ratio']:.2f}")
+
+        intervals = self.portfolio_manager.get_metric_confidence_intervals()
+        if intervals:
+            pct = f"{intervals['confidence']:.0%}"
+            for key, label in (('sharpe_ratio', 'Sharpe'), ('sortino_ratio', 'Sortino'), ('calmar_ratio', 'Calmar')):
+                ci = intervals[key]
+                logger.info(f"{label} {pct} CI: [{ci['lower']:.2f}, {ci['upper']:.2f}]")
+            dd = intervals['drawdown_distribution']
+            logger.info(f"Max DD distribution: p50 {dd['p50']:.2%} | p95 {dd['p95']:.2%} | p99 {dd['p99']:.2%} "
+                        f"({intervals['n_paths']} paths over the last {intervals['n_returns']} returns, "
+                        f"block {intervals['block_size']})")
+        for breaker in MARKET_DATA_BREAKERS.values():
+            if breaker.state != 'closed':
+                logger.info(f"Data source {breaker.name}: circuit {breaker.state} {breaker.stats}")
+        coalesced_calls = {name: flight.stats['suppressed'] for name, flight in MARKET_DATA_FLIGHTS.items()
+                           if flight.stats['suppressed']}
+        if coalesced_calls:
+            logger.info(f"Duplicate market-data calls coalesced: {coalesced_calls}")
+        if self.feed is not None:
+            feed = self.feed.stats
+            logger.info(f"Market feed: {'streaming' if self.streaming() else 'DOWN, polling REST'} | "
+                        f"{feed['updates']} updates, {feed['connects']} connects, {feed['resyncs']} resyncs, "
+                        f"lag {feed['last_lag'] * 1000:.0f}ms")
+        if ORDER_EXECUTION.stats['acked']:
+            latency = ORDER_EXECUTION.latency_summary()
+            ack, fill = latency['ack'], latency['fill']
+            fill_text = (f"fill p50 {fill['p50']:.1f}s p90 {fill['p90']:.1f}s ({fill['count']})"
+                         if fill['count'] else "no fills")
+            logger.info(f"Orders: ack p50 {ack['p50'] * 1000:.0f}ms p99 {ack['p99'] * 1000:.0f}ms "
+                        f"({ack['count']}) | {fill_text} | {ORDER_EXECUTION.stats['expired']} expired, "
+                        f"{ORDER_EXECUTION.stats['replaced']} replaced, {ORDER_EXECUTION.stats['converted']} converted")
+        if EXCHANGE_INFO.stats['prevented_rejects']:
+            logger.info(f"Orders rejected locally: {EXCHANGE_INFO.stats['prevented_rejects']} "
+                        f"{EXCHANGE_INFO.stats['reject_reasons']}")
+        for source, spend in REQUEST_PLANNER.report().items():
+            if not spend['total']:
+                continue
+            plan = spend['last_plan']
+            plan_text = (f" | last plan {plan['pairs']} pairs, {plan['deferred']} deferred, "
+                         f"{plan['planned']}/{plan['budget']} requests" if plan else "")
+            logger.info(f"Request spend: {source} {spend['per_minute']:.0f}/min "
+                        f"(effective {spend['effective']:.0f}, limit {spend['limit']:.0f}), "
+                        f"{spend['rate_limited']} 429s in window, {spend['total_rate_limited']} total{plan_text}")
+        trade_report = self.portfolio_manager.trade_report()
+        if trade_report:
+            logger.info(trade_report)
         logger.info("="*60)
 
 
+# ---------------------------------------------------------------------------
+# Multiple strategies/accounts on one shared market-data snapshot
+# ---------------------------------------------------------------------------
+
+class TradingAccount:
+    """One sub-account: its own credentials, strategy, portfolio and positions"""
+
+    def __init__(self, name: str, strategy: MultiAssetPercocolStrategy, portfolio_manager: PortfolioManager,
+                 credentials: Optional[tuple] = None):
+        self.name = name
+        self.strategy = strategy
+        self.portfolio_manager = portfolio_manager
+        self.credentials = credentials
+        self.positions = PositionStore(default_status=TradeStatus.CLOSED.value)
+        self.lock = threading.Lock()
+        self.stats = {'steps': 0, 'scans': 0, 'orders': 0, 'closes': 0}
+
+    def active_pairs(self) -> list:
+        return self.positions.pairs_with_status(TradeStatus.OPEN.value, TradeStatus.PENDING_BUY.value)
+
+    def step(self, snapshot: MarketSnapshot, scan: bool):
+        """Reconcile, enforce stops/targets and (if scan) trade, reading market data only from snapshot"""
+        with self.lock:
+            self.stats['steps'] += 1
+            self._reconcile_orders()
+            self._manage_positions(snapshot)
+            if scan and snapshot.candles:
+                self.stats['scans'] += 1
+                self._trade_opportunities(self.strategy.scan_snapshot(snapshot, self.active_pairs()))
+
+    def _reconcile_orders(self):
+        reconcile_pending_entries(self.positions, self.credentials, self.name)
+
+    def _manage_positions(self, snapshot: MarketSnapshot):
+        current_prices = {}
+        for pair in self.positions.pairs_with_status(TradeStatus.OPEN.value):
+            price = snapshot.price(pair)
+            if price > 0:
+                current_prices[pair] = price
+        exits = position_exits(self.positions, current_prices, self.name)
+        self.stats['closes'] += close_positions(self.positions, exits, self.portfolio_manager,
+                                                self.credentials, self.name)
+
+        self.portfolio_manager.update_portfolio_value(current_prices,
+                                                      self.positions.with_status(TradeStatus.OPEN.value))
+
+    def _trade_opportunities(self, opportunities: dict):
+        self.stats['orders'] += open_selected_trades(self.strategy, self.portfolio_manager, self.positions,
+                                                     opportunities, self.credentials, self.name)
+
+
+class MultiAccountEngine:
+    """Builds one MarketSnapshot per cycle and steps every account on it in parallel
+
+    Market-data requests per cycle are the same for one account or ten:
+    one bulk ticker call, plus one candle fetch per pre-filtered (or held)
+    pair on scan cycles. Accounts only add their own signed order/balance
+    calls, which run concurrently in the account threads.
+    """
+
+    def __init__(self, accounts: list, max_workers: Optional[int] = None):
+        self.accounts = accounts
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(accounts)),
+                                           thread_name_prefix='account')
+        self.scan_interval = SCAN_INTERVAL
+        self.position_check_interval = POSITION_CHECK_INTERVAL
+        self.last_scan_time = 0
+        self.last_position_check = 0
+        self.running = False
+        self.deferred_pairs = []  # over the request budget last scan; first in line next scan
+        self.stats = {'cycles': 0, 'scans': 0, 'candle_requests': 0, 'account_errors': 0}
+
+    def initialize(self) -> bool:
+        global AVAILABLE_PAIRS
+        if not self.accounts:
+            logger.error("No accounts configured in ACCOUNTS_FILE")
+            return False
+        if not HORUS_API_KEY:
+            logger.error("HORUS_API_KEY not configured")
+            return False
+        pairs = get_available_pairs()
+        if not pairs:
+            logger.error("Failed to fetch available pairs")
+            return False
+        AVAILABLE_PAIRS = pairs
+        EXCHANGE_INFO.start()
+        logger.info(f"Loaded {len(AVAILABLE_PAIRS)} pairs for {len(self.accounts)} accounts: "
+                    f"{', '.join(a.name for a in self.accounts)}")
+        return True
+
+    def build_snapshot(self, scan: bool) -> MarketSnapshot:
+        """One snapshot for every account; tickers only unless scan"""
+        tickers = get_all_tickers() or {}
+        if not scan:
+            return build_snapshot(PRIMARY_TIMEFRAME, lambda: tickers)
+
+        # The pre-filter only reads global thresholds, so any account's strategy gives the same answer
+        candidates = self.accounts[0].strategy.prefilter_pairs(AVAILABLE_PAIRS, tickers)
+        held = {pair for account in self.accounts for pair in account.active_pairs()}
+        candidate_set = set(candidates)
+        ordered = list(dict.fromkeys(sorted(held) + [p for p in self.deferred_pairs if p in candidate_set]
+                                     + list(candidates)))
+        # Held pairs are always fetched: their cost comes out of the budget first
+        plan = REQUEST_PLANNER.plan('horus', ordered, self.scan_interval,
+                                    free=lambda p: cached_ohlc(p, PRIMARY_TIMEFRAME) is not None,
+                                    required=lambda p: p in held)
+        pairs, self.deferred_pairs = plan['pairs'], plan['deferred']
+        if self.deferred_pairs:
+            logger.warning(f"Request plan: {plan['predicted']} Horus requests over budget {plan['budget']} - "
+                           f"deferring {len(self.deferred_pairs)} pairs to the next scan")
+        snapshot = build_snapshot(PRIMARY_TIMEFRAME, lambda: tickers,
+                                  lambda pair: get_historical_ohlc(pair, PRIMARY_TIMEFRAME, limit=50), pairs)
+        self.stats['candle_requests'] += snapshot.stats['candle_requests']
+        return snapshot
+
+    def run_iteration(self):
+        now = time.time()
+        scan = now - self.last_scan_time > self.scan_interval
+        if not scan and now - self.last_position_check <= self.position_check_interval:
+            return
+
+        self._expire_stale_orders()
+        snapshot = self.build_snapshot(scan)
+        self.stats['cycles'] += 1
+        futures = {self.executor.submit(account.step, snapshot, scan): account for account in self.accounts}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                self.stats['account_errors'] += 1
+                logger.error(f"[{futures[future].name}] step failed: {e}", exc_info=True)
+
+        self.last_position_check = now
+        if scan:
+            self.stats['scans'] += 1
+            self.last_scan_time = now
+            logger.info(f"Shared snapshot: {snapshot.stats['tickers']} tickers, "
+                        f"{snapshot.stats['candle_series']} candle series in {snapshot.stats['build_seconds']:.1f}s "
+                        f"for {len(self.accounts)} accounts")
+            for account in self.accounts:
+                pm = account.portfolio_manager
+                logger.info(f"[{account.name}] value ${pm.current_capital:,.2f}, "
+                            f"{len(account.active_pairs())} active, {account.stats['orders']} orders")
+                trade_report = pm.trade_report()
+                if trade_report:
+                    logger.info(f"[{account.name}] {trade_report}")
+
+    def _expire_stale_orders(self):
+        """Apply ORDER_STALE_POLICY to every account's entry orders past ORDER_LIMIT_TTL"""
+        # Routed by account name: load_accounts() makes names unique
+        stores = {account.name: account.positions for account in self.accounts}
+        events = ORDER_EXECUTION.expire_stale(lambda order: reprice_stale_entry(order, stores.get(order.account)))
+        for account in self.accounts:
+            with account.lock:
+                apply_order_events([event for event in events if event['account'] == account.name],
+                                   account.positions)
+
+    def run(self):
+        self.running = True
+        try:
+            while self.running:
+                try:
+                    self.run_iteration()
+                except Exception as e:
+                    logger.error(f"Error in run_iteration: {e}", exc_info=True)
+                time.sleep(min(CHECK_INTERVAL, self.position_check_interval))
+        except KeyboardInterrupt:
+            logger.info("Bot stopped by user")
+        finally:
+            self.running = False
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        ORDER_EXECUTION.shutdown()
+        EXCHANGE_INFO.stop()
+        # The accounts' strategies share one analysis pool
+        shutdown_analysis_pool()
+
+
+def load_accounts(path: str) -> list:
+    """TradingAccounts from a JSON list of {name, api_key, secret_key, initial_capital, model_file}
+
+    Raises:
+        ValueError: Two accounts share a name or an API key (accounts without
+            one share the default API_KEY)
+    """
+    with open(path) as f:
+        specs = json.load(f)
+    names = [spec.get('name', f"account-{i + 1}") for i, spec in enumerate(specs)]
+    keys = [spec.get('api_key') or API_KEY for spec in specs]
+    duplicate_names = sorted({name for name in names if names.count(name) > 1})
+    if duplicate_names:
+        raise ValueError(f"{path}: duplicate account names: {', '.join(duplicate_names)}")
+    sharing = [name for name, key in zip(names, keys) if keys.count(key) > 1]
+    if sharing:
+        raise ValueError(f"{path}: accounts {', '.join(sharing)} share an API key "
+                         f"(an account without api_key uses the default one)")
+    accounts = []
+    for i, spec in enumerate(specs):
+        portfolio_manager = PortfolioManager(float(spec.get('initial_capital', 50000.0)))
+        if spec.get('model_file'):
+            strategy = ModelScoredStrategy.from_model_file(portfolio_manager, spec['model_file'])
+        else:
+            strategy = MultiAssetPercocolStrategy(portfolio_manager)
+        credentials = (spec['api_key'], spec['secret_key']) if spec.get('api_key') else None
+        accounts.append(TradingAccount(names[i], strategy, portfolio_manager, credentials))
+    return accounts
+
+
 # Helper to initialize portfolio tracking
 def initialize_portfolio_tracking():
-    """Initialize portfolio tracking for all coins"""
-    global AVAILABLE_PAIRS, PORTFOLIO_COINS
-    logger.info("Initializing portfolio tracking...")
-
-    for pair in AVAILABLE_PAIRS:
-        PORTFOLIO_COINS[pair] = {
-            'position_size': 0,
-            'entry_price': None,
-            'stop_loss': None,
-            'target': None,
-            'pnl': 0,
-            'status': TradeStatus.CLOSED.value,
-            'entry_time': None,
-            'last_update': None,
-            'direction': None
-        }
+    """Initialize portfolio tracking for all coins
 
-    logger.info(f"Initialized {len(PORTFOLIO_COINS)} coins")
+    Every pair starts CLOSED; position records are created on first trade.
+    """
+    logger.info("Initializing portfolio tracking...")
+    PORTFOLIO_COINS.reset()
+    logger.info(f"Initialized {len(AVAILABLE_PAIRS)} coins")
 
 
 # ============================================================================
@@ -1432,6 +3214,17 @@ def initialize_portfolio_tracking():
 
 def main():
     """Main entry point"""
+    setup_logging()
+    if DEPLOY_ROLE == 'worker':
+        from sharded_scan import get_authkey, run_worker
+        try:
+            authkey = get_authkey(SCAN_CLUSTER_ADDRESS)
+        except ValueError as e:
+            logger.error(str(e))
+            return
+        run_worker(SCAN_CLUSTER_ADDRESS, os.getenv('SCAN_WORKER_ID', f"worker-{os.getpid()}"), authkey=authkey)
+        return
+
     logger.info("\n" + "="*60)
     logger.info("ROOSTOO AI TRADING BOT - CRAIG PERCOCO STRATEGY")
     logger.info("="*60 + "\n")
@@ -1445,16 +3238,54 @@ def main():
     # Explicit startup log for initial capital
     logger.info(f"Starting portfolio capital: ${initial_capital:,.2f}")
 
+    if ACCOUNTS_FILE:
+        try:
+            engine = MultiAccountEngine(load_accounts(ACCOUNTS_FILE))
+        except ValueError as e:
+            logger.error(str(e))
+            return
+        if not engine.initialize():
+            logger.error("Initialization failed")
+            return
+        logger.info("Starting multi-account loop...\n")
+        try:
+            engine.run()
+        finally:
+            engine.shutdown()
+        return
+
     portfolio_manager = PortfolioManager(initial_capital)
-    strategy = MultiAssetPercocolStrategy(portfolio_manager)
+    if FEATURE_MODEL_FILE:
+        logger.info(f"Scoring with feature model {FEATURE_MODEL_FILE}")
+        strategy = ModelScoredStrategy.from_model_file(portfolio_manager, FEATURE_MODEL_FILE)
+    else:
+        strategy = MultiAssetPercocolStrategy(portfolio_manager)
     bot = MultiAssetTradingBot(strategy, portfolio_manager)
 
     if not bot.initialize():
         logger.error("Initialization failed")
         return
 
+    if RUNTIME_MODE == 'async':
+        import asyncio
+        from async_runtime import AsyncBotRuntime
+
+        logger.info("Starting asyncio runtime...\n")
+        runtime = AsyncBotRuntime(bot, risk_interval=POSITION_CHECK_INTERVAL,
+                                  reconcile_interval=ORDER_RECONCILE_INTERVAL,
+                                  metrics_interval=METRICS_REPORT_INTERVAL,
+                                  memory_interval=MEMORY_REPORT_INTERVAL)
+        try:
+            asyncio.run(runtime.run())
+        finally:
+            bot.shutdown()
+        return
+
     logger.info(f"Starting bot loop...\n")
-    bot.run()
+    try:
+        bot.run()
+    finally:
+        bot.shutdown()
 
 
 if __name__ == "__main__":
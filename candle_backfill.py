@@ -0,0 +1,510 @@
+"""
+Historical Candle Backfill
+==========================
+
+Builds months of OHLC history for backtests and parameter tuning, which
+get_ohlc_from_horus cannot (it only returns the latest `limit` candles):
+
+- Every (pair, timeframe) series is paged backward from now with the Horus
+  `end` parameter until the requested start or the start of the pair's
+  history. Series run concurrently on a thread pool; all workers draw from
+  one per-minute request budget and a 429 pauses them together for
+  Retry-After seconds.
+- Candles are validated (aligned timestamp, finite positive prices,
+  high/low enclosing open/close, non-negative volume), deduplicated by
+  timestamp and the still-forming candle is dropped.
+- CandleArchive stores each series as one compressed .npz of columns
+  (timestamp int64, open/high/low/close/volume float64) under
+  <root>/<timeframe>/<BASE-QUOTE>.npz. Pages are merged in every
+  `flush_pages` pages, written atomically, so an interrupted run loses at
+  most that many pages.
+- Reruns resume from what is on disk: the gap since the newest stored
+  candle and any hole an interrupted run left are filled, then paging
+  continues from the oldest candle. Series whose history was exhausted
+  (the source returned no rows at all before the oldest candle) are
+  remembered in manifest.json and not re-probed; a page with rows but none
+  older than the requested end is a failure, not exhaustion.
+
+    python candle_backfill.py run --timeframes 15m,5m --days 90
+    python candle_backfill.py run --pairs BTC/USD,ETH/USD --timeframes 1m --days 7 --workers 8
+    python candle_backfill.py info
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Callable, Dict, List, Optional, Sequence
+
+from scan_scheduler import timeframe_seconds
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+DEFAULT_ARCHIVE_DIR = 'data/candles'
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_ATTEMPTS = 4
+
+
+class RateLimited(Exception):
+    """Raised by a page fetcher when the source answered 429"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def validate_candles(candles: Sequence[dict], period: int, now: float) -> tuple:
+    """Candles that are complete and internally consistent, sorted and unique by timestamp
+
+    Returns:
+        tuple: (valid candles, {reason: count} of rejected ones)
+    """
+    rejected: Dict[str, int] = {}
+    by_ts = {}
+    for c in candles:
+        try:
+            ts = int(c['timestamp'])
+            o, h, l, cl, v = (float(c[k]) for k in COLUMNS[1:])
+        except (KeyError, TypeError, ValueError):
+            reason = 'malformed'
+        else:
+            if ts % period:
+                reason = 'misaligned'
+            elif ts + period > now:
+                reason = 'forming'
+            elif not all(math.isfinite(x) and x > 0 for x in (o, h, l, cl)) or not math.isfinite(v):
+                reason = 'bad_price'
+            elif l > min(o, cl) or h < max(o, cl) or v < 0:
+                reason = 'inconsistent'
+            else:
+                by_ts[ts] = {'timestamp': ts, 'open': o, 'high': h, 'low': l, 'close': cl, 'volume': v}
+                continue
+        rejected[reason] = rejected.get(reason, 0) + 1
+    return [by_ts[ts] for ts in sorted(by_ts)], rejected
+
+
+# ============================================================================
+# Columnar archive
+# ============================================================================
+
+class CandleArchive:
+    """One compressed columnar .npz per (pair, timeframe) plus a small manifest"""
+
+    def __init__(self, root: str = DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._manifest_path = os.path.join(root, 'manifest.json')
+        self._manifest: Dict[str, dict] = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+
+    @staticmethod
+    def _key(pair: str, timeframe: str) -> str:
+        return f"{timeframe}/{pair.replace('/', '-')}"
+
+    def path(self, pair: str, timeframe: str) -> str:
+        return os.path.join(self.root, self._key(pair, timeframe) + '.npz')
+
+    def load(self, pair: str, timeframe: str) -> Optional[dict]:
+        """Column name -> numpy array, or None if the series has not been stored"""
+        import numpy as np
+
+        path = self.path(pair, timeframe)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return {name: data[name] for name in COLUMNS}
+
+    def read(self, pair: str, timeframe: str, start: Optional[int] = None, end: Optional[int] = None) -> List[dict]:
+        """Stored candles with start <= timestamp < end, as the dicts the strategy consumes"""
+        columns = self.load(pair, timeframe)
+        if columns is None:
+            return []
+        ts = columns['timestamp']
+        lo = 0 if start is None else int(ts.searchsorted(start, 'left'))
+        hi = len(ts) if end is None else int(ts.searchsorted(end, 'left'))
+        rows = zip(*(columns[name][lo:hi].tolist() for name in COLUMNS))
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def bounds(self, pair: str, timeframe: str) -> Optional[tuple]:
+        """(oldest, newest, count) of the stored series"""
+        state = self._manifest.get(self._key(pair, timeframe))
+        if not state or not state.get('count'):
+            return None
+        return state['oldest'], state['newest'], state['count']
+
+    def exhausted_at(self, pair: str, timeframe: str) -> Optional[int]:
+        """Oldest timestamp the source has for the series, once paging ran out of history"""
+        state = self._manifest.get(self._key(pair, timeframe))
+        return state.get('exhausted_at') if state else None
+
+    def mark_exhausted(self, pair: str, timeframe: str, oldest: int):
+        with self._lock:
+            self._manifest.setdefault(self._key(pair, timeframe), {})['exhausted_at'] = oldest
+            self._write_manifest()
+
+    def merge(self, pair: str, timeframe: str, candles: List[dict]) -> int:
+        """Merge validated candles into the stored series; returns how many were new"""
+        import numpy as np
+
+        if not candles:
+            return 0
+        incoming = {name: np.array([c[name] for c in candles], dtype=np.int64 if name == 'timestamp' else np.float64)
+                    for name in COLUMNS}
+        stored = self.load(pair, timeframe)
+        before = 0 if stored is None else len(stored['timestamp'])
+        if stored is not None:
+            # Incoming rows go last so they win the dedup below (re-fetched candles may be revised)
+            incoming = {name: np.concatenate([stored[name], incoming[name]]) for name in COLUMNS}
+
+        ts = incoming['timestamp']
+        reversed_ts = ts[::-1]
+        _, first_from_end = np.unique(reversed_ts, return_index=True)
+        keep = len(ts) - 1 - first_from_end  # index of the last occurrence, in timestamp order
+        merged = {name: incoming[name][keep] for name in COLUMNS}
+
+        path = self.path(pair, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **merged)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        count = len(merged['timestamp'])
+        with self._lock:
+            state = self._manifest.setdefault(self._key(pair, timeframe), {})
+            state.update(oldest=int(merged['timestamp'][0]), newest=int(merged['timestamp'][-1]), count=count)
+            self._write_manifest()
+        return count - before
+
+    def gaps(self, pair: str, timeframe: str) -> List[tuple]:
+        """(after, before) timestamps of missing stretches inside the stored series"""
+        import numpy as np
+
+        columns = self.load(pair, timeframe)
+        if columns is None:
+            return []
+        ts = columns['timestamp']
+        holes = np.nonzero(np.diff(ts) > timeframe_seconds(timeframe))[0]
+        return [(int(ts[i]), int(ts[i + 1])) for i in holes]
+
+    def series(self) -> List[tuple]:
+        """(pair, timeframe) of every stored series"""
+        out = []
+        for key, state in sorted(self._manifest.items()):
+            if state.get('count'):
+                timeframe, name = key.split('/', 1)
+                out.append((name.replace('-', '/'), timeframe))
+        return out
+
+    def _write_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._manifest_path)
+
+
+# ============================================================================
+# Backfill
+# ============================================================================
+
+class HistoryBackfill:
+    """Pages (pair, timeframe) series backward into a CandleArchive within one request budget"""
+
+    def __init__(self, fetch_page: Callable[[str, str, int, int], Optional[list]], archive: CandleArchive,
+                 rate_limit_per_minute: int = 60, workers: int = 4, page_size: int = DEFAULT_PAGE_SIZE,
+                 flush_pages: int = 10, clock: Optional[Callable[[], float]] = None,
+                 sleep: Optional[Callable[[float], None]] = None):
+        """
+        Args:
+            fetch_page: (pair, timeframe, end, limit) -> up to limit candles with
+                timestamp < end (seconds), [] when there is no older history,
+                None on a failed request; raises RateLimited on a 429
+        """
+        self.fetch_page = fetch_page
+        self.archive = archive
+        self.rate_limit_per_minute = max(1, rate_limit_per_minute)
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.flush_pages = max(1, flush_pages)
+        self.clock = clock or time.time
+        self.sleep = sleep or time.sleep
+
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._cooldown_until = 0.0
+        self._stop = threading.Event()
+        self.stats = {'requests': 0, 'pages': 0, 'candles': 0, 'added': 0, 'rate_limited': 0,
+                      'errors': 0, 'stale_pages': 0, 'rejected': {}}
+
+    # ------------------------------------------------------------------
+    # Request budget
+    # ------------------------------------------------------------------
+
+    def _acquire(self) -> bool:
+        """Wait for the next request slot shared by all workers; False once stopped"""
+        interval = 60.0 / self.rate_limit_per_minute
+        with self._lock:
+            now = self.clock()
+            slot = max(now, self._next_slot, self._cooldown_until)
+            self._next_slot = slot + interval
+            self.stats['requests'] += 1
+        while not self._stop.is_set():
+            wait = slot - self.clock()
+            if wait <= 0:
+                return True
+            self.sleep(min(wait, 1.0))
+        return False
+
+    def _page(self, pair: str, timeframe: str, end: int) -> Optional[list]:
+        for attempt in range(MAX_PAGE_ATTEMPTS):
+            if not self._acquire():
+                return None
+            try:
+                page = self.fetch_page(pair, timeframe, end, self.page_size)
+            except RateLimited as e:
+                with self._lock:
+                    self._cooldown_until = max(self._cooldown_until, self.clock() + e.retry_after)
+                    self.stats['rate_limited'] += 1
+                logger.warning(f"Backfill rate limited - pausing all workers for {e.retry_after:.0f}s")
+                continue
+            except Exception as e:
+                logger.warning(f"Backfill page {pair} {timeframe} before {end} failed: {e}")
+                page = None
+            if page is not None:
+                return page
+            with self._lock:
+                self.stats['errors'] += 1
+            self.sleep(min(2 ** attempt, 30))
+        return None
+
+    # ------------------------------------------------------------------
+    # Series
+    # ------------------------------------------------------------------
+
+    def _walk(self, pair: str, timeframe: str, end: int, stop_at: int, report: dict) -> str:
+        """Page backward from end until a candle at or before stop_at; returns how it ended"""
+        period = timeframe_seconds(timeframe)
+        buffered: List[dict] = []
+        pages = 0
+        outcome = 'done'
+        try:
+            while end > stop_at:
+                page = self._page(pair, timeframe, end)
+                if page is None:
+                    outcome = 'stopped' if self._stop.is_set() else 'failed'
+                    break
+                if not page:
+                    # No rows at all before end: the source's history starts here
+                    outcome = 'exhausted'
+                    break
+                valid, rejected = validate_candles(page, period, self.clock())
+                valid = [c for c in valid if c['timestamp'] < end]
+                with self._lock:
+                    self.stats['pages'] += 1
+                    self.stats['candles'] += len(valid)
+                    for reason, n in rejected.items():
+                        self.stats['rejected'][reason] = self.stats['rejected'].get(reason, 0) + n
+                if not valid:
+                    # Rows, but none usable before end (e.g. the source ignored `end` and
+                    # sent the latest page again): a failure, never proof of exhaustion
+                    with self._lock:
+                        self.stats['stale_pages'] += 1
+                    logger.warning(f"Backfill page {pair} {timeframe} before {end}: {len(page)} rows, "
+                                   f"none usable and older than the requested end; stopping this series")
+                    outcome = 'failed'
+                    break
+                buffered.extend(valid)
+                pages += 1
+                report['pages'] += 1
+                end = valid[0]['timestamp']
+                if pages % self.flush_pages == 0:
+                    report['added'] += self._flush(pair, timeframe, buffered)
+                    buffered = []
+        finally:
+            report['added'] += self._flush(pair, timeframe, buffered)
+        return outcome
+
+    def _flush(self, pair: str, timeframe: str, candles: List[dict]) -> int:
+        added = self.archive.merge(pair, timeframe, candles)
+        with self._lock:
+            self.stats['added'] += added
+        return added
+
+    def backfill_series(self, pair: str, timeframe: str, start: int) -> dict:
+        """Fill (pair, timeframe) from start up to the last closed candle, resuming from disk
+
+        Segments are walked newest first: the gap since the newest stored
+        candle, holes inside the stored range (left by an interrupted run),
+        then the history before the oldest stored candle.
+        """
+        period = timeframe_seconds(timeframe)
+        now_end = int(self.clock()) // period * period  # open time of the forming candle
+        report = {'pair': pair, 'timeframe': timeframe, 'pages': 0, 'added': 0, 'status': 'done'}
+
+        bounds = self.archive.bounds(pair, timeframe)
+        if bounds:
+            oldest, newest, _ = bounds
+            segments = [(now_end, newest)] if newest + period < now_end else []
+            segments += [(before, after) for after, before in reversed(self.archive.gaps(pair, timeframe))]
+            exhausted_at = self.archive.exhausted_at(pair, timeframe)
+            if oldest > start and (exhausted_at is None or oldest > exhausted_at):
+                segments.append((oldest, start))
+        else:
+            segments = [(now_end, start)]
+
+        for end, stop_at in segments:
+            outcome = self._walk(pair, timeframe, end, stop_at, report)
+            if outcome == 'exhausted':
+                bounds = self.archive.bounds(pair, timeframe)
+                if bounds and stop_at == start:
+                    self.archive.mark_exhausted(pair, timeframe, bounds[0])
+            elif outcome != 'done':
+                report['status'] = outcome
+                break
+
+        bounds = self.archive.bounds(pair, timeframe)
+        report['oldest'], report['newest'], report['count'] = bounds or (None, None, 0)
+        return report
+
+    def run(self, pairs: Sequence[str], timeframes: Sequence[str], start: int) -> dict:
+        """Backfill every (pair, timeframe) concurrently; Ctrl-C flushes and stops cleanly"""
+        started = self.clock()
+        self._stop.clear()
+        jobs = [(pair, tf) for tf in timeframes for pair in pairs]
+        logger.info(f"Backfilling {len(jobs)} series from {time.strftime('%Y-%m-%d %H:%M', time.gmtime(start))} UTC "
+                    f"with {self.workers} workers at {self.rate_limit_per_minute} requests/min")
+        results = []
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill')
+        try:
+            futures = [executor.submit(self.backfill_series, pair, tf, start) for pair, tf in jobs]
+            for future in futures:
+                while True:
+                    try:
+                        results.append(future.result(timeout=1.0))
+                        break
+                    except FuturesTimeoutError:
+                        continue
+                    except Exception as e:
+                        logger.error(f"Backfill series failed: {e}")
+                        break
+        except KeyboardInterrupt:
+            logger.warning("Backfill interrupted - flushing buffered pages, rerun to resume")
+            self._stop.set()
+        finally:
+            executor.shutdown(wait=True)  # stopped workers drain the queue without requests
+
+        by_status: Dict[str, int] = {}
+        for r in results:
+            by_status[r['status']] = by_status.get(r['status'], 0) + 1
+        elapsed = self.clock() - started
+        summary = {'series': len(jobs), 'finished': len(results), 'by_status': by_status,
+                   'elapsed_seconds': round(elapsed, 1), **self.stats,
+                   'failed': [f"{r['pair']} {r['timeframe']}" for r in results if r['status'] != 'done']}
+        logger.info(f"Backfill finished in {elapsed:.0f}s: {self.stats['pages']} pages, "
+                    f"{self.stats['added']} new candles, {len(summary['failed'])} series incomplete")
+        return summary
+
+
+# ============================================================================
+# Horus source
+# ============================================================================
+
+def horus_page_fetcher(base_url: str, api_key: Optional[str], timeout: float = 15,
+                       pool_size: int = 8) -> Callable[[str, str, int, int], Optional[list]]:
+    """fetch_page for HistoryBackfill backed by Horus /ohlc with an `end` bound (ms)
+
+    Uses its own pooled session without 429 retries: rate limits are handled
+    by the backfill's shared budget instead of per-request sleeps.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import Retry
+
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=1, status_forcelist=[500, 502, 503, 504], allowed_methods=['GET'])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    headers = {'Authorization': f'Bearer {api_key}' if api_key else '', 'Content-Type': 'application/json'}
+
+    def fetch_page(pair: str, timeframe: str, end: int, limit: int) -> Optional[list]:
+        params = {'pair': pair.replace('/', '-'), 'interval': timeframe, 'limit': limit, 'end': end * 1000}
+        response = session.get(f"{base_url}/ohlc", headers=headers, params=params, timeout=timeout)
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                wait = float(retry_after) if retry_after else 60.0
+            except ValueError:
+                wait = 60.0
+            raise RateLimited(wait)
+        response.raise_for_status()
+        data = response.json()
+        rows = data.get('data', data.get('candles'))
+        if not isinstance(rows, list):
+            logger.warning(f"Horus backfill error for {pair}: {data.get('error', data.get('message', 'no data'))}")
+            return None
+        candles = []
+        for c in rows:
+            ts = c.get('timestamp', 0)
+            if isinstance(ts, (int, float)) and ts > 1000000000000:
+                ts = int(ts / 1000)
+            candles.append(dict(c, timestamp=int(ts)))
+        return candles
+
+    return fetch_page
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Backfill historical candles into the columnar archive')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='Fetch history (resumes from what is already stored)')
+    run.add_argument('--pairs', default='', help='Comma-separated pairs (default: every available pair)')
+    run.add_argument('--timeframes', default='15m')
+    run.add_argument('--days', type=float, default=90.0)
+    run.add_argument('--workers', type=int, default=4)
+    run.add_argument('--rate', type=int, default=int(os.getenv('BACKFILL_RATE_PER_MINUTE', '60')),
+                     help='Request budget per minute shared by all workers')
+    run.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    run.add_argument('--dir', default=os.getenv('CANDLE_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR))
+    info = sub.add_parser('info', help='List stored series with their ranges and gaps')
+    info.add_argument('--dir', default=os.getenv('CANDLE_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    archive = CandleArchive(args.dir)
+    if args.command == 'info':
+        fmt = '%Y-%m-%d %H:%M'
+        for pair, timeframe in archive.series():
+            oldest, newest, count = archive.bounds(pair, timeframe)
+            print(f"{timeframe:>4} {pair:<12} {count:>8} candles  {time.strftime(fmt, time.gmtime(oldest))} .. "
+                  f"{time.strftime(fmt, time.gmtime(newest))}  {len(archive.gaps(pair, timeframe))} gaps")
+        return
+
+    import bot_template as bt
+    pairs = [p.strip() for p in args.pairs.split(',') if p.strip()] or bt.get_available_pairs()
+    fetch_page = horus_page_fetcher(bt.HORUS_BASE_URL, bt.HORUS_API_KEY, timeout=bt.HORUS_REQUEST_TIMEOUT,
+                                    pool_size=args.workers)
+    backfill = HistoryBackfill(fetch_page, archive, rate_limit_per_minute=args.rate,
+                               workers=args.workers, page_size=args.page_size)
+    start = int(time.time() - args.days * 86400)
+    print(json.dumps(backfill.run(pairs, args.timeframes.split(','), start), indent=2))
+
+
+if __name__ == '__main__':
+    main()
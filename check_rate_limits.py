@@ -0,0 +1,109 @@
+"""
+Rate-Limit Handling Check
+=========================
+
+Runs get_ohlc_from_horus against a local stub server and checks that Horus
+rate limiting and retries reach the request planner instead of being
+absorbed inside the HTTP session:
+
+- 429: one request, no inline sleep on Retry-After; the planner counts the
+  request and the 429 (so its AIMD cut fires)
+- 429s through _call_with_breaker leave the Horus circuit breaker closed:
+  being rate limited is not the source failing
+- 5xx: every attempt the session's retries send is counted against the
+  Horus budget
+
+    python check_rate_limits.py
+
+Exits with status 1 if any check fails.
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class StubHorus(BaseHTTPRequestHandler):
+    """Answers every request with the server's status (and Retry-After on 429)"""
+
+    def do_GET(self):
+        self.server.hits += 1
+        self.send_response(self.server.status)
+        if self.server.status == 429:
+            self.send_header('Retry-After', '2')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(status: int) -> HTTPServer:
+    server = HTTPServer(('127.0.0.1', 0), StubHorus)
+    server.status = status
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fetch_from(bt, server: HTTPServer) -> tuple:
+    """One scan-style candle fetch against server; returns (result, seconds, planner report)"""
+    from request_planner import RequestPlanner
+
+    bt.HORUS_BASE_URL = f'http://127.0.0.1:{server.server_port}'
+    bt.HORUS_BACKOFF_UNTIL = 0.0
+    bt.REQUEST_PLANNER = RequestPlanner(safety=bt.REQUEST_RATE_SAFETY, reserve=bt.REQUEST_PLAN_RESERVE)
+    bt.REQUEST_PLANNER.register('horus', 60000)
+    started = time.perf_counter()
+    result = bt.get_ohlc_from_horus('BTC/USD', '15m', 50)
+    return result, time.perf_counter() - started, bt.REQUEST_PLANNER.report()['horus']
+
+
+def main():
+    import bot_template as bt
+    bt.HORUS_MIN_REQUEST_INTERVAL = 0.0
+    bt.HORUS_RETRY_LIMIT = 2
+    failures = []
+
+    server = start_stub(429)
+    result, seconds, report = fetch_from(bt, server)
+    print(f"429: {server.hits} request(s) in {seconds:.2f}s, planner spent {report['spent']}, "
+          f"rate_limited {report['rate_limited']}")
+    if result is not None or server.hits != 1 or seconds > 1.0:
+        failures.append(f"429 was retried inside the session ({server.hits} requests, {seconds:.2f}s)")
+    if report['spent'] != server.hits or report['rate_limited'] != 1:
+        failures.append(f"planner saw {report['spent']} requests and {report['rate_limited']} 429s")
+    if bt.HORUS_BACKOFF_UNTIL <= time.time():
+        failures.append("429 did not hold further Horus requests")
+
+    breaker = bt._build_breaker(bt.DATA_SOURCE_PRIMARY)
+    bt.MARKET_DATA_BREAKERS[bt.DATA_SOURCE_PRIMARY] = breaker
+    for _ in range(breaker.min_calls * 2):
+        bt.HORUS_BACKOFF_UNTIL = 0.0
+        bt._call_with_breaker(bt.DATA_SOURCE_PRIMARY, bt.get_ohlc_from_horus, 'BTC/USD', '15m', 50)
+    print(f"429 x{breaker.min_calls * 2} via breaker: {breaker.state}, {breaker.stats}")
+    if breaker.state != 'closed' or breaker.stats['failures']:
+        failures.append(f"429s counted against the breaker ({breaker.state}, {breaker.stats['failures']} failures)")
+    server.shutdown()
+
+    server = start_stub(503)
+    bt.HORUS_SESSION = None
+    result, seconds, report = fetch_from(bt, server)
+    print(f"503: {server.hits} request(s) in {seconds:.2f}s, planner spent {report['spent']}")
+    if report['spent'] != server.hits:
+        failures.append(f"planner counted {report['spent']} of {server.hits} requests the retries sent")
+    server.shutdown()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Per-Source Circuit Breaker
+==========================
+
+Tracks the outcome and latency of recent calls to a data source and stops
+calling it while it is sick:
+
+- CLOSED: calls pass through; outcomes are recorded in a sliding window.
+- OPEN: the error rate or slow-call rate exceeded its threshold; calls are
+  skipped until open_duration has elapsed.
+- HALF_OPEN: a limited number of probe calls are let through; enough
+  successes close the breaker, any failure re-opens it.
+
+State transitions are kept in a bounded event log and pushed to listeners.
+Recent successful latencies are also kept so callers can derive a latency
+percentile (e.g. to decide when to hedge a request).
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by error rate and latency"""
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, slow_call_seconds: float = 5.0,
+                 slow_call_rate_threshold: float = 0.8, window_size: int = 20, min_calls: int = 5,
+                 open_duration: float = 120.0, half_open_max_calls: int = 2, clock: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock or time.time
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes = deque(maxlen=window_size)  # (ok, slow)
+        self._latencies = deque(maxlen=200)
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[dict], None]] = []
+
+        self.events = deque(maxlen=100)
+        self.stats = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'ignored': 0}
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Register a callback receiving each transition event dict"""
+        self._listeners.append(listener)
+
+    def _transition(self, new_state: str, reason: str):
+        old_state = self.state
+        if old_state == new_state:
+            return
+        self.state = new_state
+        if new_state == OPEN:
+            self.opened_at = self.clock()
+        if new_state == HALF_OPEN:
+            self._half_open_calls = 0
+            self._half_open_successes = 0
+        if new_state == CLOSED:
+            self._outcomes.clear()
+        event = {'source': self.name, 'from': old_state, 'to': new_state,
+                 'reason': reason, 'timestamp': self.clock()}
+        self.events.append(event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Circuit breaker listener failed: {e}")
+
+    def allow_request(self) -> bool:
+        """True if a call to the source should be attempted now"""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at >= self.open_duration:
+                    self._transition(HALF_OPEN, 'open duration elapsed')
+                else:
+                    self.stats['rejected'] += 1
+                    return False
+            if self.state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self.stats['rejected'] += 1
+                    return False
+                self._half_open_calls += 1
+            return True
+
+    def record(self, ok: bool, latency: float):
+        """Record the outcome of one call"""
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            self.stats['calls'] += 1
+            if not ok:
+                self.stats['failures'] += 1
+            if slow:
+                self.stats['slow_calls'] += 1
+            if ok:
+                self._latencies.append(latency)
+
+            if self.state == HALF_OPEN:
+                if not ok or slow:
+                    self._transition(OPEN, 'probe failed' if not ok else f'probe slow ({latency:.1f}s)')
+                else:
+                    self._half_open_successes += 1
+                    if self._half_open_successes >= self.half_open_max_calls:
+                        self._transition(CLOSED, 'probes succeeded')
+                return
+
+            if self.state != CLOSED:
+                return
+
+            self._outcomes.append((ok, slow))
+            n = len(self._outcomes)
+            if n < self.min_calls:
+                return
+            failure_rate = sum(1 for o, _ in self._outcomes if not o) / n
+            slow_rate = sum(1 for _, s in self._outcomes if s) / n
+            if failure_rate >= self.failure_rate_threshold:
+                self._transition(OPEN, f'error rate {failure_rate:.0%} over last {n} calls')
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._transition(OPEN, f'slow-call rate {slow_rate:.0%} over last {n} calls')
+
+    def ignore(self):
+        """Record nothing for an allowed call that says nothing about the source's health
+
+        E.g. a rate-limited call, or one served by another caller's request.
+        Frees the half-open probe slot the call took.
+        """
+        with self._lock:
+            self.stats['ignored'] += 1
+            if self.state == HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self, latency: float):
+        self.record(True, latency)
+
+    def record_failure(self, latency: float):
+        self.record(False, latency)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Latency percentile (0..1) of recent successful calls, None without samples"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, max(0, int(round(q * (len(samples) - 1)))))
+        return samples[idx]
+
+    def snapshot(self) -> dict:
+        """Current state and counters"""
+        return {'source': self.name, 'state': self.state, **self.stats,
+                'p95_latency': self.latency_percentile(0.95)}
@@ -0,0 +1,231 @@
+"""
+CoinGecko Fallback Adapter
+==========================
+
+Market-data fallback used when Horus is unavailable:
+
+- Symbol -> CoinGecko id index built once from /coins/markets (highest market
+  cap wins for duplicate symbols) plus a small override map. Unknown symbols
+  are skipped instead of guessed, so no requests are wasted on 404s.
+- One cached /market_chart download per (coin, history window), shared by all
+  callers and timeframes; concurrent callers wait for the same download.
+- Price points are resampled into epoch-aligned candles of the requested
+  timeframe. CoinGecko only reports rolling 24h volume, so per-candle volume
+  is estimated as that 24h volume pro-rated to the candle length.
+- Requests draw from their own per-minute budget; when it is exhausted or
+  CoinGecko answers 429 the adapter returns None instead of waiting.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from scan_scheduler import timeframe_seconds
+
+logger = logging.getLogger(__name__)
+
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+
+# Symbols whose market-cap winner is not the coin traded on Roostoo
+COINGECKO_ID_OVERRIDES = {
+    'BTC': 'bitcoin', 'ETH': 'ethereum', 'XRP': 'ripple',
+    'ADA': 'cardano', 'SOL': 'solana', 'DOGE': 'dogecoin',
+    'LTC': 'litecoin', 'BCH': 'bitcoin-cash', 'LINK': 'chainlink',
+    'BNB': 'binancecoin', 'MATIC': 'matic-network', 'ATOM': 'cosmos'
+}
+
+# market_chart history windows (days) and their point spacing in seconds
+HISTORY_WINDOWS = ((1, 300), (7, 3600), (30, 3600), (90, 3600), (365, 86400))
+
+
+class CoinGeckoAdapter:
+    """Rate-budgeted CoinGecko client with a shared per-coin download cache"""
+
+    def __init__(self, rate_limit_per_minute: int = 10, index_pages: int = 2, timeout: float = 10,
+                 http_get: Optional[Callable] = None, clock: Optional[Callable[[], float]] = None):
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.index_pages = index_pages
+        self.timeout = timeout
+        self.http_get = http_get  # None = requests.get, imported on the first request
+        self.clock = clock or time.time
+
+        self._id_index: Dict[str, str] = {}
+        self._index_built_at = 0.0
+        self._index_retry_after = 0.0
+        self._downloads: Dict[tuple, tuple] = {}  # (coin_id, days) -> (fetched_at, prices, volumes)
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._request_times: List[float] = []
+        self._cooldown_until = 0.0
+
+        self.stats = {'requests': 0, 'cache_hits': 0, 'budget_skips': 0,
+                      'unknown_symbols': 0, 'rate_limited': 0, 'errors': 0}
+
+    # ------------------------------------------------------------------
+    # Request budget
+    # ------------------------------------------------------------------
+
+    def _acquire_budget(self) -> bool:
+        now = self.clock()
+        with self._lock:
+            if now < self._cooldown_until:
+                self.stats['budget_skips'] += 1
+                return False
+            self._request_times = [t for t in self._request_times if now - t < 60]
+            if len(self._request_times) >= self.rate_limit_per_minute:
+                self.stats['budget_skips'] += 1
+                return False
+            self._request_times.append(now)
+            self.stats['requests'] += 1
+            return True
+
+    def _get_json(self, path: str, params: dict):
+        if not self._acquire_budget():
+            return None
+        if self.http_get is None:
+            import requests
+            self.http_get = requests.get
+        try:
+            response = self.http_get(f"{COINGECKO_BASE_URL}{path}", params=params, timeout=self.timeout)
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After')
+                try:
+                    wait = float(retry_after) if retry_after else 60.0
+                except ValueError:
+                    wait = 60.0
+                self._cooldown_until = self.clock() + wait
+                self.stats['rate_limited'] += 1
+                logger.warning(f"CoinGecko rate limited - pausing fallback for {wait:.0f}s")
+                return None
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"CoinGecko request {path} failed: {e}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Symbol index
+    # ------------------------------------------------------------------
+
+    def _build_index(self):
+        index = {}
+        for page in range(1, self.index_pages + 1):
+            data = self._get_json('/coins/markets', {
+                'vs_currency': 'usd', 'order': 'market_cap_desc', 'per_page': 250, 'page': page
+            })
+            if not data:
+                break
+            for coin in data:
+                symbol = str(coin.get('symbol', '')).upper()
+                if symbol and symbol not in index:
+                    index[symbol] = coin.get('id')
+            if len(data) < 250:
+                break
+
+        if index:
+            self._id_index = index
+            self._index_built_at = self.clock()
+            logger.info(f"Built CoinGecko id index for {len(index)} symbols")
+        else:
+            # Retry later; overrides still resolve the major coins meanwhile
+            self._index_retry_after = self.clock() + 3600
+
+    def resolve_id(self, symbol: str) -> Optional[str]:
+        """CoinGecko id for a base symbol, or None if it is not listed"""
+        symbol = symbol.upper()
+        if symbol in COINGECKO_ID_OVERRIDES:
+            return COINGECKO_ID_OVERRIDES[symbol]
+        if not self._index_built_at and self.clock() >= self._index_retry_after:
+            self._build_index()
+        coin_id = self._id_index.get(symbol)
+        if coin_id is None:
+            self.stats['unknown_symbols'] += 1
+        return coin_id
+
+    # ------------------------------------------------------------------
+    # Shared downloads and resampling
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _history_window(timeframe: str, limit: int) -> Optional[tuple]:
+        """(days, spacing) of the shortest window with points at least as fine as timeframe covering limit
+
+        Without one, the longest window fine enough (fewer candles than asked);
+        None when CoinGecko has no spacing that fine, rather than coarser candles.
+        """
+        period = timeframe_seconds(timeframe)
+        needed_days = limit * period / 86400
+        fine_enough = [(days, spacing) for days, spacing in HISTORY_WINDOWS if spacing <= period]
+        if not fine_enough:
+            return None
+        for days, spacing in fine_enough:
+            if needed_days <= days:
+                return days, spacing
+        days, spacing = fine_enough[-1]
+        logger.debug(f"CoinGecko covers {int(days * 86400 / period)} of {limit} {timeframe} candles")
+        return days, spacing
+
+    def _download(self, coin_id: str, days: int, spacing: int) -> Optional[tuple]:
+        key = (coin_id, days)
+        ttl = min(max(spacing, 60), 600)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            cached = self._downloads.get(key)
+            if cached and self.clock() - cached[0] < ttl:
+                self.stats['cache_hits'] += 1
+                return cached
+            data = self._get_json(f'/coins/{coin_id}/market_chart', {'vs_currency': 'usd', 'days': days})
+            if not data or not data.get('prices'):
+                return cached  # stale data beats none during an outage
+            entry = (self.clock(), data['prices'], data.get('total_volumes', []))
+            self._downloads[key] = entry
+            return entry
+
+    @staticmethod
+    def resample(prices: list, volumes: list, period: int) -> List[dict]:
+        """Bucket [ts_ms, price] points into epoch-aligned OHLC candles"""
+        volume_by_ts = {int(ts): v for ts, v in volumes}
+        candles: List[dict] = []
+        for ts_ms, price in prices:
+            ts = int(ts_ms / 1000)
+            bucket = ts - ts % period
+            price = float(price)
+            if candles and candles[-1]['timestamp'] == bucket:
+                c = candles[-1]
+                c['high'] = max(c['high'], price)
+                c['low'] = min(c['low'], price)
+                c['close'] = price
+            else:
+                candles.append({'timestamp': bucket, 'open': price, 'high': price,
+                                'low': price, 'close': price, 'volume': 0.0})
+            vol_24h = volume_by_ts.get(int(ts_ms))
+            if vol_24h is not None:
+                candles[-1]['volume'] = float(vol_24h) * period / 86400
+        return candles
+
+    def get_ohlc(self, pair: str, timeframe: str = '15m', limit: int = 50) -> Optional[list]:
+        """Candles for pair in the requested timeframe, or None"""
+        coin_id = self.resolve_id(pair.split('/')[0])
+        if not coin_id:
+            logger.debug(f"No CoinGecko id for {pair}, skipping fallback")
+            return None
+
+        window = self._history_window(timeframe, limit)
+        if window is None:
+            logger.debug(f"CoinGecko has no data as fine as {timeframe}, skipping fallback for {pair}")
+            return None
+        days, spacing = window
+        entry = self._download(coin_id, days, spacing)
+        if not entry:
+            return None
+
+        candles = self.resample(entry[1], entry[2], max(timeframe_seconds(timeframe), spacing))
+        return candles[-limit:] if candles else None
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, indexed_symbols=len(self._id_index), cached_downloads=len(self._downloads))
+
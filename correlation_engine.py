@@ -0,0 +1,206 @@
+"""
+Rolling Cross-Asset Correlation Engine
+======================================
+
+Keeps windowed return covariance/correlation matrices across the whole pair
+universe, updated incrementally from the candle store:
+
+- Each pair remembers the last candle it contributed, so a series that
+  lags (a held pair the scan skips, a late candle) still lands in its own
+  timestamp row when it catches up. The window holds the newest `window`
+  timestamps.
+- A pair without a candle at a timestamp is missing there, not zero:
+  statistics are pairwise over the rows both pairs have. Running sums of
+  counts, values, squares and cross products over the window are updated
+  with a rank-k update (subtract the rows being replaced, add their new
+  contents) instead of recomputing from scratch. A full recompute every
+  `recompute_every` updates bounds floating-point drift.
+
+select_diversified() does a greedy top-k pick by score that skips candidates
+too correlated with anything already held or already selected.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CorrelationEngine:
+    """Windowed pairwise covariance/correlation over a pair universe with rank-k updates"""
+
+    def __init__(self, window: int = 96, recompute_every: int = 500, min_periods: int = 10):
+        """
+        Args:
+            window: Timestamps (candles) kept per pair
+            recompute_every: Row updates between full recomputes
+            min_periods: Shared rows a pair of series needs before their correlation counts
+        """
+        self.window = window
+        self.recompute_every = recompute_every
+        self.min_periods = min_periods
+        self.pairs: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._reset(0)
+
+    def _reset(self, n: int):
+        self._buf = np.full((self.window, n), np.nan)
+        self._slot_ts: List[Optional[int]] = [None] * self.window
+        self._slot_of: Dict[int, int] = {}  # timestamp -> buffer row
+        self._last_ts: Dict[str, int] = {}  # pair -> newest candle ingested
+        self._n = np.zeros((n, n))    # rows where both pairs have a return
+        self._sx = np.zeros((n, n))   # sum of pair i's returns over those rows
+        self._sxx = np.zeros((n, n))  # sum of pair i's squared returns over those rows
+        self._sxy = np.zeros((n, n))  # sum of products
+        self._updates = 0
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Newest timestamp in the window"""
+        return max(self._slot_of) if self._slot_of else None
+
+    def set_pairs(self, pairs: Iterable[str]):
+        """Set the universe; a changed universe restarts the window"""
+        pairs = list(pairs)
+        if pairs == self.pairs:
+            return
+        self.pairs = pairs
+        self.index = {p: i for i, p in enumerate(pairs)}
+        self._reset(len(pairs))
+
+    def _new_returns(self, candles_by_pair: Dict[str, Sequence[dict]],
+                     include_last: bool) -> Dict[int, List[Tuple[int, float]]]:
+        """timestamp -> [(column, return)] for each pair's candles newer than its last ingested one"""
+        skip = 0 if include_last else 1
+        returns_by_ts: Dict[int, List[Tuple[int, float]]] = {}
+        for pair, candles in candles_by_pair.items():
+            col = self.index.get(pair)
+            if col is None or len(candles) < 2 + skip:
+                continue
+            last = self._last_ts.get(pair)
+            newest = candles[len(candles) - 1 - skip]['timestamp']
+            # Walk back from the newest closed candle only as far as needed
+            stop = max(0, len(candles) - 1 - skip - self.window)
+            for i in range(len(candles) - 1 - skip, stop, -1):
+                ts = candles[i]['timestamp']
+                if last is not None and ts <= last:
+                    break
+                prev_close = candles[i - 1]['close']
+                if prev_close:
+                    returns_by_ts.setdefault(ts, []).append((col, candles[i]['close'] / prev_close - 1.0))
+            if last is None or newest > last:
+                self._last_ts[pair] = newest
+        return returns_by_ts
+
+    def _accumulate(self, rows: np.ndarray, sign: float):
+        present = ~np.isnan(rows)
+        m = present.astype(float)
+        x = np.where(present, rows, 0.0)
+        self._n += sign * (m.T @ m)
+        self._sx += sign * (x.T @ m)
+        self._sxx += sign * ((x * x).T @ m)
+        self._sxy += sign * (x.T @ x)
+
+    def _recompute(self):
+        n = len(self.pairs)
+        for name in ('_n', '_sx', '_sxx', '_sxy'):
+            setattr(self, name, np.zeros((n, n)))
+        self._accumulate(self._buf, 1.0)
+        self._updates = 0
+
+    def update(self, candles_by_pair: Dict[str, Sequence[dict]], include_last: bool = False) -> int:
+        """Ingest newly closed candles; returns the number of new timestamp rows
+
+        The newest candle of each series is treated as still forming and is
+        skipped unless include_last is True. Candles for timestamps already in
+        the window fill their pair's cell in that row; candles older than the
+        window are dropped.
+        """
+        returns_by_ts = self._new_returns(candles_by_pair, include_last)
+        if not returns_by_ts:
+            return 0
+
+        keep = set(sorted(set(self._slot_of) | set(returns_by_ts))[-self.window:])
+        added = sorted(ts for ts in returns_by_ts if ts in keep and ts not in self._slot_of)
+        free = [slot for slot, ts in enumerate(self._slot_ts) if ts is None or ts not in keep]
+        touched = {self._slot_of[ts] for ts in returns_by_ts if ts in self._slot_of and ts in keep}
+        touched.update(free)
+        slots = sorted(touched)
+        if not slots:
+            return 0
+
+        # Rows being replaced hold the evicted timestamps (or NaN while the
+        # buffer is filling), so subtracting them is always exact
+        old = self._buf[slots]
+        for slot in free:
+            ts = self._slot_ts[slot]
+            if ts is not None:
+                del self._slot_of[ts]
+            self._slot_ts[slot] = None
+            self._buf[slot] = np.nan
+        for slot, ts in zip(free, added):
+            self._slot_ts[slot] = ts
+            self._slot_of[ts] = slot
+        for ts, values in returns_by_ts.items():
+            slot = self._slot_of.get(ts)
+            if slot is not None:
+                cols, vals = zip(*values)
+                self._buf[slot, list(cols)] = vals
+
+        self._accumulate(old, -1.0)
+        self._accumulate(self._buf[slots], 1.0)
+        self._updates += len(slots)
+        if self._updates >= self.recompute_every:
+            self._recompute()
+        return len(added)
+
+    def covariance(self) -> np.ndarray:
+        """Pairwise covariance over shared rows; 0 where a pair shares fewer than min_periods rows"""
+        n = self._n
+        enough = n >= max(2, self.min_periods)
+        safe_n = np.where(enough, n, 1.0)
+        cov = (self._sxy - self._sx * self._sx.T / safe_n) / np.where(enough, n - 1, 1.0)
+        return np.where(enough, cov, 0.0)
+
+    def correlation(self) -> np.ndarray:
+        """Pairwise correlation over shared rows; 0 where a pair shares fewer than min_periods rows"""
+        n = self._n
+        enough = n >= max(2, self.min_periods)
+        safe_n = np.where(enough, n, 1.0)
+        # Each side's variance over the rows it shares with the other
+        var_i = np.clip(self._sxx - self._sx ** 2 / safe_n, 0, None)
+        denom = np.sqrt(var_i * var_i.T)
+        cov = self._sxy - self._sx * self._sx.T / safe_n
+        corr = np.divide(cov, denom, out=np.zeros_like(cov), where=enough & (denom > 0))
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def select_diversified(self, candidates: Sequence[Tuple[str, float]], k: int,
+                           held: Iterable[str] = (), max_correlation: float = 0.7) -> List[str]:
+        """Greedy top-k by score, skipping candidates correlated above max_correlation
+
+        Args:
+            candidates: (pair, score) tuples
+            k: Number of pairs to pick
+            held: Pairs already in the portfolio
+            max_correlation: Largest allowed |correlation| with any held/selected pair
+        """
+        ranked = sorted(candidates, key=lambda x: x[1], reverse=True)
+        if k <= 0 or not ranked:
+            return []
+        if len(self._slot_of) < 2:
+            return [p for p, _ in ranked[:k]]
+
+        corr = np.abs(self.correlation())
+        chosen_cols = [self.index[p] for p in held if p in self.index]
+        selected = []
+        for pair, _ in ranked:
+            col = self.index.get(pair)
+            if col is not None and chosen_cols and corr[col, chosen_cols].max() > max_correlation:
+                continue
+            selected.append(pair)
+            if col is not None:
+                chosen_cols.append(col)
+            if len(selected) >= k:
+                break
+        return selected
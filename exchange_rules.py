@@ -0,0 +1,165 @@
+"""
+Exchange Trading Rules Cache
+============================
+
+Keeps per-pair trading rules from Roostoo's /v3/exchange_info (price and
+amount precision, minimum order value, tradability) in memory, refreshes them
+in a background thread, and rounds/validates orders locally so malformed
+orders are caught before they are signed and sent.
+"""
+
+import logging
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_EVEN
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PairRules:
+    """Trading rules for a single pair"""
+
+    __slots__ = ('pair', 'price_precision', 'amount_precision', 'min_notional', 'can_trade')
+
+    def __init__(self, pair: str, price_precision: int, amount_precision: int,
+                 min_notional: float = 0.0, can_trade: bool = True):
+        self.pair = pair
+        self.price_precision = price_precision
+        self.amount_precision = amount_precision
+        self.min_notional = min_notional
+        self.can_trade = can_trade
+
+    @property
+    def step_size(self) -> Decimal:
+        return Decimal(1).scaleb(-self.amount_precision)
+
+    @property
+    def tick_size(self) -> Decimal:
+        return Decimal(1).scaleb(-self.price_precision)
+
+    def __repr__(self) -> str:
+        return (f"PairRules({self.pair}, price_precision={self.price_precision}, "
+                f"amount_precision={self.amount_precision}, min_notional={self.min_notional})")
+
+
+def parse_exchange_info(data: dict) -> Dict[str, PairRules]:
+    """Build {pair: PairRules} from an exchange_info response"""
+    rules = {}
+    for pair, info in (data or {}).get('TradePairs', {}).items():
+        try:
+            rules[pair] = PairRules(
+                pair,
+                price_precision=int(info.get('PricePrecision', 8)),
+                amount_precision=int(info.get('AmountPrecision', 8)),
+                min_notional=float(info.get('MiniOrder', 0) or 0),
+                can_trade=bool(info.get('CanTrade', True)),
+            )
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping malformed exchange_info entry for {pair}: {e}")
+    return rules
+
+
+class ExchangeInfoCache:
+    """Cached per-pair trading rules with background refresh and local order checks"""
+
+    def __init__(self, fetcher: Callable[[], Optional[dict]], refresh_interval: float = 3600):
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self.rules: Dict[str, PairRules] = {}
+        self.last_refresh = 0.0
+        self.last_attempt = 0.0
+        self.stats = {'refreshes': 0, 'refresh_failures': 0, 'validated': 0,
+                      'unvalidated': 0, 'prevented_rejects': 0, 'reject_reasons': {}}
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """Fetch exchange_info now; keeps the previous rules on failure"""
+        self.last_attempt = time.time()
+        data = self.fetcher()
+        rules = parse_exchange_info(data) if data else {}
+        if not rules:
+            self.stats['refresh_failures'] += 1
+            logger.warning("exchange_info refresh failed - keeping cached trading rules")
+            return False
+        with self._lock:
+            self.rules = rules
+            self.last_refresh = time.time()
+        self.stats['refreshes'] += 1
+        logger.info(f"Loaded trading rules for {len(rules)} pairs")
+        return True
+
+    def start(self):
+        """Load rules once and keep them fresh in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name='exchange-info', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing exchange_info: {e}")
+
+    def get(self, pair: str) -> Optional[PairRules]:
+        if not self.last_attempt:
+            self.refresh()
+        with self._lock:
+            return self.rules.get(pair)
+
+    def _reject(self, reason: str) -> Tuple[bool, None, None, str]:
+        self.stats['prevented_rejects'] += 1
+        self.stats['reject_reasons'][reason] = self.stats['reject_reasons'].get(reason, 0) + 1
+        return False, None, None, reason
+
+    def prepare_order(self, pair: str, order_type: str, quantity, price=None,
+                      reference_price: Optional[float] = None) -> Tuple[bool, Optional[str], Optional[str], str]:
+        """Round an order to the pair's precision and check it against the rules
+
+        Args:
+            pair: Trading pair
+            order_type: "MARKET" or "LIMIT"
+            quantity: Order quantity (number or string)
+            price: Limit price (LIMIT orders)
+            reference_price: Last price, used for the MARKET min-notional check
+
+        Returns:
+            tuple: (ok, quantity_str, price_str, reason). Without cached rules
+            the order passes through unrounded.
+        """
+        rules = self.get(pair)
+        if rules is None:
+            self.stats['unvalidated'] += 1
+            return True, str(quantity), None if price is None else str(price), 'no_rules'
+
+        if not rules.can_trade:
+            return self._reject('pair_not_tradeable')
+
+        qty = Decimal(str(quantity)).quantize(rules.step_size, rounding=ROUND_DOWN)
+        if qty <= 0:
+            return self._reject('quantity_below_step')
+
+        price_str = None
+        notional_price = reference_price
+        if order_type.upper() == 'LIMIT' and price is not None:
+            px = Decimal(str(price)).quantize(rules.tick_size, rounding=ROUND_HALF_EVEN)
+            if px <= 0:
+                return self._reject('price_below_tick')
+            price_str = str(px)
+            notional_price = float(px)
+
+        if rules.min_notional and notional_price and float(qty) * notional_price < rules.min_notional:
+            return self._reject('below_min_notional')
+
+        self.stats['validated'] += 1
+        return True, str(qty), price_str, 'ok'
@@ -0,0 +1,245 @@
+"""
+Vectorized Feature Matrix
+=========================
+
+Builds a (pairs x features) matrix from the candle store for model-driven
+strategies:
+
+- Candle windows of all pairs are stacked into (pairs x time) arrays and
+  every feature is computed with array operations across the whole
+  universe at once (EMA/RSI loops run over time, not pairs).
+- Rows are cached per pair and keyed on the last candle close of both the
+  primary and the higher timeframe; each update only recomputes the pairs
+  that received a new candle since the previous build.
+- Features: returns over several horizons, ATR%, RSI, EMA slopes and
+  spread, realized volatility, volume z-score, the FVG/CHOCH flags used by
+  the Percoco detectors and higher-timeframe return/EMA/RSI context.
+
+LinearFeatureModel is a minimal model: one matrix-vector product scores the
+whole universe.
+"""
+
+import json
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RETURN_HORIZONS = (1, 4, 16)
+ATR_PERIOD = 14
+RSI_PERIOD = 14
+EMA_FAST = 12
+EMA_SLOW = 26
+EMA_SLOPE_LOOKBACK = 4
+VOLATILITY_WINDOW = 20
+VOLUME_WINDOW = 20
+
+FEATURE_NAMES = tuple(
+    [f'ret_{h}' for h in RETURN_HORIZONS] +
+    ['atr_pct', 'rsi', 'ema_fast_slope', 'ema_slow_slope', 'ema_spread', 'volatility', 'volume_z',
+     'fvg_bull', 'fvg_bear', 'choch_bull', 'choch_bear',
+     'htf_ret_4', 'htf_ema_spread', 'htf_rsi']
+)
+
+
+class FeatureMatrix:
+    """Feature values for a set of pairs"""
+
+    def __init__(self, pairs: List[str], names: Sequence[str], values: np.ndarray):
+        self.pairs = pairs
+        self.names = tuple(names)
+        self.values = values
+        self.index = {p: i for i, p in enumerate(pairs)}
+
+    def row(self, pair: str) -> Dict[str, float]:
+        return dict(zip(self.names, self.values[self.index[pair]].tolist()))
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.names.index(name)]
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+
+def stack_candles(candle_lists: Sequence[Sequence[dict]], window: int) -> Dict[str, np.ndarray]:
+    """Right-aligned (pairs x window) arrays of open/high/low/close/volume
+
+    Short histories are left-padded with their first candle, so padded
+    steps contribute zero returns and true ranges.
+    """
+    fields = ('open', 'high', 'low', 'close', 'volume')
+    out = {f: np.empty((len(candle_lists), window)) for f in fields}
+    for row, candles in enumerate(candle_lists):
+        recent = list(candles)[-window:]
+        pad = window - len(recent)
+        for f in fields:
+            values = [c.get(f, 0.0) or 0.0 for c in recent]
+            out[f][row, pad:] = values
+            out[f][row, :pad] = values[0] if values else 0.0
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """EMA along the time axis of a (pairs x time) array"""
+    alpha = 2.0 / (period + 1)
+    out = np.empty_like(values)
+    out[:, 0] = values[:, 0]
+    for t in range(1, values.shape[1]):
+        out[:, t] = alpha * values[:, t] + (1 - alpha) * out[:, t - 1]
+    return out
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """Wilder RSI of the last candle for each row"""
+    diff = np.diff(close, axis=1)
+    gains = np.clip(diff, 0, None)
+    losses = np.clip(-diff, 0, None)
+    avg_gain = gains[:, :period].mean(axis=1)
+    avg_loss = losses[:, :period].mean(axis=1)
+    for t in range(period, diff.shape[1]):
+        avg_gain = (avg_gain * (period - 1) + gains[:, t]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[:, t]) / period
+    rs = np.divide(avg_gain, avg_loss, out=np.full_like(avg_gain, np.inf), where=avg_loss > 0)
+    return np.where((avg_gain == 0) & (avg_loss == 0), 50.0, 100.0 - 100.0 / (1.0 + rs))
+
+
+def _ratio(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.divide(a, b, out=np.zeros_like(a), where=b != 0) - np.where(b != 0, 1.0, 0.0)
+
+
+def compute_features(primary: Dict[str, np.ndarray], htf: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """(pairs x len(FEATURE_NAMES)) feature values from stacked candle arrays"""
+    o, h, l, c, v = primary['open'], primary['high'], primary['low'], primary['close'], primary['volume']
+    n = c.shape[0]
+    cols = []
+
+    for horizon in RETURN_HORIZONS:
+        cols.append(_ratio(c[:, -1], c[:, -1 - horizon]))
+
+    prev_close = np.concatenate([c[:, :1], c[:, :-1]], axis=1)
+    true_range = np.maximum(h - l, np.maximum(np.abs(h - prev_close), np.abs(l - prev_close)))
+    atr = true_range[:, -ATR_PERIOD:].mean(axis=1)
+    cols.append(np.divide(atr, c[:, -1], out=np.zeros(n), where=c[:, -1] != 0))
+    cols.append(rsi(c))
+
+    ema_fast = ema(c, EMA_FAST)
+    ema_slow = ema(c, EMA_SLOW)
+    cols.append(_ratio(ema_fast[:, -1], ema_fast[:, -1 - EMA_SLOPE_LOOKBACK]))
+    cols.append(_ratio(ema_slow[:, -1], ema_slow[:, -1 - EMA_SLOPE_LOOKBACK]))
+    cols.append(_ratio(ema_fast[:, -1], ema_slow[:, -1]))
+
+    log_ret = np.log(np.divide(c[:, 1:], c[:, :-1], out=np.ones_like(c[:, 1:]), where=c[:, :-1] > 0))
+    cols.append(log_ret[:, -VOLATILITY_WINDOW:].std(axis=1))
+
+    vol_window = v[:, -VOLUME_WINDOW:]
+    vol_std = vol_window.std(axis=1)
+    cols.append(np.divide(v[:, -1] - vol_window.mean(axis=1), vol_std, out=np.zeros(n), where=vol_std > 0))
+
+    # Same conditions as TechnicalAnalysis.detect_fair_value_gap over the window
+    body_low = np.minimum(o, c)
+    body_high = np.maximum(o, c)
+    green = c > o
+    red = c < o
+    bull_fvg = green[:, :-2] & green[:, 1:-1] & green[:, 2:] & (body_low[:, :-2] > body_high[:, 2:])
+    bear_fvg = red[:, :-2] & red[:, 1:-1] & red[:, 2:] & (body_high[:, :-2] < body_low[:, 2:])
+    cols.append(bull_fvg.any(axis=1).astype(float))
+    cols.append(bear_fvg.any(axis=1).astype(float))
+
+    # ... and detect_change_of_character (last body vs. the two before it)
+    cols.append((body_high[:, -1] > body_high[:, -3:-1].max(axis=1)).astype(float))
+    cols.append((body_low[:, -1] < body_low[:, -3:-1].min(axis=1)).astype(float))
+
+    if htf is not None:
+        hc = htf['close']
+        cols.append(_ratio(hc[:, -1], hc[:, -5]))
+        cols.append(_ratio(ema(hc, EMA_FAST)[:, -1], ema(hc, EMA_SLOW)[:, -1]))
+        cols.append(rsi(hc))
+    else:
+        cols.extend([np.zeros(n), np.zeros(n), np.full(n, 50.0)])
+
+    return np.column_stack(cols)
+
+
+class FeatureBuilder:
+    """Incremental per-candle-close feature matrix over the pair universe"""
+
+    def __init__(self, window: int = 50, htf_window: int = 30, min_candles: int = 30):
+        self.window = window
+        self.htf_window = htf_window
+        self.min_candles = min_candles
+        self._rows: Dict[str, tuple] = {}  # pair -> (key, feature row)
+        self.stats = {'builds': 0, 'recomputed': 0, 'reused': 0}
+
+    @staticmethod
+    def _key(candles, htf_candles) -> tuple:
+        last = candles[-1]
+        htf_last = htf_candles[-1].get('timestamp') if htf_candles else None
+        return len(candles), last.get('timestamp'), last['close'], htf_last
+
+    def build(self, candles_by_pair: Dict[str, Sequence[dict]],
+              htf_by_pair: Optional[Dict[str, Sequence[dict]]] = None,
+              pairs: Optional[Sequence[str]] = None) -> FeatureMatrix:
+        """Feature matrix for pairs (default: every pair with enough candles)"""
+        htf_by_pair = htf_by_pair or {}
+        if pairs is None:
+            pairs = list(candles_by_pair)
+        usable = [p for p in pairs if len(candles_by_pair.get(p) or ()) >= self.min_candles]
+
+        stale = []
+        for pair in usable:
+            key = self._key(candles_by_pair[pair], htf_by_pair.get(pair))
+            cached = self._rows.get(pair)
+            if cached is None or cached[0] != key:
+                stale.append((pair, key))
+
+        if stale:
+            primary = stack_candles([candles_by_pair[p] for p, _ in stale], self.window)
+            htf_lists = [htf_by_pair.get(p) for p, _ in stale]
+            htf = None
+            if any(htf_lists):
+                # Pairs without higher-timeframe candles fall back to their primary series
+                htf = stack_candles([hl if hl else candles_by_pair[p] for (p, _), hl in zip(stale, htf_lists)],
+                                    self.htf_window)
+            values = compute_features(primary, htf)
+            for (pair, key), row in zip(stale, values):
+                self._rows[pair] = (key, row)
+
+        self.stats['builds'] += 1
+        self.stats['recomputed'] += len(stale)
+        self.stats['reused'] += len(usable) - len(stale)
+        matrix = np.array([self._rows[p][1] for p in usable]) if usable else np.empty((0, len(FEATURE_NAMES)))
+        return FeatureMatrix(usable, FEATURE_NAMES, matrix)
+
+    def forget(self, keep: Sequence[str]):
+        """Drop cached rows for pairs no longer in the universe"""
+        keep = set(keep)
+        for pair in [p for p in self._rows if p not in keep]:
+            del self._rows[pair]
+
+
+class LinearFeatureModel:
+    """score = features @ weights + bias, with optional per-feature standardization"""
+
+    def __init__(self, weights: Dict[str, float], bias: float = 0.0,
+                 mean: Optional[Dict[str, float]] = None, scale: Optional[Dict[str, float]] = None):
+        self.weights = weights
+        self.bias = bias
+        self.mean = mean or {}
+        self.scale = scale or {}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'LinearFeatureModel':
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec['weights'], spec.get('bias', 0.0), spec.get('mean'), spec.get('scale'))
+
+    def predict(self, matrix: FeatureMatrix) -> np.ndarray:
+        names = matrix.names
+        w = np.array([self.weights.get(n, 0.0) for n in names])
+        mu = np.array([self.mean.get(n, 0.0) for n in names])
+        sd = np.array([self.scale.get(n, 1.0) or 1.0 for n in names])
+        if not len(matrix):
+            return np.empty(0)
+        return ((matrix.values - mu) / sd) @ w + self.bias
@@ -0,0 +1,76 @@
+"""
+Shared Market-Data Snapshot
+===========================
+
+One immutable view of the market per cycle, fetched once and handed to every
+strategy/account so API cost does not grow with the number of strategies:
+
+- tickers: pair -> read-only ticker fields from one bulk ticker call
+- candles: pair -> tuple of read-only candle mappings (primary timeframe)
+
+Candles and tickers are wrapped in MappingProxyType, so strategies running in
+parallel threads can read the same snapshot without copying and cannot
+modify what another strategy sees.
+"""
+
+import logging
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MarketSnapshot:
+    """Read-only tickers and candles captured at one point in time"""
+
+    __slots__ = ('timestamp', 'timeframe', 'tickers', 'candles', 'stats')
+
+    def __init__(self, timestamp: float, timeframe: str, tickers: Mapping[str, Mapping],
+                 candles: Mapping[str, Tuple[Mapping, ...]], stats: Optional[dict] = None):
+        self.timestamp = timestamp
+        self.timeframe = timeframe
+        self.tickers = tickers
+        self.candles = candles
+        self.stats = MappingProxyType(dict(stats or {}))
+
+    @property
+    def pairs(self) -> Tuple[str, ...]:
+        return tuple(self.candles)
+
+    def price(self, pair: str) -> float:
+        ticker = self.tickers.get(pair)
+        return ticker['LastPrice'] if ticker else 0.0
+
+
+def freeze_candles(candles: Sequence[dict]) -> Tuple[Mapping, ...]:
+    return tuple(MappingProxyType(dict(c)) for c in candles)
+
+
+def build_snapshot(timeframe: str, fetch_tickers: Callable[[], Optional[Dict[str, dict]]],
+                   fetch_candles: Optional[Callable[[str], Optional[list]]] = None,
+                   pairs: Iterable[str] = (), clock: Callable[[], float] = None) -> MarketSnapshot:
+    """Fetch tickers once and (optionally) candles once per pair
+
+    Args:
+        timeframe: Timeframe of the candles
+        fetch_tickers: Returns {pair: ticker fields} from one bulk call
+        fetch_candles: Returns the candle list for a pair; None builds a tickers-only snapshot
+        pairs: Pairs to fetch candles for
+    """
+    clock = clock or time.time
+    started = clock()
+    tickers = fetch_tickers() or {}
+    candles = {}
+    requested = 0
+    if fetch_candles is not None:
+        for pair in pairs:
+            requested += 1
+            data = fetch_candles(pair)
+            if data:
+                candles[pair] = freeze_candles(data)
+
+    frozen_tickers = MappingProxyType({p: MappingProxyType(dict(t)) for p, t in tickers.items()})
+    stats = {'tickers': len(frozen_tickers), 'candle_requests': requested,
+             'candle_series': len(candles), 'build_seconds': clock() - started}
+    return MarketSnapshot(started, timeframe, frozen_tickers, MappingProxyType(candles), stats)
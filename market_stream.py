@@ -0,0 +1,567 @@
+"""
+Push Market-Data Feed
+=====================
+
+Streaming alternative to polling candles every SCAN_INTERVAL and tickers
+every POSITION_CHECK_INTERVAL:
+
+- MarketStream reads a Server-Sent Events feed over a plain HTTP connection
+  (standard library only). Every `update` event carries a batch of ticker
+  and candle updates; the latest ticker per pair is kept for price lookups
+  and every update is handed to a callback, so stops can be checked and
+  analysis triggered the moment data arrives.
+- The client reconnects with exponential backoff and sends Last-Event-ID,
+  so the server replays what was missed. When it cannot (the gap is older
+  than its buffer) it sends `reset` and the client calls on_resync, after
+  which the caller re-seeds from REST. healthy() turns False once the feed
+  has been silent for stale_after seconds; callers then fall back to REST
+  polling until it recovers.
+- CandleStore applies streamed candles to the same {timeframe: {pair: deque}}
+  history the REST fetchers fill: an update to the forming candle replaces
+  it, a newer timestamp appends. Candle dicts are replaced, never mutated,
+  so window() copies can be analyzed while the feed keeps writing.
+- FeedServer is a local stand-in feed: random-walk tickers and candles for
+  any number of pairs at a target update rate, with a replay buffer and
+  optional forced disconnects, for offline and load testing.
+
+Wire format (one SSE event per batch):
+
+    id: 1234
+    event: update
+    data: {"sent": 1700000000.12, "updates": [
+           {"type": "ticker", "pair": "BTC/USD", "LastPrice": ..., "BidPrice": ..., "AskPrice": ...,
+            "Volume24h": ..., "Change24h": ..., "ts": ...},
+           {"type": "candle", "pair": "BTC/USD", "timeframe": "15m", "timestamp": ..., "open": ...,
+            "high": ..., "low": ..., "close": ..., "volume": ...}]}
+
+Serve a stand-in feed and load-test it:
+    python market_stream.py serve --port 8765 --pairs 200 --rate 5000 --speed 60
+    python market_stream.py bench --url http://127.0.0.1:8765/stream --seconds 10
+"""
+
+import argparse
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAME_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+
+
+class MarketStream:
+    """SSE market-data client with reconnect, replay and staleness detection"""
+
+    def __init__(self, url: str, on_update: Callable[[dict], None],
+                 on_resync: Optional[Callable[[str], None]] = None, stale_after: float = 15.0,
+                 reconnect_min: float = 0.5, reconnect_max: float = 30.0,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            url: http(s) URL of the event stream
+            on_update: Called with every ticker/candle update, on the reader thread (keep it fast)
+            on_resync: Called with 'connect' after the first connect and 'reset' when the
+                server could not replay a gap; the caller should refresh its state from REST
+            stale_after: Seconds without any message (heartbeats included) before the feed is unhealthy
+        """
+        self.url = url
+        self.on_update = on_update
+        self.on_resync = on_resync
+        self.stale_after = stale_after
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.clock = clock or time.time
+
+        self.tickers: Dict[str, dict] = {}
+        self.connected = False
+        self.last_event_id: Optional[str] = None
+        self.last_message_at = 0.0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._conn = None
+        self.stats = {'connects': 0, 'disconnects': 0, 'resyncs': 0, 'events': 0, 'updates': 0,
+                      'callback_errors': 0, 'last_lag': 0.0, 'last_error': None}
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='market-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def healthy(self) -> bool:
+        """Connected and heard from within stale_after seconds"""
+        return self.connected and self.clock() - self.last_message_at < self.stale_after
+
+    def price(self, pair: str) -> Optional[float]:
+        """Latest streamed last price for pair, or None"""
+        ticker = self.tickers.get(pair)
+        return ticker['LastPrice'] if ticker else None
+
+    # ------------------------------------------------------------------
+    # Reader thread
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        import http.client
+
+        parts = urlsplit(self.url)
+        conn_cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        conn = conn_cls(parts.hostname, parts.port, timeout=self.stale_after)
+        headers = {'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'}
+        if self.last_event_id is not None:
+            headers['Last-Event-ID'] = self.last_event_id
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        if response.status != 200:
+            conn.close()
+            raise ConnectionError(f"feed returned HTTP {response.status}")
+        self._conn = conn
+        return response
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                if conn.sock is not None:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def _run(self):
+        delay = self.reconnect_min
+        first = True
+        while self._running:
+            try:
+                response = self._connect()
+                self.connected = True
+                self.last_message_at = self.clock()
+                self.stats['connects'] += 1
+                logger.info(f"Market feed connected: {self.url}"
+                            + (f" (resuming after event {self.last_event_id})" if self.last_event_id else ""))
+                delay = self.reconnect_min
+                if first:
+                    first = False
+                    self._resync('connect')
+                self._read(response)
+                if self._running:
+                    raise ConnectionError("feed closed the stream")
+            except Exception as e:
+                if not self._running:
+                    break
+                self.stats['last_error'] = str(e)
+                if self.connected:
+                    self.stats['disconnects'] += 1
+                logger.warning(f"Market feed disconnected: {e}; reconnecting in {delay:.1f}s")
+            finally:
+                self.connected = False
+                self._close()
+            if self._running:
+                time.sleep(delay)
+                delay = min(self.reconnect_max, delay * 2)
+
+    def _read(self, response):
+        event, data, event_id = 'message', [], None
+        while self._running:
+            line = response.readline()
+            if not line:
+                return
+            self.last_message_at = self.clock()
+            line = line.rstrip(b'\r\n')
+            if not line:
+                if data:
+                    self._dispatch(event, b'\n'.join(data))
+                if event_id is not None:
+                    self.last_event_id = event_id
+                event, data, event_id = 'message', [], None
+            elif line.startswith(b':'):
+                continue  # heartbeat comment
+            else:
+                field, _, value = line.partition(b':')
+                if value.startswith(b' '):
+                    value = value[1:]
+                if field == b'data':
+                    data.append(value)
+                elif field == b'event':
+                    event = value.decode('utf-8')
+                elif field == b'id':
+                    event_id = value.decode('utf-8')
+
+    def _dispatch(self, event: str, data: bytes):
+        self.stats['events'] += 1
+        if event == 'reset':
+            self._resync('reset')
+            return
+        if event != 'update':
+            return
+        message = json.loads(data)
+        if message.get('sent'):
+            self.stats['last_lag'] = self.clock() - message['sent']
+        updates = message.get('updates', ())
+        self.stats['updates'] += len(updates)
+        for update in updates:
+            if update.get('type') == 'ticker':
+                self.tickers[update['pair']] = update
+            try:
+                self.on_update(update)
+            except Exception as e:
+                self.stats['callback_errors'] += 1
+                logger.error(f"Market feed callback failed for {update.get('pair')}: {e}", exc_info=True)
+
+    def _resync(self, reason: str):
+        self.stats['resyncs'] += 1
+        if reason == 'reset':
+            logger.warning("Market feed could not replay the gap; resyncing from REST")
+        if self.on_resync:
+            try:
+                self.on_resync(reason)
+            except Exception as e:
+                logger.error(f"Market feed resync failed: {e}", exc_info=True)
+
+
+class CandleStore:
+    """Thread-safe streamed-candle writer over a {timeframe: {pair: deque}} history"""
+
+    def __init__(self, history: Dict[str, Dict[str, deque]], maxlen: int):
+        self.history = history
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self.stats = {'replaced': 0, 'appended': 0, 'ignored': 0}
+
+    def seed(self, timeframe: str, pair: str, candles: List[dict]):
+        """Replace a series with REST candles (before streaming into it, or after a resync)"""
+        with self._lock:
+            self.history.setdefault(timeframe, {})[pair] = deque(candles, maxlen=self.maxlen)
+
+    def clear(self, timeframe: str):
+        """Forget every series of timeframe so they are re-seeded"""
+        with self._lock:
+            self.history.pop(timeframe, None)
+
+    def apply(self, update: dict) -> bool:
+        """Merge one candle update; False if the series is not seeded yet or the update is stale"""
+        candle = {'timestamp': int(update['timestamp']), 'open': update['open'], 'high': update['high'],
+                  'low': update['low'], 'close': update['close'], 'volume': update.get('volume', 0.0)}
+        with self._lock:
+            series = self.history.get(update['timeframe'], {}).get(update['pair'])
+            if not series:
+                self.stats['ignored'] += 1
+                return False
+            last = series[-1]['timestamp']
+            if candle['timestamp'] == last:
+                series[-1] = candle
+                self.stats['replaced'] += 1
+            elif candle['timestamp'] > last:
+                series.append(candle)
+                self.stats['appended'] += 1
+            else:
+                self.stats['ignored'] += 1
+                return False
+        return True
+
+    def window(self, timeframe: str, pair: str) -> tuple:
+        with self._lock:
+            return tuple(self.history.get(timeframe, {}).get(pair, ()))
+
+    def windows(self, timeframe: str, pairs: Optional[Iterable[str]] = None) -> Dict[str, tuple]:
+        """pair -> candle tuple for pairs (default: every series of timeframe)"""
+        with self._lock:
+            series = self.history.get(timeframe, {})
+            pairs = list(series) if pairs is None else pairs
+            return {pair: tuple(series[pair]) for pair in pairs if series.get(pair)}
+
+    def length(self, timeframe: str, pair: str) -> int:
+        with self._lock:
+            return len(self.history.get(timeframe, {}).get(pair, ()))
+
+
+# ============================================================================
+# Stand-in feed server
+# ============================================================================
+
+class FeedServer:
+    """Local SSE feed of synthetic ticker and candle updates"""
+
+    def __init__(self, pairs: List[str], rate: float = 1000.0, timeframes: Iterable[str] = ('15m',),
+                 speed: float = 1.0, host: str = '127.0.0.1', port: int = 0, buffer: int = 2000,
+                 drop_every: float = 0.0, batch_interval: float = 0.01, seed: int = 0):
+        """
+        Args:
+            pairs: Pairs to simulate
+            rate: Price ticks per second across all pairs (each tick emits a ticker
+                update plus one candle update per timeframe)
+            speed: Market seconds per wall second, so candles close faster offline
+            buffer: Batches kept for Last-Event-ID replay
+            drop_every: Close every client connection this often (seconds; 0 = never)
+        """
+        self.pairs = list(pairs)
+        self.rate = rate
+        self.timeframes = [tf for tf in timeframes if tf in TIMEFRAME_SECONDS]
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.batch_interval = batch_interval
+        self.drop_every = drop_every
+        self._rng = random.Random(seed)
+        self._prices = {p: 10.0 ** self._rng.uniform(-1, 4.5) for p in self.pairs}
+        self._open_24h = dict(self._prices)
+        self._candles: Dict[tuple, dict] = {}
+        self._ring: deque = deque(maxlen=buffer)  # (seq, encoded event)
+        self._seq = 0
+        # Event ids are '<epoch>-<seq>': ids from an earlier server run are never replayed
+        self._epoch = f"{int(time.time() * 1000):x}"
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        self._httpd = None
+        self._started_wall = 0.0
+        self._started_market = 0.0
+        self.stats = {'ticks': 0, 'batches': 0, 'clients': 0, 'replays': 0, 'resets': 0, 'drops': 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/stream"
+
+    def market_time(self) -> float:
+        return self._started_market + (time.time() - self._started_wall) * self.speed
+
+    # ------------------------------------------------------------------
+    # Generator
+    # ------------------------------------------------------------------
+
+    def _tick(self, pair: str, now: float) -> List[dict]:
+        price = self._prices[pair] * (1 + self._rng.gauss(0, 0.0008))
+        self._prices[pair] = price
+        spread = price * 0.0002
+        updates = [{'type': 'ticker', 'pair': pair, 'LastPrice': price, 'BidPrice': price - spread,
+                    'AskPrice': price + spread, 'Volume24h': 1e6 * (1 + hash(pair) % 50),
+                    'Change24h': (price / self._open_24h[pair] - 1) * 100, 'ts': now}]
+        for timeframe in self.timeframes:
+            period = TIMEFRAME_SECONDS[timeframe]
+            bucket = int(now // period * period)
+            candle = self._candles.get((pair, timeframe))
+            if candle is None or candle['timestamp'] != bucket:
+                candle = {'type': 'candle', 'pair': pair, 'timeframe': timeframe, 'timestamp': bucket,
+                          'open': price, 'high': price, 'low': price, 'close': price, 'volume': 0.0}
+            else:
+                candle = dict(candle, high=max(candle['high'], price), low=min(candle['low'], price), close=price)
+            candle['volume'] += self._rng.random() * 10
+            self._candles[(pair, timeframe)] = candle
+            updates.append(candle)
+        return updates
+
+    def _generate(self):
+        owed = 0.0
+        last = time.time()
+        index = 0
+        while self._running:
+            time.sleep(self.batch_interval)
+            wall = time.time()
+            owed += (wall - last) * self.rate
+            last = wall
+            n = int(owed)
+            if n <= 0:
+                continue
+            owed -= n
+            now = self.market_time()
+            updates = []
+            for _ in range(n):
+                updates.extend(self._tick(self.pairs[index % len(self.pairs)], now))
+                index += 1
+            with self._cond:
+                self._seq += 1
+                payload = json.dumps({'sent': time.time(), 'updates': updates}, separators=(',', ':'))
+                self._ring.append((self._seq, f"id: {self._epoch}-{self._seq}\nevent: update\ndata: {payload}\n\n".encode()))
+                self.stats['ticks'] += n
+                self.stats['batches'] += 1
+                self._cond.notify_all()
+
+    def _since(self, last_id: int) -> Optional[List[bytes]]:
+        """Encoded batches after last_id, or None if the buffer no longer reaches back that far"""
+        if last_id > self._seq or (self._ring and last_id < self._ring[0][0] - 1):
+            return None
+        return [event for seq, event in self._ring if seq > last_id]
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        server = self
+
+        class StreamHandler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                logger.debug(fmt % args)
+
+            def do_GET(self):
+                if urlsplit(self.path).path != '/stream':
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                server._stream(self.wfile, self.headers.get('Last-Event-ID'))
+
+        return StreamHandler
+
+    def _reset_event(self) -> bytes:
+        self.stats['resets'] += 1
+        return f"id: {self._epoch}-{self._seq}\nevent: reset\ndata: {{}}\n\n".encode()
+
+    def _stream(self, wfile, last_event_id: Optional[str]):
+        with self._cond:
+            self.stats['clients'] += 1
+            last, pending = self._seq, []
+            if last_event_id is not None:
+                epoch, _, seq = last_event_id.partition('-')
+                replay = self._since(int(seq)) if epoch == self._epoch and seq.isdigit() else None
+                if replay is None:
+                    pending = [self._reset_event()]
+                else:
+                    self.stats['replays'] += 1
+                    pending = replay
+        connected_at = time.time()
+        try:
+            while self._running:
+                if pending:
+                    wfile.write(b''.join(pending))
+                else:
+                    wfile.write(b": ping\n\n")
+                wfile.flush()
+                if self.drop_every and time.time() - connected_at >= self.drop_every:
+                    self.stats['drops'] += 1
+                    return
+                with self._cond:
+                    if self._seq == last:
+                        self._cond.wait(timeout=1.0)
+                    pending = self._since(last)
+                    if pending is None:  # this client fell behind the buffer
+                        pending = [self._reset_event()]
+                    last = self._seq
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def start(self) -> 'FeedServer':
+        from http.server import ThreadingHTTPServer
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._started_wall = time.time()
+        self._started_market = self._started_wall
+        self._running = True
+        self._threads = [threading.Thread(target=self._generate, name='feed-generator', daemon=True),
+                         threading.Thread(target=self._httpd.serve_forever, name='feed-http', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Stand-in feed on {self.url}: {len(self.pairs)} pairs, {self.rate:.0f} ticks/s, "
+                    f"speed x{self.speed:g}")
+        return self
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+
+def synthetic_pairs(n: int) -> List[str]:
+    return [f"C{i:04d}/USD" for i in range(n)]
+
+
+def bench(url: str, seconds: float) -> dict:
+    """Consume a feed for seconds and report throughput and delivery lag"""
+    lags = []
+    stream = MarketStream(url, on_update=lambda update: None)
+    stream.start()
+    started = time.time()
+    next_sample = started
+    while time.time() - started < seconds:
+        time.sleep(0.05)
+        if time.time() >= next_sample and stream.connected:
+            lags.append(stream.stats['last_lag'])
+            next_sample += 0.25
+    stream.stop()
+    elapsed = time.time() - started
+    lags.sort()
+    return {'seconds': round(elapsed, 2), 'updates': stream.stats['updates'],
+            'updates_per_second': round(stream.stats['updates'] / elapsed),
+            'events': stream.stats['events'], 'pairs': len(stream.tickers),
+            'lag_p50_ms': round(lags[len(lags) // 2] * 1000, 1) if lags else None,
+            'lag_max_ms': round(lags[-1] * 1000, 1) if lags else None,
+            'connects': stream.stats['connects'], 'resyncs': stream.stats['resyncs']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in market feed and feed load test')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help='Run a synthetic SSE feed')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--pairs', type=int, default=100, help='Number of synthetic pairs')
+    serve.add_argument('--rate', type=float, default=1000.0, help='Price ticks per second')
+    serve.add_argument('--speed', type=float, default=1.0, help='Market seconds per wall second')
+    serve.add_argument('--timeframes', default='15m')
+    serve.add_argument('--drop-every', type=float, default=0.0, help='Disconnect clients every N seconds')
+    load = sub.add_parser('bench', help='Consume a feed and report throughput')
+    load.add_argument('--url', default='http://127.0.0.1:8765/stream')
+    load.add_argument('--seconds', type=float, default=10.0)
+    load.add_argument('--serve', action='store_true', help='Start an in-process stand-in feed first')
+    load.add_argument('--pairs', type=int, default=100)
+    load.add_argument('--rate', type=float, default=5000.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.command == 'serve':
+        server = FeedServer(synthetic_pairs(args.pairs), rate=args.rate, speed=args.speed,
+                            timeframes=args.timeframes.split(','), host=args.host, port=args.port,
+                            drop_every=args.drop_every).start()
+        try:
+            while True:
+                time.sleep(10)
+                logger.info(f"Feed stats: {server.stats}")
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        server = None
+        url = args.url
+        if args.serve:
+            server = FeedServer(synthetic_pairs(args.pairs), rate=args.rate).start()
+            url = server.url
+        try:
+            print(json.dumps(bench(url, args.seconds)))
+        finally:
+            if server is not None:
+                server.stop()
+
+
+if __name__ == '__main__':
+    main()
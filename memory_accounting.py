@@ -0,0 +1,223 @@
+"""
+Memory Accounting
+=================
+
+Tracks how big the bot's long-lived structures are, so slow leaks show up in
+the log long before the box starts swapping:
+
+- Structures are registered by name with a getter and an optional byte
+  budget. Each check measures them with approximate_size(), a sampled deep
+  sizeof: large containers are sized from a sample of their items, so
+  measuring a few hundred thousand candles costs milliseconds.
+- A structure over its budget, or one that grew on every one of the last
+  leak_window checks, is reported as a warning. Histories that grow by
+  design (registered append_only) are held to their budget only, since
+  steady growth is what they do. Process RSS is checked against its own
+  budget.
+- With tracing enabled, tracemalloc_diff() compares a fresh tracemalloc
+  snapshot against the previous one and returns the allocation sites that
+  grew the most, which names the line that is leaking.
+"""
+
+import logging
+import os
+import sys
+import time
+from collections import deque
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+_ATOMS = (str, bytes, bytearray, int, float, complex, bool, type(None))
+
+
+def approximate_size(obj, sample: int = 32, depth: int = 6, _seen: Optional[set] = None) -> int:
+    """Approximate deep size of obj in bytes
+
+    Containers longer than sample are extrapolated from their first sample
+    items; nesting deeper than depth is counted shallowly.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _ATOMS) or depth <= 0:
+        return size
+    # Without NumPy loaded there can be no arrays; looked up here so importing
+    # this module does not import NumPy
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(obj, np.ndarray):
+        # A view's data belongs to its base, which is counted once via _seen
+        return size if obj.base is None else size + approximate_size(obj.base, sample, depth - 1, _seen)
+
+    if isinstance(obj, (dict, MappingProxyType)):
+        items = obj.items()
+        n = len(obj)
+
+        def measure(item):
+            key, value = item
+            return (approximate_size(key, sample, depth - 1, _seen) +
+                    approximate_size(value, sample, depth - 1, _seen))
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        items = obj
+        n = len(obj)
+
+        def measure(item):
+            return approximate_size(item, sample, depth - 1, _seen)
+    elif hasattr(obj, '__dict__'):
+        return size + approximate_size(vars(obj), sample, depth - 1, _seen)
+    elif hasattr(obj, '__slots__'):
+        return size + sum(approximate_size(getattr(obj, s, None), sample, depth - 1, _seen)
+                          for s in obj.__slots__)
+    else:
+        return size
+
+    if n == 0:
+        return size
+    total = 0
+    counted = 0
+    for item in items:
+        total += measure(item)
+        counted += 1
+        if counted >= sample:
+            break
+    return size + int(total * n / counted)
+
+
+def process_rss() -> int:
+    """Resident set size of this process in bytes (peak RSS where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return 0
+
+
+class MemoryAccountant:
+    """Periodic size report and leak warnings for registered structures"""
+
+    def __init__(self, rss_budget: int = 0, leak_window: int = 6, sample: int = 32):
+        """
+        Args:
+            rss_budget: Process RSS budget in bytes (0 = none)
+            leak_window: Consecutive growing checks after which a structure is a leak suspect
+            sample: Items sampled per container by approximate_size
+        """
+        self.rss_budget = rss_budget
+        self.leak_window = leak_window
+        self.sample = sample
+        self._tracked: Dict[str, dict] = {}
+        self._last_snapshot = None  # tracemalloc.Snapshot from the previous diff
+        self.last_report: Dict[str, dict] = {}
+        self.stats = {'checks': 0, 'warnings': 0, 'last_check_ms': 0.0}
+
+    def register(self, name: str, getter: Callable[[], object], budget: int = 0, append_only: bool = False):
+        """Track getter() under name; budget is in bytes (0 = no budget)
+
+        append_only marks a structure that grows on every check by design
+        (e.g. a value history); it is warned about only over its budget.
+        """
+        self._tracked[name] = {'getter': getter, 'budget': budget, 'append_only': append_only,
+                               'history': deque(maxlen=self.leak_window + 1)}
+
+    def unregister(self, name: str):
+        self._tracked.pop(name, None)
+
+    def measure(self) -> Dict[str, dict]:
+        """name -> {'bytes', 'items', 'budget'} for every registered structure"""
+        report = {}
+        for name, entry in self._tracked.items():
+            try:
+                obj = entry['getter']()
+                size = approximate_size(obj, self.sample)
+                items = len(obj) if hasattr(obj, '__len__') else None
+            except Exception as e:
+                logger.error(f"Memory accounting: could not measure {name}: {e}")
+                continue
+            report[name] = {'bytes': size, 'items': items, 'budget': entry['budget']}
+        return report
+
+    def check(self) -> List[str]:
+        """Measure everything, log a summary and return the warnings raised"""
+        started = time.perf_counter()
+        report = self.measure()
+        warnings = []
+        for name, row in report.items():
+            entry = self._tracked[name]
+            history = entry['history']
+            history.append(row['bytes'])
+            if row['budget'] and row['bytes'] > row['budget']:
+                warnings.append(f"{name} is {row['bytes'] / MB:.1f}MB, over its {row['budget'] / MB:.1f}MB budget")
+            if entry['append_only']:
+                continue
+            if len(history) > self.leak_window and all(b > a for a, b in zip(history, list(history)[1:])):
+                warnings.append(f"{name} grew on each of the last {self.leak_window} checks "
+                                f"({history[0] / MB:.2f}MB -> {history[-1] / MB:.2f}MB)")
+
+        rss = process_rss()
+        if self.rss_budget and rss > self.rss_budget:
+            warnings.append(f"process RSS {rss / MB:.0f}MB is over its {self.rss_budget / MB:.0f}MB budget")
+
+        self.last_report = report
+        self.stats['checks'] += 1
+        self.stats['warnings'] += len(warnings)
+        self.stats['last_check_ms'] = (time.perf_counter() - started) * 1000
+
+        detail = ', '.join(f"{name}={row['bytes'] / MB:.1f}MB" + (f"/{row['items']}" if row['items'] is not None else '')
+                           for name, row in sorted(report.items(), key=lambda kv: -kv[1]['bytes']))
+        logger.info(f"Memory: RSS {rss / MB:.0f}MB | {detail} ({self.stats['last_check_ms']:.0f}ms)")
+        for warning in warnings:
+            logger.warning(f"Memory: {warning}")
+        return warnings
+
+    # ------------------------------------------------------------------
+    # tracemalloc
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def start_tracing(frames: int = 1):
+        """Start tracemalloc (adds allocation overhead; enable while hunting a leak)"""
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info(f"tracemalloc started ({frames} frame(s) per allocation)")
+
+    def tracemalloc_diff(self, limit: int = 10) -> List[str]:
+        """Top allocation sites by growth since the previous call
+
+        The first call (or a call while tracing is off) starts tracing,
+        records a baseline and returns an empty list.
+        """
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            self.start_tracing()
+            self._last_snapshot = None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ))
+        previous, self._last_snapshot = self._last_snapshot, snapshot
+        if previous is None:
+            return []
+        lines = []
+        for stat in snapshot.compare_to(previous, 'lineno')[:limit]:
+            if stat.size_diff <= 0:
+                break
+            frame = stat.traceback[0]
+            lines.append(f"{frame.filename}:{frame.lineno} +{stat.size_diff / 1024:.1f}KB "
+                         f"({stat.count_diff:+d} blocks, {stat.size / 1024:.1f}KB total)")
+        if lines:
+            logger.info("Memory growth by allocation site:\n  " + "\n  ".join(lines))
+        return lines
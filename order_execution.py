@@ -0,0 +1,356 @@
+"""
+Order Execution Engine
+======================
+
+Submits orders concurrently and manages resting LIMIT orders after they
+are placed:
+
+- submit_many() sends a batch of orders in parallel on a small thread pool
+  (e.g. every exit when several stops trigger in the same check), so the
+  last order of a batch no longer waits for the round trips of the others.
+- Every tracked LIMIT order has a time-to-live. expire_stale() queries the
+  orders past their TTL and cancels the ones still pending, then applies
+  the stale policy: 'cancel' drops the order, 'replace' re-submits it at
+  a fresh price (at most max_replaces times, after which it is converted),
+  'market' converts it to a MARKET order. A reprice callback supplies the
+  new price and can veto the replacement (e.g. when the setup is no longer
+  worth trading at the current price), in which case the order is dropped.
+  Only the unfilled rest of a partially filled order is re-submitted; the
+  filled part is carried along the chain of replacements and reported in
+  the events.
+- Submit-to-ack and submit-to-fill latencies go into fixed-bucket
+  histograms. Fill latency of a replaced order is measured from its first
+  submission.
+
+The exchange calls are injected (place, query, cancel with the signatures of
+bot_template.place_order/query_order/cancel_order), so the engine does not
+depend on bot_template.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STALE_POLICIES = ('cancel', 'replace', 'market')
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (seconds) with approximate percentiles"""
+
+    BOUNDS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 14400.0)
+
+    def __init__(self, bounds: tuple = BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        seconds = max(0.0, seconds)
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-quantile (0..1), interpolated inside its bucket and capped at the maximum; None without samples"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                if n and seen + n >= rank:
+                    lower = self.bounds[i - 1] if i > 0 else 0.0
+                    upper = self.bounds[i] if i < len(self.bounds) else self.max
+                    return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+                seen += n
+            return self.max
+
+    def summary(self) -> dict:
+        return {'count': self.count, 'mean': self.total / self.count if self.count else None,
+                'p50': self.percentile(0.5), 'p90': self.percentile(0.9), 'p99': self.percentile(0.99),
+                'max': self.max}
+
+
+class TrackedOrder:
+    """A resting LIMIT order the engine enforces a TTL on"""
+
+    __slots__ = ('order_id', 'pair', 'side', 'quantity', 'price', 'credentials', 'account',
+                 'submitted_at', 'first_submitted_at', 'ttl', 'replaces', 'filled', 'filled_value')
+
+    def __init__(self, order_id: str, pair: str, side: str, quantity: str, price: str,
+                 credentials: Optional[tuple], submitted_at: float, ttl: float, account: Optional[str] = None):
+        self.order_id = order_id
+        self.pair = pair
+        self.side = side
+        self.quantity = quantity
+        self.price = price
+        self.credentials = credentials
+        self.account = account  # owning account's name (None for the single-account bot)
+        self.submitted_at = submitted_at
+        self.first_submitted_at = submitted_at
+        self.ttl = ttl
+        self.replaces = 0
+        self.filled = 0.0  # quantity filled by the orders this one replaced
+        self.filled_value = 0.0  # and its cost (quantity x fill price)
+
+
+class OrderExecutionEngine:
+    """Concurrent order submission, LIMIT order TTLs and execution latency tracking"""
+
+    def __init__(self, place: Callable, query: Callable, cancel: Callable, max_workers: int = 4,
+                 limit_ttl: float = 900.0, stale_policy: str = 'replace', max_replaces: int = 2,
+                 clock: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            place/query/cancel: place_order, query_order, cancel_order
+            max_workers: Orders in flight at once (match the HTTP connection pool)
+            limit_ttl: Default seconds a LIMIT order may rest before it is stale (0 = never)
+            stale_policy: 'cancel', 'replace' or 'market'
+            max_replaces: Replacements per order before 'replace' converts to MARKET
+        """
+        if stale_policy not in STALE_POLICIES:
+            raise ValueError(f"stale_policy must be one of {STALE_POLICIES}, got {stale_policy!r}")
+        self.place = place
+        self.query = query
+        self.cancel = cancel
+        self.max_workers = max_workers
+        self.limit_ttl = limit_ttl
+        self.stale_policy = stale_policy
+        self.max_replaces = max_replaces
+        self.clock = clock or time.time
+
+        self._orders: Dict[str, TrackedOrder] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.ack_latency = LatencyHistogram()
+        self.fill_latency = LatencyHistogram()
+        self.stats = {'submitted': 0, 'acked': 0, 'rejected': 0, 'batches': 0, 'expired': 0,
+                      'cancelled': 0, 'replaced': 0, 'converted': 0, 'filled': 0}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='orders')
+            return self._executor
+
+    def _map(self, fn: Callable, items: list) -> list:
+        """fn over items, in parallel when there is more than one"""
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(self._get_executor().map(fn, items))
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+
+    def submit(self, pair: str, side: str, order_type: str, quantity: str, price: Optional[str] = None,
+               reference_price: Optional[float] = None, credentials: Optional[tuple] = None,
+               ttl: Optional[float] = None, account: Optional[str] = None) -> Optional[dict]:
+        """Place one order; LIMIT orders left pending are tracked for their TTL (under account)"""
+        return self._submit(pair, side, order_type, quantity, price, reference_price, credentials, ttl,
+                            account=account)
+
+    def _submit(self, pair: str, side: str, order_type: str, quantity: str, price: Optional[str],
+                reference_price: Optional[float], credentials: Optional[tuple], ttl: Optional[float],
+                first_submitted_at: Optional[float] = None, account: Optional[str] = None) -> Optional[dict]:
+        """submit(); first_submitted_at dates fill latency from the order this one replaces"""
+        started = self.clock()
+        response = self.place(pair, side, order_type, quantity, price,
+                              reference_price=reference_price, credentials=credentials)
+        acked = self.clock()
+        with self._lock:
+            self.stats['submitted'] += 1
+            if not response or not response.get('Success'):
+                self.stats['rejected'] += 1
+                return response
+            self.stats['acked'] += 1
+        self.ack_latency.record(acked - started)
+
+        detail = response.get('OrderDetail', {})
+        order_id = detail.get('OrderID')
+        if detail.get('Status') == 'FILLED':
+            self.fill_latency.record(acked - (started if first_submitted_at is None else first_submitted_at))
+            with self._lock:
+                self.stats['filled'] += 1
+        elif order_type.upper() == 'LIMIT' and order_id is not None:
+            self.track(order_id, pair, side, quantity, price, credentials, started, ttl, account)
+            if first_submitted_at is not None:
+                with self._lock:
+                    self._orders[str(order_id)].first_submitted_at = first_submitted_at
+        return response
+
+    def submit_many(self, orders: List[dict]) -> List[Optional[dict]]:
+        """Submit several orders (submit() keyword dicts) concurrently; responses keep the input order"""
+        with self._lock:
+            self.stats['batches'] += 1
+        return self._map(lambda spec: self.submit(**spec), orders)
+
+    # ------------------------------------------------------------------
+    # Tracking
+    # ------------------------------------------------------------------
+
+    def track(self, order_id, pair: str, side: str, quantity: str, price: str,
+              credentials: Optional[tuple] = None, submitted_at: Optional[float] = None,
+              ttl: Optional[float] = None, account: Optional[str] = None):
+        """Enforce a TTL on a resting LIMIT order (also used for orders restored after a restart)
+
+        account names the position store the order belongs to; expire_stale()
+        events carry it so callers route them by account, not by credentials.
+        """
+        ttl = self.limit_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        submitted_at = self.clock() if submitted_at is None else submitted_at
+        with self._lock:
+            self._orders[str(order_id)] = TrackedOrder(str(order_id), pair, side, str(quantity), str(price),
+                                                       credentials, submitted_at, ttl, account)
+
+    def order_filled(self, order_id):
+        """Record the fill of a tracked order (detected by the caller's reconciliation)"""
+        with self._lock:
+            order = self._orders.pop(str(order_id), None)
+            if order is None:
+                return
+            self.stats['filled'] += 1
+        self.fill_latency.record(self.clock() - order.first_submitted_at)
+
+    def forget(self, order_id):
+        with self._lock:
+            self._orders.pop(str(order_id), None)
+
+    def tracked(self) -> List[TrackedOrder]:
+        with self._lock:
+            return list(self._orders.values())
+
+    def expire_stale(self, reprice: Optional[Callable[[TrackedOrder], Optional[float]]] = None) -> List[dict]:
+        """Apply the stale policy to LIMIT orders past their TTL
+
+        Args:
+            reprice: Returns the price to re-submit (or convert) a stale order
+                at, or None to drop it. Without a callback stale orders are
+                replaced at their old price.
+
+        Returns:
+            list of {'action', 'pair', 'account', 'order_id', 'new_order_id', 'price', 'quantity',
+            'filled_quantity', 'filled_price', 'response'} where action is 'filled',
+            'cancelled', 'replaced' or 'converted', quantity is what was re-submitted
+            and filled_quantity/filled_price cover the partial fills so far.
+            Orders whose cancel failed for another reason stay tracked and
+            are retried on the next call.
+        """
+        now = self.clock()
+        with self._lock:
+            stale = [o for o in self._orders.values() if now - o.submitted_at >= o.ttl]
+        if not stale:
+            return []
+        events = self._map(lambda order: self._expire(order, reprice), stale)
+        return [event for event in events if event]
+
+    def _query(self, order: TrackedOrder) -> dict:
+        result = self.query(order_id=order.order_id, credentials=order.credentials)
+        matched = (result or {}).get('OrderMatched') or []
+        return matched[0] if matched else {}
+
+    @staticmethod
+    def _remaining(quantity: str, filled: float) -> str:
+        """quantity - filled, formatted with quantity's decimals (the exchange's precision)"""
+        decimals = len(quantity.split('.')[1]) if '.' in quantity else 0
+        return f"{max(0.0, float(quantity) - filled):.{decimals}f}"
+
+    def _expire(self, order: TrackedOrder, reprice) -> Optional[dict]:
+        event = {'pair': order.pair, 'account': order.account, 'order_id': order.order_id, 'new_order_id': None,
+                 'price': None, 'quantity': None, 'response': None,
+                 'filled_quantity': order.filled,
+                 'filled_price': order.filled_value / order.filled if order.filled else None}
+        info = self._query(order)
+        status = info.get('Status')
+        if status == 'FILLED':
+            self.order_filled(order.order_id)
+            return dict(event, action='filled')
+        if status != 'CANCELED':
+            cancelled = self.cancel(order_id=order.order_id, credentials=order.credentials)
+            if not cancelled or not cancelled.get('Success'):
+                # Filled between the query and the cancel, or the exchange is unreachable:
+                # leave it tracked and look again next time
+                logger.warning(f"Could not cancel stale order {order.order_id} ({order.pair}): "
+                               f"{(cancelled or {}).get('ErrMsg', 'no response')}")
+                return None
+            # Fills can land between the query and the cancel; read the final amount
+            info = self._query(order) or info
+        with self._lock:
+            self._orders.pop(order.order_id, None)
+            self.stats['expired'] += 1
+
+        filled_now = float(info.get('FilledQuantity') or 0)
+        filled = order.filled + filled_now
+        filled_value = order.filled_value + filled_now * float(info.get('FilledAverPrice') or 0)
+        remaining = self._remaining(order.quantity, filled_now)
+        event.update(filled_quantity=filled, filled_price=filled_value / filled if filled else None,
+                     quantity=remaining)
+        if filled and float(remaining) <= 0:
+            self.fill_latency.record(self.clock() - order.first_submitted_at)
+            with self._lock:
+                self.stats['filled'] += 1
+            return dict(event, action='filled')
+
+        policy = self.stale_policy
+        if policy == 'replace' and order.replaces >= self.max_replaces:
+            policy = 'market'
+        price = None
+        if policy != 'cancel':
+            price = reprice(order) if reprice else float(order.price)
+        if price is None:
+            with self._lock:
+                self.stats['cancelled'] += 1
+            logger.info(f"Stale order {order.order_id} ({order.pair}) cancelled after {order.ttl:.0f}s")
+            return dict(event, action='cancelled')
+
+        if policy == 'replace':
+            response = self._submit(order.pair, order.side, 'LIMIT', remaining, str(price), None,
+                                    order.credentials, order.ttl, order.first_submitted_at, order.account)
+            new_id = (response or {}).get('OrderDetail', {}).get('OrderID')
+            if response and response.get('Success'):
+                with self._lock:
+                    replacement = self._orders.get(str(new_id))
+                    if replacement is not None:
+                        replacement.replaces = order.replaces + 1
+                        replacement.filled = filled
+                        replacement.filled_value = filled_value
+                    self.stats['replaced'] += 1
+                logger.info(f"Stale order {order.order_id} ({order.pair}) replaced by {new_id} at {price}"
+                            + (f" for the unfilled {remaining}" if filled_now else ""))
+                return dict(event, action='replaced', new_order_id=new_id, price=price, response=response)
+        else:
+            response = self._submit(order.pair, order.side, 'MARKET', remaining, None, price,
+                                    order.credentials, None, order.first_submitted_at, order.account)
+            if response and response.get('Success'):
+                new_id = response.get('OrderDetail', {}).get('OrderID')
+                with self._lock:
+                    self.stats['converted'] += 1
+                logger.info(f"Stale order {order.order_id} ({order.pair}) converted to MARKET order {new_id}")
+                return dict(event, action='converted', new_order_id=new_id, price=price, response=response)
+
+        with self._lock:
+            self.stats['cancelled'] += 1
+        logger.warning(f"Stale order {order.order_id} ({order.pair}) cancelled; re-submission failed: "
+                       f"{(response or {}).get('ErrMsg', 'no response')}")
+        return dict(event, action='cancelled', response=response)
+
+    def latency_summary(self) -> dict:
+        return {'ack': self.ack_latency.summary(), 'fill': self.fill_latency.summary()}
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
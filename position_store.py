@@ -0,0 +1,182 @@
+"""
+Compact Position Store
+======================
+
+Replaces the per-pair dict-of-dicts position tracking with __slots__ records
+that are created only for pairs the bot has actually traded, plus secondary
+indexes by status. Hot-path queries ("which pairs are open / pending?",
+"how many positions are open?") cost O(matching positions) instead of a walk
+over the whole universe, and memory does not grow with the pair list.
+
+Records keep dict-style access (record['status'], record.get('pnl')) so
+existing call sites keep working unchanged.
+
+The store has its own lock around index and record changes, so the
+status queries return snapshots that are safe to take while another
+thread (an order fill, a feed update) changes a position's status.
+"""
+
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class Position:
+    """Position state for one pair"""
+
+    FIELDS = ('position_size', 'entry_price', 'stop_loss', 'target', 'pnl', 'status',
+              'entry_time', 'last_update', 'direction', 'order_id')
+
+    __slots__ = ('pair', 'position_size', 'entry_price', 'stop_loss', 'target', 'pnl', '_status',
+                 'entry_time', 'last_update', 'direction', 'order_id', '_store')
+
+    def __init__(self, pair: str, status: str, store: Optional['PositionStore'] = None):
+        self.pair = pair
+        self.position_size = 0
+        self.entry_price = None
+        self.stop_loss = None
+        self.target = None
+        self.pnl = 0
+        self.entry_time = None
+        self.last_update = None
+        self.direction = None
+        self.order_id = None
+        self._status = status
+        self._store = store
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @status.setter
+    def status(self, value: str):
+        old = self._status
+        self._status = value
+        if self._store is not None and old != value:
+            self._store._reindex(self.pair, old, value)
+
+    # Dict-style access for call sites written against the old dict records
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.FIELDS else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+    def __repr__(self) -> str:
+        return f"Position({self.pair}, status={self._status}, size={self.position_size})"
+
+
+class PositionStore:
+    """Mapping of pair -> Position with secondary indexes by status"""
+
+    def __init__(self, default_status: str):
+        self.default_status = default_status
+        self._positions: Dict[str, Position] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        # Reentrant: ensure() reindexes while holding it
+        self._lock = threading.RLock()
+
+    def _reindex(self, pair: str, old: Optional[str], new: str):
+        with self._lock:
+            if old is not None:
+                members = self._by_status.get(old)
+                if members is not None:
+                    members.discard(pair)
+            self._by_status.setdefault(new, set()).add(pair)
+
+    def reset(self):
+        """Drop all records"""
+        with self._lock:
+            self._positions.clear()
+            self._by_status.clear()
+
+    def ensure(self, pair: str) -> Position:
+        """Return the record for pair, creating a closed one if needed"""
+        with self._lock:
+            position = self._positions.get(pair)
+            if position is None:
+                position = Position(pair, self.default_status, self)
+                self._positions[pair] = position
+                self._reindex(pair, None, position.status)
+            return position
+
+    def setdefault(self, pair: str, default=None) -> Position:
+        return self.ensure(pair)
+
+    def export(self) -> Dict[str, dict]:
+        """Plain-dict copy of every record (for checkpoints)"""
+        with self._lock:
+            return {pair: position.to_dict() for pair, position in self._positions.items()}
+
+    def load(self, records: Dict[str, dict]):
+        """Replace all records with the given pair -> field dicts"""
+        with self._lock:
+            self.reset()
+            for pair, fields in records.items():
+                position = self.ensure(pair)
+                for key, value in fields.items():
+                    if key in Position.FIELDS:
+                        position[key] = value
+
+    def remove(self, pair: str):
+        with self._lock:
+            position = self._positions.pop(pair, None)
+            if position is not None:
+                self._by_status.get(position.status, set()).discard(pair)
+
+    def pairs_with_status(self, *statuses: str) -> List[str]:
+        """Pairs currently in any of the given statuses (a snapshot list)"""
+        pairs = []
+        with self._lock:
+            for status in statuses:
+                pairs.extend(self._by_status.get(status, ()))
+        return pairs
+
+    def with_status(self, *statuses: str) -> Dict[str, Position]:
+        """pair -> record for the given statuses (a snapshot dict)"""
+        with self._lock:
+            return {pair: self._positions[pair] for pair in self.pairs_with_status(*statuses)}
+
+    def count(self, *statuses: str) -> int:
+        with self._lock:
+            return sum(len(self._by_status.get(status, ())) for status in statuses)
+
+    # Mapping protocol over the records that exist
+    def __getitem__(self, pair: str) -> Position:
+        return self._positions[pair]
+
+    def get(self, pair: str, default=None):
+        return self._positions.get(pair, default)
+
+    def __contains__(self, pair: str) -> bool:
+        return pair in self._positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def items(self):
+        return self._positions.items()
+
+    def values(self):
+        return self._positions.values()
+
+    def keys(self):
+        return self._positions.keys()
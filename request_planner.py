@@ -0,0 +1,224 @@
+"""
+Quota-Aware Request Planner
+===========================
+
+Tracks what each market-data source actually spends and sizes each scan
+to what the quota still allows, so rate limits are planned for instead of
+hit:
+
+- Every request is recorded per source in a sliding window, together with
+  the 429s. The effective per-minute limit starts a safety margin below the
+  configured one. Each 429 cuts it multiplicatively, and each clean window
+  at high utilization wins one request per minute back (AIMD). The rate
+  converges on what the upstream really tolerates, and the Horus throttle
+  spaces requests by it.
+- Before a cycle, plan() predicts the cost of the candidate pairs
+  (timeframes x pages per pair, minus pairs whose candles are still
+  cached or that will be skipped). It compares that with what the source
+  can serve within the cycle's time budget: the smaller of what request
+  spacing allows and what the window frees up, less a reserve kept for
+  everything that is not a scan.
+  Candidates arrive highest priority first; the plan keeps the head of the
+  list and defers the rest.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Source:
+    __slots__ = ('limit', 'effective', 'requests', 'rate_limited', 'total', 'total_rate_limited',
+                 'window_start', 'window_429s', 'last_plan')
+
+    def __init__(self, limit: float, effective: float, now: float):
+        self.limit = limit
+        self.effective = effective
+        self.requests = deque()  # timestamps inside the window
+        self.rate_limited = deque()
+        self.total = 0
+        self.total_rate_limited = 0
+        self.window_start = now
+        self.window_429s = 0
+        self.last_plan: Optional[dict] = None
+
+
+class RequestPlanner:
+    """Sliding-window spend per source, an AIMD-tuned effective limit and per-cycle scan plans"""
+
+    def __init__(self, window: float = 60.0, safety: float = 0.9, backoff: float = 0.7,
+                 min_fraction: float = 0.2, reserve: float = 0.15, clock: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            window: Sliding window in seconds over which spend is counted
+            safety: Effective limit starts at safety x the configured limit
+            backoff: Factor applied to the effective limit on each 429
+            min_fraction: The effective limit never drops below this share of the configured one
+            reserve: Share of the window's capacity kept for requests outside the plan
+        """
+        self.window = window
+        self.safety = safety
+        self.backoff = backoff
+        self.min_fraction = min_fraction
+        self.reserve = reserve
+        self.clock = clock or time.time
+        self._sources: Dict[str, _Source] = {}
+        self._lock = threading.Lock()
+
+    def register(self, source: str, limit_per_minute: float):
+        """Declare a source and its configured per-minute quota"""
+        with self._lock:
+            self._sources[source] = _Source(limit_per_minute, limit_per_minute * self.safety, self.clock())
+
+    def set_clock(self, clock: Callable[[], float]):
+        """Read time from clock from now on (e.g. a replay's); spend windows restart on it"""
+        with self._lock:
+            self.clock = clock
+            now = clock()
+            for state in self._sources.values():
+                state.requests.clear()
+                state.rate_limited.clear()
+                state.window_start = now
+                state.window_429s = 0
+
+    def _trim(self, state: _Source, now: float):
+        cutoff = now - self.window
+        while state.requests and state.requests[0] <= cutoff:
+            state.requests.popleft()
+        while state.rate_limited and state.rate_limited[0] <= cutoff:
+            state.rate_limited.popleft()
+        if now - state.window_start >= self.window:
+            # One window without a 429 while running near the limit: probe one request/min higher
+            used = len(state.requests) * 60.0 / self.window
+            if not state.window_429s and used >= 0.8 * state.effective and state.effective < state.limit:
+                state.effective = min(state.limit, state.effective + 1)
+            state.window_start = now
+            state.window_429s = 0
+
+    # ------------------------------------------------------------------
+    # Spend
+    # ------------------------------------------------------------------
+
+    def record(self, source: str, n: int = 1):
+        """Count n requests just sent to source"""
+        now = self.clock()
+        with self._lock:
+            state = self._sources.get(source)
+            if state is None:
+                return
+            self._trim(state, now)
+            state.requests.extend([now] * n)
+            state.total += n
+
+    def rate_limited(self, source: str):
+        """Count a 429 from source and cut its effective limit"""
+        now = self.clock()
+        with self._lock:
+            state = self._sources.get(source)
+            if state is None:
+                return
+            self._trim(state, now)
+            state.rate_limited.append(now)
+            state.total_rate_limited += 1
+            state.window_429s += 1
+            previous = state.effective
+            state.effective = max(state.limit * self.min_fraction, state.effective * self.backoff)
+        logger.warning(f"{source} rate limited: effective limit {previous:.0f} -> {state.effective:.0f}/min")
+
+    def limit(self, source: str) -> float:
+        """Effective requests per minute for source"""
+        state = self._sources.get(source)
+        return state.effective if state else 0.0
+
+    def interval(self, source: str) -> float:
+        """Seconds between requests that keep source at its effective limit"""
+        effective = self.limit(source)
+        return 60.0 / effective if effective > 0 else 0.0
+
+    def spent(self, source: str) -> int:
+        """Requests sent to source inside the window"""
+        with self._lock:
+            state = self._sources.get(source)
+            if state is None:
+                return 0
+            self._trim(state, self.clock())
+            return len(state.requests)
+
+    def headroom(self, source: str) -> int:
+        """Requests source can take right now without exceeding its effective limit"""
+        return max(0, int(self.limit(source) * self.window / 60.0) - self.spent(source))
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def budget(self, source: str, seconds: float) -> int:
+        """Requests the plan may spend on source over the next seconds
+
+        The smaller of what request spacing at the effective rate allows and
+        what the sliding window frees up over that time, less the reserve.
+        """
+        now = self.clock()
+        with self._lock:
+            state = self._sources.get(source)
+            if state is None or state.effective <= 0:
+                return 0
+            self._trim(state, now)
+            per_second = state.effective / 60.0
+            window_capacity = per_second * self.window
+            expiring = sum(1 for t in state.requests if t <= now - self.window + seconds)
+            from_window = (window_capacity - len(state.requests) + expiring
+                           + per_second * max(0.0, seconds - self.window))
+            from_spacing = int(seconds * per_second) + 1
+        return max(0, int(min(from_spacing, from_window - self.reserve * window_capacity)))
+
+    def plan(self, source: str, candidates: Iterable[str], seconds: float, cost_per_pair: int = 1,
+             free: Callable[[str], bool] = lambda pair: False,
+             required: Callable[[str], bool] = lambda pair: False) -> dict:
+        """Split priority-ordered candidates into the pairs this cycle can afford and the deferred rest
+
+        Args:
+            seconds: Time the cycle may take; with the window spend it bounds the budget
+            cost_per_pair: Requests one uncached pair costs (timeframes x pages)
+            free: True for pairs that cost no request (candles still cached, pair skipped)
+            required: True for pairs fetched whatever the budget (held positions); they
+                are never deferred but their cost counts, so put them first
+        """
+        budget = self.budget(source, seconds)
+        pairs: List[str] = []
+        deferred: List[str] = []
+        planned = 0  # cost of the pairs kept so far
+        free_count = 0
+        for pair in candidates:
+            if free(pair):
+                free_count += 1
+                pairs.append(pair)
+            elif required(pair) or planned + cost_per_pair <= budget:
+                planned += cost_per_pair
+                pairs.append(pair)
+            else:
+                deferred.append(pair)
+        # predicted: what all candidates would cost; planned: what the kept ones will
+        result = {'pairs': pairs, 'deferred': deferred, 'free': free_count, 'budget': budget,
+                  'predicted': planned + len(deferred) * cost_per_pair, 'planned': planned}
+        state = self._sources.get(source)
+        if state is not None:
+            state.last_plan = {k: v for k, v in result.items() if k not in ('pairs', 'deferred')}
+            state.last_plan.update(pairs=len(pairs), deferred=len(deferred))
+        return result
+
+    def report(self) -> Dict[str, dict]:
+        """Per source: window spend, configured and effective limit, 429s and the last plan"""
+        out = {}
+        for source in list(self._sources):
+            spent = self.spent(source)
+            state = self._sources[source]
+            out[source] = {'spent': spent, 'per_minute': spent * 60.0 / self.window,
+                           'limit': state.limit, 'effective': state.effective,
+                           'rate_limited': len(state.rate_limited), 'total': state.total,
+                           'total_rate_limited': state.total_rate_limited, 'last_plan': state.last_plan}
+        return out
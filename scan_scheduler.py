@@ -0,0 +1,176 @@
+"""
+Candle-Close Aligned Priority Scan Scheduler
+============================================
+
+Schedules pair scans right after each candle close of a timeframe instead of
+on a fixed interval, so every scan sees a freshly closed candle.
+
+Each pair carries a "heat" score in [0, 1] describing how close it is to a
+valid setup (FVG present, CHOCH pending, volatility). Due pairs are handed
+out hottest first; hot pairs are rescanned on every close while cold pairs
+back off exponentially (2, 4, ... closes) up to a configurable ceiling.
+"""
+
+import heapq
+import itertools
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+TIMEFRAME_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def timeframe_seconds(timeframe: str) -> int:
+    """Convert a timeframe string such as '15m', '1h' or '1d' to seconds"""
+    unit = timeframe[-1].lower()
+    if unit not in TIMEFRAME_UNITS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1] or 1) * TIMEFRAME_UNITS[unit]
+
+
+def next_candle_close(now: float, timeframe: str, delay: float = 0.0) -> float:
+    """Timestamp of the next candle close strictly after now, plus delay"""
+    period = timeframe_seconds(timeframe)
+    return (math.floor((now - delay) / period) + 1) * period + delay
+
+
+def setup_heat(signals: dict, setup_valid: bool = False, volatility_ref: float = 0.01) -> float:
+    """Score how close a pair is to a tradeable setup (0 = cold, 1 = hot)
+
+    Args:
+        signals: analyze_setup()['signals'] with fvg/choch flags and atr_pct
+        setup_valid: True if either direction already produced a valid setup
+        volatility_ref: ATR as a fraction of price that counts as fully volatile
+    """
+    if setup_valid:
+        return 1.0
+    has_fvg = signals.get('bullish_fvg') or signals.get('bearish_fvg')
+    has_choch = signals.get('bullish_choch') or signals.get('bearish_choch')
+    volatility = min(1.0, signals.get('atr_pct', 0.0) / volatility_ref) if volatility_ref > 0 else 0.0
+    return 0.35 * bool(has_fvg) + 0.35 * bool(has_choch) + 0.3 * volatility
+
+
+class ScanScheduler:
+    """Priority queue of pairs, released after each candle close"""
+
+    def __init__(self, timeframe: str, close_delay: float = 5.0, hot_threshold: float = 0.6,
+                 cold_threshold: float = 0.3, max_backoff: int = 8, clock=None):
+        self.timeframe = timeframe
+        self.period = timeframe_seconds(timeframe)
+        self.close_delay = close_delay
+        self.hot_threshold = hot_threshold
+        self.cold_threshold = cold_threshold
+        self.max_backoff = max_backoff
+        self.clock = clock or time.time
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._state: Dict[str, dict] = {}
+
+    def _push(self, pair: str, due: float):
+        state = self._state[pair]
+        state['next_due'] = due
+        state['version'] += 1
+        heapq.heappush(self._heap, (due, -state['heat'], next(self._seq), state['version'], pair))
+
+    def set_pairs(self, pairs: Iterable[str], now: Optional[float] = None):
+        """Sync the scheduled universe; new pairs are due at the next close"""
+        now = self.clock() if now is None else now
+        pairs = list(pairs)
+        wanted = set(pairs)
+        for pair in list(self._state):
+            if pair not in wanted:
+                del self._state[pair]
+        first_due = next_candle_close(now, self.timeframe, self.close_delay)
+        for pair in pairs:
+            if pair not in self._state:
+                self._state[pair] = {'heat': 0.5, 'backoff': 1, 'next_due': first_due, 'version': 0, 'scans': 0}
+                self._push(pair, first_due)
+
+    def prime(self, now: Optional[float] = None):
+        """Make every pair due immediately (e.g. for the first scan after startup)"""
+        now = self.clock() if now is None else now
+        for pair in self._state:
+            self._push(pair, now)
+
+    def due_pairs(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """Pop pairs whose scan is due, hottest first
+
+        Pairs beyond limit stay due and are handed out first next round.
+        Popped pairs are rescheduled only by record() (or requeue()).
+        """
+        now = self.clock() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, _, version, pair = heapq.heappop(self._heap)
+            state = self._state.get(pair)
+            if state is None or state['version'] != version:
+                continue
+            due.append(pair)
+
+        due.sort(key=lambda p: self._state[p]['heat'], reverse=True)
+        if limit is not None and len(due) > limit:
+            for pair in due[limit:]:
+                self._push(pair, self._state[pair]['next_due'])
+            due = due[:limit]
+        return due
+
+    def requeue(self, pairs: Iterable[str]):
+        """Make pairs handed out by due_pairs() due again, e.g. after their scan failed"""
+        for pair in pairs:
+            if pair in self._state:
+                self._push(pair, self._state[pair]['next_due'])
+
+    def record(self, pair: str, heat: float, now: Optional[float] = None):
+        """Store a pair's latest heat and schedule its next scan"""
+        state = self._state.get(pair)
+        if state is None:
+            return
+        now = self.clock() if now is None else now
+        state['heat'] = max(0.0, min(1.0, heat))
+        state['scans'] += 1
+
+        if state['heat'] >= self.hot_threshold:
+            state['backoff'] = 1
+        elif state['heat'] < self.cold_threshold:
+            state['backoff'] = min(state['backoff'] * 2, self.max_backoff)
+        else:
+            state['backoff'] = max(1, state['backoff'] // 2)
+
+        due = next_candle_close(now, self.timeframe, self.close_delay) + (state['backoff'] - 1) * self.period
+        self._push(pair, due)
+
+    def next_due_time(self) -> Optional[float]:
+        """Earliest scheduled scan time, or None if nothing is scheduled"""
+        while self._heap:
+            _, _, _, version, pair = self._heap[0]
+            state = self._state.get(pair)
+            if state is not None and state['version'] == version:
+                return self._heap[0][0]
+            heapq.heappop(self._heap)
+        return None
+
+    def export_state(self) -> Dict[str, dict]:
+        """Per-pair heat, backoff and next due time (for checkpoints)"""
+        return {pair: {k: s[k] for k in ('heat', 'backoff', 'next_due', 'scans')}
+                for pair, s in self._state.items()}
+
+    def restore_state(self, saved: Dict[str, dict]):
+        """Apply exported state to pairs that are still scheduled"""
+        for pair, fields in saved.items():
+            state = self._state.get(pair)
+            if state is None:
+                continue
+            state['heat'] = fields.get('heat', state['heat'])
+            state['backoff'] = fields.get('backoff', state['backoff'])
+            state['scans'] = fields.get('scans', state['scans'])
+            self._push(pair, fields.get('next_due', state['next_due']))
+
+    def stats(self) -> dict:
+        """Counts of hot/warm/cold pairs and the next due time"""
+        hot = sum(1 for s in self._state.values() if s['heat'] >= self.hot_threshold)
+        cold = sum(1 for s in self._state.values() if s['heat'] < self.cold_threshold)
+        return {
+            'pairs': len(self._state), 'hot': hot, 'cold': cold,
+            'warm': len(self._state) - hot - cold, 'next_due': self.next_due_time(),
+        }
@@ -0,0 +1,374 @@
+"""
+Market Session Record & Replay
+==============================
+
+Captures every HTTP exchange the bot makes (Horus, Roostoo, CoinGecko) into a
+gzip-compressed JSON-lines log, and feeds a recording back through the real
+bot_template.main() under a virtual clock:
+
+- Recording wraps requests.Session.request, so requests.get/post and the
+  pooled Horus session are all captured. Each entry stores method, URL,
+  canonical parameters (the volatile signing timestamp removed), status,
+  body, start time and duration. Credentials in headers are never stored.
+- Replay serves recorded responses in order per (method, URL, parameters).
+  A request whose parameters changed falls back to the next response for
+  the same endpoint and is counted as a divergence, so a replay reports
+  whether the session's decisions were reproduced exactly.
+- The virtual clock replaces the time module of the bot's modules: sleep()
+  advances it instantly and every replayed response moves it to the recorded
+  completion time, so hours of bot activity replay in seconds.
+
+    python session_replay.py record session.jsonl.gz
+    python session_replay.py replay session.jsonl.gz
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time as _time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change on every call without changing its meaning
+VOLATILE_PARAMS = ('timestamp',)
+
+# Bot modules whose `time` global is swapped for the virtual clock
+CLOCKED_MODULES = ('bot_template', 'exchange_rules', 'scan_scheduler', 'state_checkpoint',
+                   'circuit_breaker', 'coingecko_adapter')
+
+
+class ReplayFinished(BaseException):
+    """Raised when the recording is exhausted
+
+    Derives from BaseException so it passes through the bot's own
+    `except Exception` handlers and ends the run loop.
+    """
+
+
+class VirtualClock:
+    """Stand-in for the time module: sleeps advance the clock instantly"""
+
+    def __init__(self, start: float):
+        self.now = float(start)
+        self.slept = 0.0
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    monotonic = time
+    perf_counter = time
+
+    def sleep(self, seconds: float):
+        with self._lock:
+            seconds = max(0.0, float(seconds))
+            self.now += seconds
+            self.slept += seconds
+
+    def advance_to(self, timestamp: float):
+        with self._lock:
+            if timestamp > self.now:
+                self.now = timestamp
+
+    def __getattr__(self, name):
+        # strftime, gmtime, ... come from the real time module
+        return getattr(_time, name)
+
+
+def canonical_params(params, data) -> str:
+    """Stable string form of query params and form/JSON body, minus volatile keys"""
+    merged = {}
+    for source in (params, data):
+        if not source:
+            continue
+        if isinstance(source, (bytes, str)):
+            text = source.decode('utf-8') if isinstance(source, bytes) else source
+            try:
+                parsed = json.loads(text)
+                items = parsed.items() if isinstance(parsed, dict) else [('body', parsed)]
+            except ValueError:
+                items = parse_qsl(text, keep_blank_values=True)
+        elif isinstance(source, dict):
+            items = source.items()
+        else:
+            items = list(source)
+        for key, value in items:
+            if key not in VOLATILE_PARAMS:
+                merged[str(key)] = str(value)
+    return json.dumps(merged, sort_keys=True, separators=(',', ':'))
+
+
+def _endpoint(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def _request_key(method: str, url: str, kwargs: dict) -> Tuple[str, str, str]:
+    query = dict(parse_qsl(urlsplit(url).query, keep_blank_values=True))
+    params = dict(query, **(kwargs.get('params') or {}))
+    data = kwargs.get('data')
+    if data is None and kwargs.get('json') is not None:
+        data = json.dumps(kwargs['json'])
+    return method.upper(), _endpoint(url), canonical_params(params, data)
+
+
+# ============================================================================
+# Recording
+# ============================================================================
+
+class SessionRecorder:
+    """Appends every HTTP exchange to a gzip JSON-lines file"""
+
+    def __init__(self, path: str, clock=_time):
+        self.path = path
+        self.clock = clock
+        self.count = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._original = None
+
+    def start(self, header: dict):
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._write(dict(header, type='session', started_at=self.clock.time()))
+        self._original = requests.Session.request
+        recorder = self
+
+        def recording_request(session, method, url, **kwargs):
+            started = recorder.clock.time()
+            entry = dict(zip(('m', 'u', 'p'), _request_key(method, url, kwargs)), t=started)
+            try:
+                response = recorder._original(session, method, url, **kwargs)
+            except requests.RequestException as e:
+                entry.update(d=recorder.clock.time() - started, e=type(e).__name__, msg=str(e))
+                recorder._write(entry)
+                raise
+            entry.update(d=recorder.clock.time() - started, s=response.status_code,
+                         h={k: v for k, v in response.headers.items() if k.lower() == 'retry-after'},
+                         b=response.text)
+            recorder._write(entry)
+            return response
+
+        requests.Session.request = recording_request
+        logger.info(f"Recording HTTP session to {self.path}")
+
+    def _write(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            if entry.get('type') != 'session':
+                self.count += 1
+
+    def stop(self):
+        if self._original is not None:
+            requests.Session.request = self._original
+            self._original = None
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+        logger.info(f"Recorded {self.count} HTTP exchanges to {self.path}")
+
+
+def load_session(path: str) -> Tuple[dict, List[dict]]:
+    """(header, entries) of a recording"""
+    header, entries = {}, []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('type') == 'session':
+                header = record
+            else:
+                entries.append(record)
+    return header, entries
+
+
+# ============================================================================
+# Replay
+# ============================================================================
+
+class SessionPlayer:
+    """Serves recorded responses in place of the network"""
+
+    def __init__(self, entries: List[dict], clock: VirtualClock):
+        self.clock = clock
+        self._by_key: Dict[tuple, deque] = {}
+        self._by_endpoint: Dict[tuple, deque] = {}
+        for i, entry in enumerate(entries):
+            self._by_key.setdefault((entry['m'], entry['u'], entry['p']), deque()).append(i)
+            self._by_endpoint.setdefault((entry['m'], entry['u']), deque()).append(i)
+        self.entries = entries
+        self._used = set()
+        self._lock = threading.Lock()
+        self._original = None
+        self.stats = {'replayed': 0, 'divergences': 0, 'unmatched': 0}
+        self.divergences: List[dict] = []
+        self.orders: List[dict] = []
+
+    def _take(self, queue: Optional[deque]) -> Optional[int]:
+        while queue:
+            index = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return index
+        return None
+
+    def remaining(self) -> int:
+        return len(self.entries) - len(self._used)
+
+    def install(self):
+        self._original = requests.Session.request
+        player = self
+
+        def replay_request(session, method, url, **kwargs):
+            return player.respond(*_request_key(method, url, kwargs))
+
+        requests.Session.request = replay_request
+
+    def uninstall(self):
+        if self._original is not None:
+            requests.Session.request = self._original
+            self._original = None
+
+    def respond(self, method: str, url: str, params: str) -> requests.Response:
+        with self._lock:
+            index = self._take(self._by_key.get((method, url, params)))
+            if index is None:
+                index = self._take(self._by_endpoint.get((method, url)))
+                if index is None:
+                    if self.remaining() == 0:
+                        raise ReplayFinished()
+                    self.stats['unmatched'] += 1
+                    raise requests.ConnectionError(f"replay: no recorded response for {method} {url}")
+                self.stats['divergences'] += 1
+                self.divergences.append({'endpoint': url, 'recorded': self.entries[index]['p'], 'replayed': params})
+            entry = self.entries[index]
+            self.stats['replayed'] += 1
+            if url.endswith(('/place_order', '/cancel_order')):
+                self.orders.append({'time': self.clock.time(), 'endpoint': url, 'params': params})
+
+        self.clock.advance_to(entry['t'] + entry.get('d', 0.0))
+        if 'e' in entry:
+            error_cls = getattr(requests.exceptions, entry['e'], requests.RequestException)
+            raise error_cls(entry.get('msg', 'replayed error'))
+
+        response = requests.Response()
+        response.status_code = entry['s']
+        response._content = entry['b'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.headers.update(entry.get('h', {}))
+        response.url = url
+        response.reason = 'OK' if entry['s'] < 400 else 'Replayed error'
+        return response
+
+
+def install_clock(clock: VirtualClock):
+    """Point the bot modules (and their already-built components) at clock"""
+    for name in CLOCKED_MODULES:
+        module = sys.modules.get(name)
+        if module is not None:
+            module.time = clock
+
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.time(), tz)
+
+    bt = sys.modules['bot_template']
+    bt.datetime = VirtualDatetime
+    for breaker in bt.MARKET_DATA_BREAKERS.values():
+        breaker.clock = clock.time
+    bt.COINGECKO.clock = clock.time
+    # Entry TTLs and re-tracked recovery orders must age in replayed time
+    bt.ORDER_EXECUTION.clock = clock.time
+    bt.REQUEST_PLANNER.set_clock(clock.time)
+
+
+def record_session(path: str):
+    """Run the live bot while recording every HTTP exchange"""
+    import bot_template as bt
+    from state_checkpoint import CheckpointStore
+
+    recorder = SessionRecorder(path)
+    recorder.start({'checkpoint': CheckpointStore(bt.CHECKPOINT_FILE).load(),
+                    'initial_capital': os.getenv('INITIAL_CAPITAL', '50000.0')})
+    try:
+        bt.main()
+    finally:
+        recorder.stop()
+
+
+def replay_session(path: str) -> dict:
+    """Run bot_template.main() against a recording; returns a replay report"""
+    header, entries = load_session(path)
+    import bot_template as bt
+
+    clock = VirtualClock(header.get('started_at', entries[0]['t'] if entries else 0.0))
+    install_clock(clock)
+    player = SessionPlayer(entries, clock)
+
+    # Deterministic single-threaded data path, no live side channels
+    bt.RUNTIME_MODE = 'classic'
+    bt.DEPLOY_ROLE = 'standalone'
+    bt.HEDGED_FETCH_ENABLED = False
+    bt.HORUS_API_KEY = bt.HORUS_API_KEY or 'replay'
+    bt.EXCHANGE_INFO.start = bt.EXCHANGE_INFO.refresh
+    os.environ['INITIAL_CAPITAL'] = str(header.get('initial_capital', '50000.0'))
+
+    workdir = tempfile.mkdtemp(prefix='web3bot-replay-')
+    bt.CHECKPOINT_FILE = os.path.join(workdir, 'bot_state.json')
+    if header.get('checkpoint'):
+        from state_checkpoint import CheckpointStore
+        CheckpointStore(bt.CHECKPOINT_FILE, clock=clock.time).save(header['checkpoint'])
+
+    started_wall = _time.perf_counter()
+    started_virtual = clock.time()
+    player.install()
+    try:
+        bt.main()
+    except ReplayFinished:
+        pass
+    finally:
+        player.uninstall()
+
+    report = dict(player.stats, orders=player.orders, divergence_samples=player.divergences[:20],
+                  unused=player.remaining(), virtual_seconds=clock.time() - started_virtual,
+                  wall_seconds=_time.perf_counter() - started_wall)
+    report['exact'] = report['divergences'] == 0 and report['unmatched'] == 0
+    logger.info(f"Replayed {report['replayed']} exchanges covering {report['virtual_seconds'] / 3600:.1f}h "
+                f"in {report['wall_seconds']:.1f}s: {report['divergences']} divergences, "
+                f"{len(report['orders'])} order requests")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record or replay a bot market session')
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('path', help='Session file (gzip JSON lines)')
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    import bot_template as bt
+    bt.setup_logging()
+    if args.mode == 'record':
+        record_session(args.path)
+    else:
+        # The per-minute bootstrap CI report does not influence decisions and
+        # would dominate replay time at the live default of 2000 paths
+        os.environ.setdefault('BOOTSTRAP_PATHS', '200')
+        report = replay_session(args.path)
+        print(json.dumps({k: v for k, v in report.items() if k != 'orders'}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
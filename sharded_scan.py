@@ -0,0 +1,402 @@
+"""
+Sharded Scanning: One Order Leader, Many Scanner Workers
+========================================================
+
+Deployment mode where scanning is spread over several processes (or hosts)
+while a single leader keeps PORTFOLIO_COINS, PortfolioManager and every
+signed Roostoo call:
+
+- The leader listens on a local Unix socket (or host:port for multi-node)
+  using multiprocessing.connection. Its messages are pickles, so the auth
+  key (SCAN_CLUSTER_AUTHKEY) is required: without it a TCP leader and every
+  worker refuse to start, and a Unix-socket leader makes up a random key
+  that only the workers it spawns itself receive.
+- Pairs are assigned to workers with a consistent-hash ring, so a worker
+  joining or leaving only moves the pairs of its neighbours on the ring.
+- Workers run the normal candle-close ScanScheduler and
+  MultiAssetPercocolStrategy.scan_all_pairs over their shard and stream the
+  ranked opportunities back; they never place orders.
+- Workers send heartbeats; a worker that is silent for longer than the
+  heartbeat timeout is dropped and its pairs are rebalanced.
+
+Run a worker by hand (with SCAN_CLUSTER_AUTHKEY set to the leader's key):
+    python sharded_scan.py worker --address /tmp/web3bot-scan.sock --id w1
+"""
+
+import argparse
+import bisect
+import hashlib
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = '/tmp/web3bot-scan.sock'
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TIMEOUT = 20.0
+
+
+def parse_address(address: str):
+    """'host:port' -> TCP tuple, anything else -> Unix socket path"""
+    if ':' in address and not address.startswith('/'):
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address
+
+
+def get_authkey(address: Optional[str] = None, generate: bool = False) -> bytes:
+    """SCAN_CLUSTER_AUTHKEY as bytes
+
+    With generate, a Unix-socket address without a configured key gets a
+    random one (for workers the caller spawns itself). Otherwise a missing
+    key raises ValueError: anyone who can connect with the key can make the
+    other side unpickle arbitrary objects.
+    """
+    key = os.getenv('SCAN_CLUSTER_AUTHKEY', '')
+    if key:
+        return key.encode('utf-8')
+    if generate and address is not None and isinstance(parse_address(address), str):
+        return secrets.token_hex(32).encode('utf-8')
+    raise ValueError("SCAN_CLUSTER_AUTHKEY is not set; refusing to run the scan cluster without an auth key")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self._ring: List[tuple] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+    def add(self, node: str):
+        for i in range(self.vnodes):
+            bisect.insort(self._ring, (self._hash(f"{node}#{i}"), node))
+
+    def remove(self, node: str):
+        self._ring = [entry for entry in self._ring if entry[1] != node]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        idx = bisect.bisect(self._ring, (self._hash(key), '')) % len(self._ring)
+        return self._ring[idx][1]
+
+    def assign(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        shards: Dict[str, List[str]] = {}
+        for key in keys:
+            node = self.node_for(key)
+            if node is not None:
+                shards.setdefault(node, []).append(key)
+        return shards
+
+
+# ============================================================================
+# Leader
+# ============================================================================
+
+class ScanLeader:
+    """Accepts scanner workers, assigns shards and aggregates their opportunities"""
+
+    def __init__(self, pairs: List[str], address: str = DEFAULT_ADDRESS, authkey: Optional[bytes] = None,
+                 heartbeat_timeout: float = HEARTBEAT_TIMEOUT, max_opportunity_age: float = 1800):
+        self.pairs = list(pairs)
+        self.address = address
+        self.authkey = authkey or get_authkey(address, generate=True)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_opportunity_age = max_opportunity_age
+
+        self.ring = HashRing()
+        self.workers: Dict[str, dict] = {}
+        self._latest: Dict[str, tuple] = {}  # pair -> (received_at, opportunity)
+        self._has_updates = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener: Optional[Listener] = None
+        self._processes: List[subprocess.Popen] = []
+        self.stats = {'joins': 0, 'departures': 0, 'rebalances': 0, 'results': 0}
+
+    def start(self):
+        target = parse_address(self.address)
+        if isinstance(target, str) and os.path.exists(target):
+            os.unlink(target)
+        self._listener = Listener(target, authkey=self.authkey)
+        if isinstance(target, str):
+            os.chmod(target, 0o600)
+        threading.Thread(target=self._accept_loop, name='scan-leader-accept', daemon=True).start()
+        threading.Thread(target=self._health_loop, name='scan-leader-health', daemon=True).start()
+        logger.info(f"Scan leader listening on {self.address} for {len(self.pairs)} pairs")
+
+    def spawn_local_workers(self, count: int):
+        """Start count worker processes on this machine"""
+        script = os.path.abspath(__file__)
+        for i in range(count):
+            cmd = [sys.executable, script, 'worker', '--address', self.address, '--id', f"local-{i}"]
+            env = dict(os.environ, SCAN_CLUSTER_AUTHKEY=self.authkey.decode('utf-8'))
+            self._processes.append(subprocess.Popen(cmd, cwd=os.path.dirname(script), env=env))
+        logger.info(f"Spawned {count} local scanner workers")
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+        for info in workers:
+            try:
+                with info['send_lock']:
+                    info['conn'].send({'type': 'shutdown'})
+                info['conn'].close()
+            except Exception:
+                pass
+        if self._listener:
+            self._listener.close()
+        for proc in self._processes:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.terminate()
+
+    def set_pairs(self, pairs: List[str]):
+        with self._lock:
+            self.pairs = list(pairs)
+            outbox = self._rebalance_locked()
+        self._send_assignments(outbox)
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.error(f"Scan leader accept failed: {e}")
+                continue
+            threading.Thread(target=self._reader_loop, args=(conn,), daemon=True).start()
+
+    def _reader_loop(self, conn):
+        worker_id = None
+        try:
+            hello = conn.recv()
+            if hello.get('type') != 'hello':
+                conn.close()
+                return
+            worker_id = hello['worker_id']
+            with self._lock:
+                self.workers[worker_id] = {'conn': conn, 'last_seen': time.time(),
+                                           'pid': hello.get('pid'), 'pairs': [], 'send_lock': threading.Lock()}
+                self.ring.add(worker_id)
+                self.stats['joins'] += 1
+                outbox = self._rebalance_locked()
+            self._send_assignments(outbox)
+            logger.info(f"Scanner worker {worker_id} joined (pid {hello.get('pid')})")
+
+            while not self._stop.is_set():
+                msg = conn.recv()
+                with self._lock:
+                    info = self.workers.get(worker_id)
+                    if info is None:
+                        break
+                    info['last_seen'] = time.time()
+                    if msg.get('type') == 'opportunities':
+                        self._ingest_locked(worker_id, msg)
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"Scanner worker {worker_id} connection error: {e}")
+        finally:
+            if worker_id:
+                self._drop_worker(worker_id, 'disconnected')
+
+    def _ingest_locked(self, worker_id: str, msg: dict):
+        now = time.time()
+        owned = set(self.workers[worker_id]['pairs'])
+        found = msg.get('opportunities', {})
+        for pair in msg.get('scanned', []):
+            if pair not in owned:
+                continue  # stale result from before a rebalance
+            if pair in found:
+                self._latest[pair] = (now, found[pair])
+            else:
+                self._latest.pop(pair, None)
+        self._has_updates = True
+        self.stats['results'] += 1
+
+    def _health_loop(self):
+        while not self._stop.wait(1.0):
+            now = time.time()
+            with self._lock:
+                stale = [w for w, info in self.workers.items() if now - info['last_seen'] > self.heartbeat_timeout]
+            for worker_id in stale:
+                self._drop_worker(worker_id, 'heartbeat timeout')
+
+    def _drop_worker(self, worker_id: str, reason: str):
+        with self._lock:
+            info = self.workers.pop(worker_id, None)
+            if info is None:
+                return
+            self.ring.remove(worker_id)
+            self.stats['departures'] += 1
+            for pair in info['pairs']:
+                self._latest.pop(pair, None)
+            outbox = self._rebalance_locked()
+        self._send_assignments(outbox)
+        try:
+            info['conn'].close()
+        except Exception:
+            pass
+        logger.warning(f"Scanner worker {worker_id} removed ({reason})")
+
+    def _rebalance_locked(self) -> List[tuple]:
+        """Reassign shards; returns the (worker_id, info, pairs) messages to send once the lock is released"""
+        shards = self.ring.assign(self.pairs)
+        self.stats['rebalances'] += 1
+        outbox = []
+        for worker_id, info in self.workers.items():
+            pairs = shards.get(worker_id, [])
+            if pairs == info['pairs']:
+                continue
+            info['pairs'] = pairs
+            outbox.append((worker_id, info, pairs))
+        logger.info("Shards: " + ', '.join(f"{w}={len(i['pairs'])}" for w, i in self.workers.items()))
+        return outbox
+
+    def _send_assignments(self, outbox: List[tuple]):
+        # Outside self._lock: a worker that stops reading must not stall the leader
+        for worker_id, info, pairs in outbox:
+            try:
+                with info['send_lock']:
+                    info['conn'].send({'type': 'assign', 'pairs': pairs})
+            except Exception as e:
+                logger.error(f"Failed to send shard to {worker_id}: {e}")
+
+    def has_updates(self) -> bool:
+        """True once since the last call if new worker results arrived"""
+        with self._lock:
+            updated, self._has_updates = self._has_updates, False
+            return updated
+
+    def collect_opportunities(self) -> dict:
+        """Fresh opportunities from all workers, ranked like scan_all_pairs output"""
+        now = time.time()
+        with self._lock:
+            fresh = [(pair, opp) for pair, (ts, opp) in self._latest.items() if now - ts <= self.max_opportunity_age]
+        return dict(sorted(fresh, key=lambda x: x[1]['best_score'], reverse=True))
+
+    def health(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {w: {'pairs': len(i['pairs']), 'last_seen_s': round(now - i['last_seen'], 1)}
+                    for w, i in self.workers.items()}
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+def run_worker(address: str, worker_id: str, authkey: Optional[bytes] = None,
+               scan_factory: Optional[Callable[[], object]] = None):
+    """Connect to the leader and scan the assigned shard until told to stop"""
+    import bot_template as bt
+    from scan_scheduler import ScanScheduler
+
+    strategy = scan_factory() if scan_factory else bt.MultiAssetPercocolStrategy(bt.PortfolioManager(0.0))
+    scheduler = ScanScheduler(bt.PRIMARY_TIMEFRAME, close_delay=bt.SCAN_CLOSE_DELAY,
+                              max_backoff=bt.SCAN_MAX_BACKOFF_CANDLES)
+    conn = Client(parse_address(address), authkey=authkey or get_authkey(address))
+    send_lock = threading.Lock()
+    stop = threading.Event()
+    assigned = set()  # this worker's shard; AVAILABLE_PAIRS is never loaded here
+
+    def send(msg: dict):
+        with send_lock:
+            conn.send(msg)
+
+    def heartbeat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                send({'type': 'heartbeat', 'worker_id': worker_id})
+            except Exception:
+                stop.set()
+
+    send({'type': 'hello', 'worker_id': worker_id, 'pid': os.getpid()})
+    threading.Thread(target=heartbeat, name='scan-worker-heartbeat', daemon=True).start()
+    logger.info(f"Scanner worker {worker_id} connected to {address}")
+
+    try:
+        while not stop.is_set():
+            while conn.poll(0):
+                msg = conn.recv()
+                if msg.get('type') == 'assign':
+                    scheduler.set_pairs(msg['pairs'])
+                    scheduler.prime()
+                    assigned = set(msg['pairs'])
+                    strategy.deferred_pairs = [p for p in strategy.deferred_pairs if p in assigned]
+                    logger.info(f"Worker {worker_id} assigned {len(msg['pairs'])} pairs")
+                elif msg.get('type') == 'shutdown':
+                    stop.set()
+            if stop.is_set():
+                break
+
+            due = scheduler.due_pairs()
+            if due or strategy.deferred_pairs:
+                try:
+                    opportunities = strategy.scan_all_pairs(due, universe=assigned)
+                except Exception as e:
+                    # Popped (or taken off the deferred list) but never recorded:
+                    # requeue them or this shard never scans them again
+                    scheduler.requeue(set(due) | set(strategy.last_scan_report.get('pairs', ())))
+                    logger.error(f"Worker {worker_id} scan failed: {e}", exc_info=True)
+                    conn.poll(1.0)
+                    continue
+                # Pairs deferred by the scan deadline are rescanned first, not rescheduled
+                unfinished = set(strategy.deferred_pairs)
+                scanned = [pair for pair in strategy.last_scan_report['pairs'] if pair not in unfinished]
+                for pair in scanned:
+                    scheduler.record(pair, strategy.last_scan_heat.get(pair, 0.0))
+                send({'type': 'opportunities', 'worker_id': worker_id, 'scanned': scanned,
+                      'opportunities': opportunities})
+                continue
+
+            next_due = scheduler.next_due_time()
+            wait = 1.0 if next_due is None else min(1.0, max(0.0, next_due - time.time()))
+            conn.poll(wait)
+    except (EOFError, OSError):
+        logger.warning(f"Scanner worker {worker_id} lost connection to leader")
+    finally:
+        stop.set()
+        conn.close()
+        logger.info(f"Scanner worker {worker_id} stopped")
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Sharded scanner worker')
+    parser.add_argument('role', choices=['worker'])
+    parser.add_argument('--address', default=os.getenv('SCAN_CLUSTER_ADDRESS', DEFAULT_ADDRESS))
+    parser.add_argument('--id', default=f"worker-{os.getpid()}")
+    args = parser.parse_args()
+
+    import bot_template as bt
+    bt.setup_logging()
+    try:
+        authkey = get_authkey(args.address)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    run_worker(args.address, args.id, authkey=authkey)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Single-Flight Request Coalescing
+================================
+
+When scanning, position checks and confirmation-timeframe checks run
+concurrently they ask for the same candles or ticker at the same moment.
+SingleFlight lets the first caller for a key make the request while every
+identical call that arrives before it finishes waits for, and shares, that
+one result (or exception):
+
+- Keys are the call's bound arguments with defaults applied, so
+  get_ticker('BTC/USD') and get_ticker(pair='BTC/USD') coalesce.
+- Nothing is cached: once the call returns the key is released and the
+  next caller makes a fresh request.
+- Waiters receive the very same result object, so callers must treat it
+  as read-only.
+"""
+
+import functools
+import logging
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent duplicates share its outcome"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'executions': 0, 'suppressed': 0, 'errors': 0, 'max_waiters': 0}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs), or the outcome of the identical call already in flight"""
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.stats['executions'] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.stats['suppressed'] += 1
+                self.stats['max_waiters'] = max(self.stats['max_waiters'], call.waiters)
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def coalesced(flight: SingleFlight):
+    """Decorator: route calls through flight, keyed on the normalized arguments"""
+    def decorate(fn: Callable) -> Callable:
+        # Positional parameters and their defaults, read from the code object
+        # (inspect.signature would add its import cost to every importer)
+        names = fn.__code__.co_varnames[:fn.__code__.co_argcount]
+        defaults = dict(zip(names[len(names) - len(fn.__defaults__ or ()):], fn.__defaults__ or ()))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            values = dict(defaults, **kwargs)
+            values.update(zip(names, args))
+            # A missing argument keys as None; fn itself then raises the TypeError
+            return flight.do(tuple(values.get(n) for n in names), fn, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+    return decorate
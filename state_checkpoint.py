@@ -0,0 +1,100 @@
+"""
+Bot State Checkpoints
+=====================
+
+Periodic, atomic JSON snapshots of everything the bot needs to resume after
+a crash or restart: positions, pending orders, portfolio history and scan
+scheduler state.
+
+- Snapshots are written to a temp file in the same directory, fsynced and
+  moved over the checkpoint with os.replace, so a crash mid-write leaves the
+  previous checkpoint intact. The previous checkpoint is kept as <path>.prev
+  and used if the current one cannot be read.
+- Writes are rate-limited to one per interval unless forced (e.g. right after
+  an order was placed or a position closed).
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointStore:
+    """Atomic, rate-limited JSON checkpoint file"""
+
+    def __init__(self, path: str, interval: float = 60.0, clock: Optional[Callable[[], float]] = None):
+        self.path = path
+        self.interval = interval
+        self.clock = clock or time.time
+        self.last_saved = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'saves': 0, 'skipped': 0, 'errors': 0, 'last_bytes': 0, 'last_save_ms': 0.0}
+
+    @property
+    def previous_path(self) -> str:
+        return self.path + '.prev'
+
+    def save(self, state: dict) -> bool:
+        """Write state now; returns False if the write failed"""
+        started = time.perf_counter()
+        payload = json.dumps({'version': CHECKPOINT_VERSION, 'saved_at': self.clock(), 'state': state},
+                             separators=(',', ':'), default=str)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            try:
+                fd, tmp_path = tempfile.mkstemp(prefix='.checkpoint-', dir=directory)
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    if os.path.exists(self.path):
+                        os.replace(self.path, self.previous_path)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
+                    raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Checkpoint write to {self.path} failed: {e}")
+                return False
+            self.last_saved = self.clock()
+            self.stats['saves'] += 1
+            self.stats['last_bytes'] = len(payload)
+            self.stats['last_save_ms'] = (time.perf_counter() - started) * 1000
+        return True
+
+    def maybe_save(self, build_state: Callable[[], dict], force: bool = False) -> bool:
+        """Build and write a snapshot if the interval has elapsed (or force)"""
+        if not force and self.clock() - self.last_saved < self.interval:
+            self.stats['skipped'] += 1
+            return False
+        return self.save(build_state())
+
+    def load(self) -> Optional[dict]:
+        """Latest readable snapshot state, or None if there is none"""
+        for path in (self.path, self.previous_path):
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Checkpoint {path} unreadable: {e}")
+                continue
+            if data.get('version') != CHECKPOINT_VERSION:
+                logger.warning(f"Checkpoint {path} has version {data.get('version')}, expected {CHECKPOINT_VERSION}")
+                continue
+            age = self.clock() - data.get('saved_at', 0)
+            logger.info(f"Loaded checkpoint {path} ({age:.0f}s old)")
+            return data['state']
+        return None
@@ -0,0 +1,273 @@
+"""
+Indexed Trade Analytics
+=======================
+
+Closed round trips (entry to exit) kept in columnar arrays so PnL
+attribution queries over long histories answer in milliseconds:
+
+- Every close appends one row: pair, direction, exit reason (STOP_LOSS,
+  TAKE_PROFIT, ...), entry/exit time and price, quantity, PnL and R
+  multiple (PnL over the risk between entry and stop). Pairs and reasons are
+  interned to small integer codes; columns are array.array buffers, so
+  appends stay cheap and NumPy reads them straight from the buffer.
+- On the first query after new rows the index is rebuilt: rows are ordered
+  by exit time and, for every group (all trades, each pair, direction and
+  reason), the exit times plus cumulative sums of PnL, wins and R are
+  precomputed. Any group over any time range is then two binary searches
+  and a subtraction, and time-bucketed PnL is one search per bucket edge.
+- Combined filters (e.g. one pair's stop-losses) mask the pair's own rows
+  instead of scanning the whole history.
+"""
+
+import logging
+import math
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS = {'bullish': 1, 'bearish': -1}
+_FLOAT_COLUMNS = ('entry_time', 'exit_time', 'entry_price', 'exit_price', 'quantity', 'pnl', 'r_multiple')
+
+
+def _empty_summary() -> dict:
+    return {'trades': 0, 'pnl': 0.0, 'wins': 0, 'hit_rate': 0.0, 'avg_pnl': 0.0, 'avg_r': None}
+
+
+class _Group:
+    """Exit times of one group's rows plus prefix sums, all in exit-time order"""
+
+    __slots__ = ('rows', 'times', 'cum_pnl', 'cum_wins', 'cum_r', 'cum_r_n')
+
+    def __init__(self, np, rows, times, pnl, r):
+        self.rows = rows
+        self.times = times[rows]
+        pnl = pnl[rows]
+        r = r[rows]
+        has_r = ~np.isnan(r)
+        self.cum_pnl = np.concatenate(([0.0], np.cumsum(pnl)))
+        self.cum_wins = np.concatenate(([0], np.cumsum(pnl > 0)))
+        self.cum_r = np.concatenate(([0.0], np.cumsum(np.where(has_r, r, 0.0))))
+        self.cum_r_n = np.concatenate(([0], np.cumsum(has_r)))
+
+    def span(self, start: Optional[float], end: Optional[float]) -> tuple:
+        lo = 0 if start is None else int(self.times.searchsorted(start, 'left'))
+        hi = len(self.times) if end is None else int(self.times.searchsorted(end, 'left'))
+        return lo, max(lo, hi)
+
+    def summary(self, lo: int, hi: int) -> dict:
+        trades = hi - lo
+        if trades <= 0:
+            return _empty_summary()
+        pnl = float(self.cum_pnl[hi] - self.cum_pnl[lo])
+        wins = int(self.cum_wins[hi] - self.cum_wins[lo])
+        r_n = int(self.cum_r_n[hi] - self.cum_r_n[lo])
+        return {'trades': trades, 'pnl': pnl, 'wins': wins, 'hit_rate': wins / trades,
+                'avg_pnl': pnl / trades,
+                'avg_r': float(self.cum_r[hi] - self.cum_r[lo]) / r_n if r_n else None}
+
+
+class TradeAnalytics:
+    """Append-only store of closed trades with prefix-sum indexes per pair, direction and reason"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pairs: List[str] = []
+        self.reasons: List[str] = []
+        self._pair_codes: Dict[str, int] = {}
+        self._reason_codes: Dict[str, int] = {}
+        self._pair = array('i')
+        self._reason = array('i')
+        self._direction = array('b')
+        self._floats = {name: array('d') for name in _FLOAT_COLUMNS}
+        self._index = None  # built lazily: dict of _Group plus the exit-time ordered columns
+        self._version = 0
+
+    def __len__(self) -> int:
+        return len(self._pair)
+
+    @staticmethod
+    def _intern(codes: Dict[str, int], names: List[str], name: str) -> int:
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def record(self, pair: str, direction: str, reason: str, entry_time: Optional[float], exit_time: float,
+               entry_price: float, exit_price: float, quantity: float, pnl: float,
+               stop_loss: Optional[float] = None):
+        """Append one closed trade; R multiple is PnL over the entry-to-stop risk (NaN without a stop)"""
+        risk = abs(entry_price - stop_loss) * abs(quantity) if stop_loss else 0.0
+        values = {'entry_time': entry_time if entry_time else exit_time, 'exit_time': exit_time,
+                  'entry_price': entry_price, 'exit_price': exit_price, 'quantity': quantity,
+                  'pnl': pnl, 'r_multiple': pnl / risk if risk > 0 else math.nan}
+        with self._lock:
+            self._pair.append(self._intern(self._pair_codes, self.pairs, pair))
+            self._reason.append(self._intern(self._reason_codes, self.reasons, reason or 'OTHER'))
+            self._direction.append(DIRECTIONS.get(direction, 1))
+            for name, value in values.items():
+                self._floats[name].append(float(value))
+            self._index = None
+            self._version += 1
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _build_index(self) -> dict:
+        import numpy as np
+
+        with self._lock:
+            n = len(self._pair)
+            pair = np.frombuffer(self._pair, dtype=np.int32, count=n).copy() if n else np.zeros(0, np.int32)
+            reason = np.frombuffer(self._reason, dtype=np.int32, count=n).copy() if n else np.zeros(0, np.int32)
+            direction = np.frombuffer(self._direction, dtype=np.int8, count=n).copy() if n else np.zeros(0, np.int8)
+            floats = {name: np.frombuffer(col, dtype=np.float64, count=n).copy() if n else np.zeros(0)
+                      for name, col in self._floats.items()}
+            pair_names, reason_names = list(self.pairs), list(self.reasons)
+            version = self._version
+
+        order = np.argsort(floats['exit_time'], kind='stable')
+        pair, reason, direction = pair[order], reason[order], direction[order]
+        floats = {name: col[order] for name, col in floats.items()}
+        times, pnl, r = floats['exit_time'], floats['pnl'], floats['r_multiple']
+
+        groups = {('all',): _Group(np, np.arange(n), times, pnl, r)}
+        for key, codes, names in (('pair', pair, pair_names), ('reason', reason, reason_names)):
+            # Stable sort by code keeps each group's rows in exit-time order
+            by_code = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[by_code], np.arange(len(names) + 1))
+            for code, name in enumerate(names):
+                rows = by_code[bounds[code]:bounds[code + 1]]
+                if len(rows):
+                    groups[(key, name)] = _Group(np, rows, times, pnl, r)
+        for name, sign in DIRECTIONS.items():
+            rows = np.nonzero(direction == sign)[0]
+            if len(rows):
+                groups[('direction', name)] = _Group(np, rows, times, pnl, r)
+
+        index = {'groups': groups, 'pair': pair, 'reason': reason, 'direction': direction,
+                 'pair_names': pair_names, 'reason_names': reason_names, **floats}
+        with self._lock:
+            if self._version == version:
+                self._index = index
+        return index
+
+    def _get_index(self) -> dict:
+        index = self._index
+        return index if index is not None else self._build_index()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def summary(self, pair: Optional[str] = None, direction: Optional[str] = None,
+                reason: Optional[str] = None, start: Optional[float] = None,
+                end: Optional[float] = None) -> dict:
+        """Trades, PnL, wins, hit rate, average PnL and average R for exits in [start, end)"""
+        index = self._get_index()
+        filters = [(k, v) for k, v in (('pair', pair), ('direction', direction), ('reason', reason)) if v is not None]
+        if not filters:
+            group = index['groups'][('all',)]
+            return group.summary(*group.span(start, end))
+
+        groups = [index['groups'].get(f) for f in filters]
+        if any(g is None for g in groups):
+            return _empty_summary()
+        group = min(groups, key=lambda g: len(g.rows))
+        lo, hi = group.span(start, end)
+        if len(filters) == 1:
+            return group.summary(lo, hi)
+
+        # Several filters: mask the smallest group's rows in the range
+        import numpy as np
+        rows = group.rows[lo:hi]
+        mask = np.ones(len(rows), dtype=bool)
+        if pair is not None:
+            mask &= index['pair'][rows] == index['pair_names'].index(pair)
+        if reason is not None:
+            mask &= index['reason'][rows] == index['reason_names'].index(reason)
+        if direction is not None:
+            mask &= index['direction'][rows] == DIRECTIONS[direction]
+        rows = rows[mask]
+        if not len(rows):
+            return _empty_summary()
+        pnl = index['pnl'][rows]
+        r = index['r_multiple'][rows]
+        r = r[~np.isnan(r)]
+        wins = int((pnl > 0).sum())
+        return {'trades': len(rows), 'pnl': float(pnl.sum()), 'wins': wins, 'hit_rate': wins / len(rows),
+                'avg_pnl': float(pnl.mean()), 'avg_r': float(r.mean()) if len(r) else None}
+
+    def by_pair(self, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, dict]:
+        """summary() per pair with at least one exit in [start, end), largest PnL first"""
+        return self._by('pair', start, end)
+
+    def by_reason(self, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, dict]:
+        """summary() per exit reason"""
+        return self._by('reason', start, end)
+
+    def by_direction(self, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, dict]:
+        return self._by('direction', start, end)
+
+    def _by(self, key: str, start: Optional[float], end: Optional[float]) -> Dict[str, dict]:
+        out = {}
+        for (kind, *name), group in self._get_index()['groups'].items():
+            if kind == key:
+                result = group.summary(*group.span(start, end))
+                if result['trades']:
+                    out[name[0]] = result
+        return dict(sorted(out.items(), key=lambda item: item[1]['pnl'], reverse=True))
+
+    def pnl_buckets(self, bucket_seconds: float, start: Optional[float] = None, end: Optional[float] = None,
+                    pair: Optional[str] = None) -> List[tuple]:
+        """(bucket start, PnL, trades) per bucket_seconds window aligned to the epoch, exits in [start, end)"""
+        import numpy as np
+
+        group = self._get_index()['groups'].get(('pair', pair) if pair is not None else ('all',))
+        if group is None or not len(group.times):
+            return []
+        first = group.times[0] if start is None else start
+        last = group.times[-1] if end is None else end
+        origin = math.floor(first / bucket_seconds) * bucket_seconds
+        edges = origin + bucket_seconds * np.arange(math.floor((last - origin) / bucket_seconds) + 2)
+        bounds = edges.copy()
+        if start is not None:
+            bounds[0] = max(bounds[0], start)
+        if end is not None:
+            bounds = np.minimum(bounds, end)
+        positions = group.times.searchsorted(bounds, 'left')
+        pnl = np.diff(group.cum_pnl[positions])
+        trades = np.diff(positions)
+        keep = edges[:-1] < last if end is not None else slice(None)
+        return [(float(t), float(p), int(n)) for t, p, n in zip(edges[:-1][keep], pnl[keep], trades[keep])]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def export_state(self) -> dict:
+        """Columns as lists (for checkpoints)"""
+        with self._lock:
+            return {'pairs': list(self.pairs), 'reasons': list(self.reasons),
+                    'pair': self._pair.tolist(), 'reason': self._reason.tolist(),
+                    'direction': self._direction.tolist(),
+                    **{name: col.tolist() for name, col in self._floats.items()}}
+
+    def restore_state(self, state: dict):
+        if not state:
+            return
+        with self._lock:
+            self.pairs = list(state.get('pairs', []))
+            self.reasons = list(state.get('reasons', []))
+            self._pair_codes = {name: i for i, name in enumerate(self.pairs)}
+            self._reason_codes = {name: i for i, name in enumerate(self.reasons)}
+            self._pair = array('i', state.get('pair', []))
+            self._reason = array('i', state.get('reason', []))
+            self._direction = array('b', state.get('direction', []))
+            self._floats = {name: array('d', (math.nan if v is None else v for v in state.get(name, [])))
+                            for name in _FLOAT_COLUMNS}
+            self._index = None
+            self._version += 1